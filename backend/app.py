@@ -1,11 +1,18 @@
-from fastapi import FastAPI, Form, HTTPException
+from fastapi import FastAPI, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from backend.site_generator import generate_site
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from backend import metrics
+from backend.batch import BatchError, group_items, parse_batch, run_batch
+from backend.jobs import QueueFullError, get_scheduler
+from backend.site_catalog import get_catalog
+from backend.site_generator import ARTIFACTS, generate_site, generate_site_stream, refine_site
+from backend.site_server import PrecompressedStaticFiles
+from backend.site_storage import get_storage
 from backend.premium_templates import guidance_for, get_template_info
 import uvicorn
-import os
-import asyncio
+import json
+import time
 
 app = FastAPI()
 
@@ -16,61 +23,366 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# per-request latency, in-flight count and (optionally) a JSON-lines timing log
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Statik olarak oluşturulan siteleri /sites altında sun
-# Support both expected path and nested path (some runs created backend/backend/generated_sites)
-candidates = [os.path.join("backend", "generated_sites"), os.path.join("backend", "backend", "generated_sites")]
-sites_dir = None
-for c in candidates:
-    if os.path.exists(c):
-        sites_dir = c
-        break
-# default to the primary path if none exist yet
-if not sites_dir:
-    sites_dir = candidates[0]
-os.makedirs(sites_dir, exist_ok=True)
-app.mount("/sites", StaticFiles(directory=sites_dir), name="sites")
+sites_dir = get_storage().root
+# sites removed by retention leave the catalog too
+get_storage().on_evict(lambda site_id: get_catalog().remove(site_id))
+# gzip/brotli variants are written at generation time; served with strong ETags and immutable caching
+app.mount("/sites", PrecompressedStaticFiles(directory=sites_dir), name="sites")
 
-@app.post("/generate")
-async def generate(prompt: str = Form(...), template: str = Form("modern")):
-    """Kullanıcı prompt'una göre web sitesi üretir (bloklayıcı iş parçacığında çalıştırılır)."""
+def _site_url(site_name: str) -> str:
+    return f"http://localhost:8000/sites/{site_name}/index.html"
+
+
+def _validate_prompt(prompt: str):
     if not prompt or not prompt.strip():
         raise HTTPException(status_code=400, detail="Prompt boş olamaz. Lütfen bir açıklama girin.")
 
+
+def _resolve_premium(template_type: str, template: str):
+    """Return ``(mapped_template, guidance)`` for a premium template key."""
+    # Premium guidance is prepended to the prompt by generate_site (and is part of its cache key)
+    guidance = guidance_for(template_type) or ""
+
+    # Determine which base template to use (map premium keys to mock templates)
+    info = get_template_info(template_type)
+    mapped_template = info.get("map_to") if info else template
+    return mapped_template, guidance
+
+
+def _client_id(request: Request) -> str:
+    """Identify the caller for per-client fair scheduling."""
+    client = request.headers.get("x-client-id")
+    if client:
+        return client[:64]
+    return request.client.host if request.client else "anonymous"
+
+
+def _queue_full(e: QueueFullError):
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+
+def _run_generation(job, prompt, template, guidance="", template_type=None):
+    """Job function: blocking generation with stage progress reported to the job."""
+    return generate_site(prompt, template, guidance, on_event=job.emit, template_type=template_type)
+
+
+def _run_refinement(job, site_id, artifact, instruction, version, guidance):
+    """Job function: regenerate one artifact of an existing site as a new version."""
+    return refine_site(site_id, artifact, instruction, version, guidance, on_event=job.emit)
+
+
+def _run_generation_stream(job, prompt, template, guidance="", template_type=None):
+    """Job function: streaming generation forwarding every event to the job's subscribers."""
+    site_name = None
+    for event in generate_site_stream(prompt, template, guidance, template_type):
+        job.emit(event)
+        if event["event"] == "done":
+            site_name = event["site"]
+    return site_name
+
+
+def _sse_event(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(request: Request, prompt, template, guidance="", template_type=None):
+    """Queue a streaming generation job and relay its events as Server-Sent Events."""
+    scheduler = get_scheduler()
+    extra = {"template_type": template_type} if template_type else {}
     try:
-        # generate_site çalışması bloklayıcı olabilir (subprocess). Threadpool'da çalıştırıyoruz.
-        site_name = await asyncio.to_thread(generate_site, prompt, template)
-        url = f"http://localhost:8000/sites/{site_name}/index.html"
+        job = scheduler.submit(_run_generation_stream, prompt, template, guidance, template_type,
+                               client=_client_id(request))
+    except QueueFullError as e:
+        raise _queue_full(e)
+    events = job.subscribe()
+
+    async def body():
+        try:
+            yield _sse_event({"event": "queued", "job_id": job.id, "queue_depth": scheduler.queue_depth})
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                if event["event"] == "done":
+                    event = {**event, "url": _site_url(event["site"]), **extra}
+                yield _sse_event(event)
+            if job.status != "done":
+                detail = job.error or "İş iptal edildi."
+                yield _sse_event({"event": "error", "detail": f"Site oluşturma hatası: {detail}"})
+        finally:
+            if job.finished_at is None:
+                # client went away mid-stream
+                scheduler.cancel(job.id)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/generate")
+async def generate(request: Request, prompt: str = Form(...), template: str = Form("modern")):
+    """Kullanıcı prompt'una göre web sitesi üretir (sınırlı sayıda model slotunda, iş kuyruğu üzerinden)."""
+    _validate_prompt(prompt)
+
+    try:
+        # generate_site bloklayıcıdır (LLM çağrıları); scheduler worker thread'inde çalıştırılır.
+        site_name = await get_scheduler().run(_run_generation, prompt, template, client=_client_id(request))
+        url = _site_url(site_name)
         return {"status": "ok", "site": site_name, "url": url}
+    except QueueFullError as e:
+        raise _queue_full(e)
     except Exception as e:
         # Return structured JSON error so frontend can display friendly messages
         raise HTTPException(status_code=500, detail=f"Site oluşturma hatası: {str(e)}")
 
 
+@app.post("/generate/stream")
+async def generate_stream(request: Request, prompt: str = Form(...), template: str = Form("modern")):
+    """Streaming variant of /generate: emits stage/token events and a final `done` event (SSE)."""
+    _validate_prompt(prompt)
+    return _sse_response(request, prompt, template)
+
+
 @app.post("/api/generate")
-async def api_generate(prompt: str = Form(...), template_type: str = Form("minimalist"), template: str = Form("modern")):
+async def api_generate(request: Request, prompt: str = Form(...), template_type: str = Form("minimalist"), template: str = Form("modern")):
     """API endpoint for generation that supports premium `template_type`.
 
     - `template_type` is a premium template key (e.g. minimalist, kurumsal, creative).
     - Falls back to `template` if mapping is not found.
     """
-    if not prompt or not prompt.strip():
-        raise HTTPException(status_code=400, detail="Prompt boş olamaz. Lütfen bir açıklama girin.")
-
-    # Enrich prompt with premium guidance if present
-    guidance = guidance_for(template_type) or ""
-    enriched_prompt = f"{guidance}\nKullanıcı isteği: {prompt}" if guidance else prompt
-
-    # Determine which base template to use (map premium keys to mock templates)
-    info = get_template_info(template_type)
-    mapped_template = info.get("map_to") if info else template
+    _validate_prompt(prompt)
+    mapped_template, guidance = _resolve_premium(template_type, template)
 
     try:
-        site_name = await asyncio.to_thread(generate_site, enriched_prompt, mapped_template)
-        url = f"http://localhost:8000/sites/{site_name}/index.html"
+        site_name = await get_scheduler().run(_run_generation, prompt, mapped_template, guidance, template_type,
+                                              client=_client_id(request))
+        url = _site_url(site_name)
         return {"status": "ok", "site": site_name, "url": url, "template_type": template_type}
+    except QueueFullError as e:
+        raise _queue_full(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Site oluşturma hatası: {str(e)}")
 
+
+@app.post("/api/generate/stream")
+async def api_generate_stream(request: Request, prompt: str = Form(...), template_type: str = Form("minimalist"), template: str = Form("modern")):
+    """Streaming variant of /api/generate (Server-Sent Events)."""
+    _validate_prompt(prompt)
+    mapped_template, guidance = _resolve_premium(template_type, template)
+    return _sse_response(request, prompt, mapped_template, guidance, template_type=template_type)
+
+
+def _job_payload(job) -> dict:
+    payload = job.to_dict()
+    if job.status == "done":
+        payload["url"] = _site_url(job.result)
+    return payload
+
+
+@app.post("/api/generate/batch")
+async def api_generate_batch(request: Request, priority: int = 0):
+    """Generate many sites from a JSON or CSV batch; results stream back as NDJSON as each finishes.
+
+    Items are grouped by template and premium guidance and run group by group
+    (see backend/batch.py). Lines: ``accepted``, then one ``result`` per item,
+    then ``done``.
+    """
+    try:
+        items = parse_batch(await request.body(), request.headers.get("content-type"))
+    except BatchError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    groups = group_items(items, _resolve_premium)
+    ordered = [item for _, group in groups for item in group]
+
+    scheduler = get_scheduler()
+    client = _client_id(request)
+    priority = max(0, min(9, priority))
+
+    def submit(item):
+        return scheduler.submit(_run_generation, item.prompt, item.mapped_template, item.guidance,
+                                item.template_type, client=client, priority=priority)
+
+    # fail fast with 429 if the first item cannot even be queued
+    try:
+        first = submit(ordered[0])
+    except QueueFullError as e:
+        raise _queue_full(e)
+
+    def submit_next(item):
+        return first if item is ordered[0] else submit(item)
+
+    async def body():
+        start = time.perf_counter()
+        counts = {"ok": 0, "error": 0}
+        yield _ndjson({"event": "accepted", "items": len(ordered), "groups": [
+            {"template": template, "template_types": sorted({i.template_type for i in group}), "items": len(group)}
+            for (template, _), group in groups
+        ]})
+        # keep every slot busy plus one queued job of ours per slot
+        window = scheduler.slots * 2
+        async for item, job, seconds in run_batch(ordered, submit_next, window,
+                                                  cancel=lambda job: scheduler.cancel(job.id)):
+            line = {"event": "result", "index": item.index, "id": item.id, "template_type": item.template_type,
+                    "template": item.mapped_template, "seconds": round(seconds, 3)}
+            if job.status == "done":
+                counts["ok"] += 1
+                line.update(status="ok", site=job.result, url=_site_url(job.result))
+            else:
+                counts["error"] += 1
+                line.update(status="error", error=f"Site oluşturma hatası: {job.error or job.status}")
+            yield _ndjson(line)
+        yield _ndjson({"event": "done", **counts, "seconds": round(time.perf_counter() - start, 3)})
+
+    return StreamingResponse(body(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _ndjson(obj: dict) -> str:
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    request: Request,
+    prompt: str = Form(...),
+    template_type: str = Form(None),
+    template: str = Form("modern"),
+    priority: int = Form(0, ge=0, le=9),
+):
+    """Queue a generation job and return its id immediately; poll /jobs/{job_id} for progress."""
+    _validate_prompt(prompt)
+    mapped_template, guidance = _resolve_premium(template_type, template) if template_type else (template, "")
+    scheduler = get_scheduler()
+    try:
+        job = scheduler.submit(_run_generation, prompt, mapped_template, guidance, template_type,
+                               client=_client_id(request), priority=priority, detached=True)
+    except QueueFullError as e:
+        raise _queue_full(e)
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}",
+                 "queue_depth": scheduler.queue_depth},
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Return status, current stage and (when done) the site URL of a job."""
+    job = get_scheduler().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı.")
+    return _job_payload(job)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job."""
+    scheduler = get_scheduler()
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı.")
+    if not scheduler.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"İş zaten tamamlandı ({job.status}).")
+    return _job_payload(job)
+
+
+def _site_entry(entry: dict) -> dict:
+    return {**entry, "url": _site_url(entry["site_id"])}
+
+
+def _site_page(entries, next_cursor) -> dict:
+    return {"items": [_site_entry(e) for e in entries], "next_cursor": next_cursor}
+
+
+# catalog endpoints are plain functions: FastAPI runs them in its threadpool, keeping SQLite off the event loop
+@app.get("/api/sites")
+def list_sites(limit: int = 20, cursor: str = None, template_type: str = None):
+    """Generated sites, newest first; pass ``next_cursor`` back as ``cursor`` for the next page."""
+    try:
+        return _site_page(*get_catalog().list(limit, cursor, template_type))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/sites/search")
+def search_sites(q: str = None, prefix: str = None, limit: int = 20, cursor: str = None):
+    """Search site prompts by words (``q``) and/or by ``prefix``, newest first."""
+    if not (q and q.strip()) and not (prefix and prefix.strip()):
+        raise HTTPException(status_code=400, detail="Arama için q ya da prefix gerekli.")
+    try:
+        return _site_page(*get_catalog().search(q, prefix, limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/sites/{site_id}")
+def get_site(site_id: str):
+    """Catalog entry of one site, with its refined versions."""
+    catalog = get_catalog()
+    entry = catalog.get(site_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Site bulunamadı.")
+    versions = [{**v, "url": _site_url(f"{site_id}/v{v['version']}")} for v in catalog.versions(site_id)]
+    return {**_site_entry(entry), "versions": versions}
+
+
+def _refine_guidance(site_id: str, version: int = None) -> str:
+    """Check that the site (and version) exists and return its premium guidance; touches disk and SQLite."""
+    try:
+        versions = get_storage().versions(site_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Site bulunamadı.")
+    if version is not None and version not in versions:
+        raise HTTPException(status_code=404, detail=f"Sürüm bulunamadı: {version}")
+    entry = get_catalog().get(site_id)
+    if entry and entry.get("template_type"):
+        return _resolve_premium(entry["template_type"], entry.get("template") or "modern")[1]
+    return ""
+
+
+@app.post("/api/sites/{site_id}/refine")
+async def refine(
+    request: Request,
+    site_id: str,
+    artifact: str = Form(...),
+    instruction: str = Form(""),
+    version: int = Form(None, ge=1),
+):
+    """Regenerate only the html, css or js of a site as a new version; the other files are reused.
+
+    The new version is published under ``/sites/<site>/v<N>/`` and shares
+    the unchanged files with the version it started from (the latest one
+    unless ``version`` is given).
+    """
+    if artifact not in dict(ARTIFACTS):
+        raise HTTPException(status_code=400, detail="artifact html, css ya da js olmalı.")
+    guidance = await run_in_threadpool(_refine_guidance, site_id, version)
+
+    try:
+        new_version = await get_scheduler().run(_run_refinement, site_id, artifact, instruction.strip(), version,
+                                                guidance, client=_client_id(request))
+    except QueueFullError as e:
+        raise _queue_full(e)
+    except LookupError:
+        # evicted while queued
+        raise HTTPException(status_code=404, detail="Site bulunamadı.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Site güncelleme hatası: {str(e)}")
+    return {"status": "ok", "site": site_id, "version": new_version, "artifact": artifact,
+            "url": _site_url(f"{site_id}/v{new_version}")}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of request, stage, model and queue metrics."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
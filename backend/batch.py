@@ -0,0 +1,160 @@
+"""Batch generation: parsing, grouping and windowed scheduling.
+
+A batch is a list of prompt/template pairs sent as JSON (``{"items": [...]}``
+or a bare list) or as CSV with a header row (``prompt``, ``template_type``,
+``template``, ``id``). Items are grouped by resolved template and premium
+guidance, and submitted to the job scheduler group by group. Consecutive
+model calls then share the same prompt prefix, because the guidance comes
+first in every prompt, so the model can reuse its cached context. Only a
+small window of items is queued at a time, so a large batch neither trips
+the per-client queue limit nor starves other clients.
+
+Environment variables:
+    AI_SITE_GENERATOR_BATCH_MAX_ITEMS  items accepted per batch (default: 500)
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+
+from backend.jobs import QueueFullError
+
+FIELDS = ("prompt", "template_type", "template", "id")
+
+
+class BatchError(ValueError):
+    """Invalid batch payload; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class BatchItem:
+    __slots__ = ("index", "id", "prompt", "template_type", "template", "mapped_template", "guidance")
+
+    def __init__(self, index: int, prompt: str, template_type: str = "minimalist", template: str = "modern",
+                 id=None):
+        self.index = index
+        self.id = id
+        self.prompt = prompt
+        self.template_type = template_type
+        self.template = template
+        self.mapped_template = template
+        self.guidance = ""
+
+
+def max_items() -> int:
+    return int(os.getenv("AI_SITE_GENERATOR_BATCH_MAX_ITEMS", "500"))
+
+
+def _rows_from_json(body: bytes) -> list:
+    try:
+        data = json.loads(body or b"null")
+    except ValueError as e:
+        raise BatchError(f"Geçersiz JSON: {e}")
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise BatchError('JSON gövdesi bir liste ya da {"items": [...]} olmalı.')
+    rows = []
+    for i, entry in enumerate(data):
+        if isinstance(entry, str):
+            entry = {"prompt": entry}
+        if not isinstance(entry, dict):
+            raise BatchError(f"{i}. öğe bir nesne olmalı.")
+        rows.append(entry)
+    return rows
+
+
+def _rows_from_csv(body: bytes) -> list:
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BatchError("CSV UTF-8 olmalı.")
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or "prompt" not in [f.strip() for f in reader.fieldnames]:
+        raise BatchError("CSV başlık satırında 'prompt' sütunu olmalı.")
+    return [{(k or "").strip(): v for k, v in row.items()} for row in reader]
+
+
+def parse_batch(body: bytes, content_type: str) -> list:
+    """Return the :class:`BatchItem` list of a JSON or CSV batch body."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        rows = _rows_from_csv(body)
+    elif media_type in ("application/json", ""):
+        rows = _rows_from_json(body)
+    else:
+        raise BatchError("Desteklenmeyen içerik türü; application/json ya da text/csv gönderin.", status=415)
+    if not rows:
+        raise BatchError("Toplu istek boş.")
+    limit = max_items()
+    if len(rows) > limit:
+        raise BatchError(f"Toplu istek en fazla {limit} öğe içerebilir.", status=413)
+
+    items = []
+    for i, row in enumerate(rows):
+        prompt = _text_field(row, "prompt", "", i)
+        if not prompt:
+            raise BatchError(f"{i}. öğenin prompt'u boş.")
+        items.append(BatchItem(i, prompt, template_type=_text_field(row, "template_type", "minimalist", i),
+                               template=_text_field(row, "template", "modern", i), id=row.get("id")))
+    return items
+
+
+def _text_field(row: dict, name: str, default: str, index: int) -> str:
+    value = row.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise BatchError(f"{index}. öğenin {name} alanı metin olmalı.")
+    return value.strip() or default
+
+
+def group_items(items, resolve) -> list:
+    """Resolve each item with ``resolve(template_type, template) -> (template, guidance)`` and group them.
+
+    Returns ``[((template, guidance), [items])]`` in order of first appearance.
+    """
+    groups = {}
+    for item in items:
+        item.mapped_template, item.guidance = resolve(item.template_type, item.template)
+        groups.setdefault((item.mapped_template, item.guidance), []).append(item)
+    return list(groups.items())
+
+
+async def run_batch(items, submit, window: int, retry_after: float = 1.0, cancel=None):
+    """Submit ``items`` in order, at most ``window`` at a time; yield ``(item, job, seconds)`` as they finish.
+
+    ``submit(item)`` queues a job and may raise :class:`QueueFullError`, in
+    which case submission pauses until one of ours finishes (or, with none
+    running, for ``retry_after`` seconds). ``cancel(job)`` is called for
+    every unfinished job if the consumer stops early.
+    """
+    pending = deque(items)
+    running = {}
+    try:
+        while pending or running:
+            while pending and len(running) < window:
+                try:
+                    job = submit(pending[0])
+                except QueueFullError:
+                    break
+                running[job.future] = (pending.popleft(), job, time.perf_counter())
+            if not running:
+                await asyncio.sleep(retry_after)
+                continue
+            done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                item, job, started = running.pop(future)
+                # mark the outcome as retrieved; errors are reported through job.status/job.error
+                future.exception()
+                yield item, job, time.perf_counter() - started
+    finally:
+        if cancel is not None:
+            for _, job, _ in running.values():
+                cancel(job)
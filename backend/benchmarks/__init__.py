@@ -0,0 +1,94 @@
+"""Benchmarks for the generator.
+
+    python -m backend.benchmarks.load      HTTP load test against a fake Ollama server
+    python -m backend.benchmarks.micro     post-processing and template rendering
+    python -m backend.benchmarks.compare   diff two result files
+
+Each suite writes one JSON document (``--output``, default stdout) with a
+``meta`` block (git commit, Python version, settings) and a ``results``
+list, so runs from different commits can be compared with ``compare``.
+"""
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(values) -> dict:
+    """Return p50/p95/p99/mean/max of ``values`` (seconds) in milliseconds."""
+    ms = [v * 1000.0 for v in values]
+    return {
+        "p50": round(percentile(ms, 50), 3),
+        "p95": round(percentile(ms, 95), 3),
+        "p99": round(percentile(ms, 99), 3),
+        "mean": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "max": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MiB (0 when unknown)."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB (0 when unknown)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def report(suite: str, settings: dict, results: list) -> dict:
+    return {
+        "suite": suite,
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "settings": settings,
+        },
+        "results": results,
+    }
+
+
+def write_report(doc: dict, output: str = None):
+    text = json.dumps(doc, indent=2, ensure_ascii=False)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,85 @@
+"""Compare two benchmark result files from the same suite.
+
+Prints one line per case and metric with the relative change, and exits with
+status 1 when any metric regressed by more than ``--threshold`` percent.
+
+    python -m backend.benchmarks.compare bench/base.json bench/head.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# metric path -> True when higher is better
+METRICS = {
+    "load": {
+        ("latency_ms", "p50"): False,
+        ("latency_ms", "p95"): False,
+        ("latency_ms", "p99"): False,
+        ("ttfb_ms", "p50"): False,
+        ("throughput_rps",): True,
+        ("peak_rss_mb",): False,
+    },
+    "micro": {
+        ("us_per_op",): False,
+    },
+}
+
+
+def _case(suite: str, result: dict) -> tuple:
+    if suite == "load":
+        return result["endpoint"], result["concurrency"]
+    return result["name"], result["size"]
+
+
+def _get(result: dict, path: tuple):
+    value = result
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(base: dict, head: dict, threshold: float = 10.0):
+    """Return ``(rows, regressions)``; rows are ``(case, metric, base, head, change_pct)``."""
+    suite = head["suite"]
+    if base["suite"] != suite:
+        raise ValueError(f"cannot compare {base['suite']!r} results with {suite!r} results")
+    baseline = {_case(suite, r): r for r in base["results"]}
+    rows, regressions = [], []
+    for result in head["results"]:
+        case = _case(suite, result)
+        if case not in baseline:
+            continue
+        for path, higher_is_better in METRICS[suite].items():
+            old, new = _get(baseline[case], path), _get(result, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100.0
+            row = (case, ".".join(path), old, new, round(change, 1))
+            rows.append(row)
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, "r", encoding="utf-8") as f:
+        head = json.load(f)
+    rows, regressions = compare(base, head, args.threshold)
+    print(f"{base['meta'].get('commit')} -> {head['meta'].get('commit')} ({head['suite']})")
+    for case, metric, old, new, change in rows:
+        flag = "  REGRESSION" if (case, metric, old, new, change) in regressions else ""
+        print(f"{'/'.join(map(str, case)):<40} {metric:<16} {old:>12} -> {new:<12} {change:+.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Minimal Ollama-compatible HTTP server for load benchmarks and tests.
+
+Implements ``GET /api/version`` and ``POST /api/generate`` (streaming and
+non-streaming) over HTTP/1.1 keep-alive. Responses are produced by a
+``responder(prompt) -> str`` callable; ``latency`` delays the first token
+and ``tokens_per_sec`` paces streamed tokens.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_responder(prompt: str) -> str:
+    if "HTML oluştur" in prompt:
+        return "<!DOCTYPE html><html><head><title>fake</title></head><body><h1 class=\"hero\">fake</h1></body></html>"
+    if "index.js oluştur" in prompt:
+        return "console.log('fake');"
+    return "body { color: #333; }"
+
+
+def _tokenize(text: str):
+    """Split text into small whitespace-preserving chunks, like model tokens."""
+    tokens, start = [], 0
+    for i, ch in enumerate(text):
+        if ch in " \n" and i > start:
+            tokens.append(text[start:i + 1])
+            start = i + 1
+    if start < len(text):
+        tokens.append(text[start:])
+    return tokens
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-fake"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        server = self.server
+        with server.lock:
+            server.requests.append(payload)
+        if server.latency:
+            time.sleep(server.latency)
+        text = server.responder(payload.get("prompt", ""))
+        tokens = _tokenize(text)
+        delay = 1.0 / server.tokens_per_sec if server.tokens_per_sec else 0.0
+        if not payload.get("stream", True):
+            if delay:
+                time.sleep(delay * len(tokens))
+            self._send_json(200, {"model": payload.get("model"), "response": text, "done": True,
+                                  "eval_count": len(tokens), "eval_duration": int(delay * len(tokens) * 1e9)})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            if delay:
+                time.sleep(delay)
+            self._write_chunk({"model": payload.get("model"), "response": token, "done": False})
+        self._write_chunk({"model": payload.get("model"), "response": "", "done": True,
+                           "eval_count": len(tokens), "eval_duration": int(delay * len(tokens) * 1e9)})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, obj):
+        line = json.dumps(obj).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeOllamaServer:
+    """Context manager running a fake Ollama server on a free localhost port."""
+
+    def __init__(self, responder=default_responder, latency: float = 0.0, tokens_per_sec: float = 0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.connections = 0
+        self.httpd.requests = []
+        self.httpd.responder = responder
+        self.httpd.latency = latency
+        self.httpd.tokens_per_sec = tokens_per_sec
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connections(self) -> int:
+        return self.httpd.connections
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,204 @@
+"""HTTP load test of the generation endpoints against a fake Ollama server.
+
+Starts :class:`backend.benchmarks.fake_ollama.FakeOllamaServer` (configurable
+first-token latency and token rate) and the FastAPI app under uvicorn on
+free localhost ports, then drives each endpoint at increasing concurrency.
+Every virtual user sends its own ``X-Client-Id`` and unique prompts, and the
+generation cache is disabled, so each request reaches the model.
+
+Per endpoint and concurrency level it reports latency and time-to-first-byte
+percentiles (ms), throughput (completed requests per second), 429
+rejections, errors and process memory.
+
+    python -m backend.benchmarks.load --concurrency 1,2,4,8 --requests 16 \\
+        --tokens-per-sec 200 --latency 0.05 --output bench/load.json
+"""
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.benchmarks import peak_rss_mb, report, rss_mb, summarize, write_report
+from backend.benchmarks.fake_ollama import FakeOllamaServer, default_responder
+
+DEFAULT_ENDPOINTS = ("/generate", "/api/generate")
+
+
+def sized_responder(tokens: int):
+    """Fake-model responder padding the default artifacts to about ``tokens`` tokens each."""
+    padding = " ".join(["lorem"] * max(0, tokens))
+
+    def respond(prompt: str) -> str:
+        text = default_responder(prompt)
+        if text.startswith("<!DOCTYPE"):
+            return text.replace("</body>", f"<p>{padding}</p></body>")
+        return f"/* {padding} */\n{text}"
+
+    return respond
+
+
+def _form(endpoint: str, prompt: str) -> bytes:
+    fields = {"prompt": prompt, "template": "modern"}
+    if endpoint.startswith("/api/"):
+        fields["template_type"] = "minimalist"
+    return urllib.parse.urlencode(fields).encode("utf-8")
+
+
+def _request(port: int, endpoint: str, prompt: str, client_id: str, timeout: float):
+    """POST one generation; returns ``(status, ttfb, total)`` in seconds."""
+    body = _form(endpoint, prompt)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        start = time.perf_counter()
+        conn.request("POST", endpoint, body=body, headers={
+            "Content-Type": "application/x-www-form-urlencoded",
+            "X-Client-Id": client_id,
+        })
+        resp = conn.getresponse()
+        # status line and headers are in: first byte of the response
+        ttfb = time.perf_counter() - start
+        if endpoint.endswith("/stream"):
+            # for SSE the first useful byte is the first event
+            resp.readline()
+            ttfb = time.perf_counter() - start
+        resp.read()
+        return resp.status, ttfb, time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def run_level(port: int, endpoint: str, concurrency: int, requests: int, timeout: float) -> dict:
+    """Run ``requests`` generations on ``endpoint`` from ``concurrency`` virtual users."""
+    latencies, ttfbs = [], []
+    statuses = {"ok": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    per_user = max(1, requests // concurrency)
+
+    def user(index):
+        for n in range(per_user):
+            prompt = f"Yük testi {endpoint} c{concurrency} u{index} #{n}"
+            try:
+                status, ttfb, total = _request(port, endpoint, prompt, f"bench-{index}", timeout)
+            except (OSError, http.client.HTTPException):
+                status, ttfb, total = None, None, None
+            with lock:
+                if status == 200:
+                    statuses["ok"] += 1
+                    latencies.append(total)
+                    ttfbs.append(ttfb)
+                elif status == 429:
+                    statuses["rejected"] += 1
+                else:
+                    statuses["errors"] += 1
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(user, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": per_user * concurrency,
+        **statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(statuses["ok"] / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "ttfb_ms": summarize(ttfbs),
+        "rss_mb": rss_mb(),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _free_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+def run(concurrency=(1, 2, 4, 8, 16), requests: int = 16, endpoints=DEFAULT_ENDPOINTS,
+        latency: float = 0.0, tokens_per_sec: float = 0.0, tokens: int = 200, slots: int = None,
+        mock: bool = False, timeout: float = 300.0) -> dict:
+    """Run the load test and return the report document."""
+    sites_dir = tempfile.mkdtemp(prefix="bench_sites_")
+    # set before importing the app so its /sites mount points at the throwaway root too
+    overrides = {"AI_SITE_GENERATOR_CACHE": "false", "AI_SITE_GENERATOR_SITES_DIR": sites_dir,
+                 "AI_SITE_GENERATOR_MOCK": "true" if mock else "false"}
+    saved = {name: os.environ.get(name) for name in overrides}
+    os.environ.update(overrides)
+
+    import uvicorn  # type: ignore[reportMissingImports]
+
+    from backend.app import app
+    from backend.jobs import JobScheduler, set_scheduler
+    from backend.llm_backends import OllamaHTTPBackend, set_backend
+    from backend.site_storage import SiteStorage, set_storage
+
+    fake = FakeOllamaServer(sized_responder(tokens), latency=latency, tokens_per_sec=tokens_per_sec).start()
+    backend = OllamaHTTPBackend(host=fake.url, model="bench-model")
+    scheduler = JobScheduler(slots=slots, max_queue=max(concurrency) * 2, max_queue_per_client=2)
+    previous = (set_backend(backend), set_storage(SiteStorage(root=sites_dir)), set_scheduler(scheduler))
+    sock = _free_socket()
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    try:
+        while not server.started:
+            time.sleep(0.01)
+        port = sock.getsockname()[1]
+        results = [run_level(port, endpoint, level, max(requests, level), timeout)
+                   for endpoint in endpoints for level in concurrency]
+        settings = {"concurrency": list(concurrency), "requests": requests, "endpoints": list(endpoints),
+                    "latency_s": latency, "tokens_per_sec": tokens_per_sec, "tokens": tokens, "mock": mock,
+                    "slots": scheduler.slots}
+        return report("load", settings, results)
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        sock.close()
+        fake.stop()
+        backend.close()
+        set_backend(previous[0])
+        set_storage(previous[1])
+        set_scheduler(previous[2])
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(sites_dir, ignore_errors=True)
+
+
+def _ints(text: str):
+    return tuple(int(part) for part in text.split(",") if part.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the generation endpoints against a fake Ollama server.")
+    parser.add_argument("--concurrency", type=_ints, default=(1, 2, 4, 8, 16), help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=16, help="requests per level (at least one per user)")
+    parser.add_argument("--endpoints", default=",".join(DEFAULT_ENDPOINTS),
+                        help="comma-separated endpoints, e.g. /generate,/api/generate,/api/generate/stream")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake model first-token latency (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="fake model token rate (0 = unpaced)")
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per fake model response")
+    parser.add_argument("--slots", type=int, default=None, help="model slots (default: AI_SITE_GENERATOR_MODEL_SLOTS)")
+    parser.add_argument("--mock", action="store_true", help="use mock templates instead of the fake model")
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    doc = run(args.concurrency, args.requests, tuple(e for e in args.endpoints.split(",") if e),
+              args.latency, args.tokens_per_sec, args.tokens, args.slots, args.mock)
+    write_report(doc, args.output)
+
+
+if __name__ == "__main__":
+    main()
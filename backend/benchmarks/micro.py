@@ -0,0 +1,93 @@
+"""Microbenchmarks of HTML post-processing and template rendering.
+
+Cases, each at several document sizes:
+    ensure_meta_in_head   site_generator._ensure_meta_in_head (meta fixer only)
+    postprocess_html      the full single-pass fixer chain
+    render_template       mock template rendering (prompt size varies)
+    compiled_template     CompiledTemplate.render of a synthetic body with many slots
+
+Times are per call in microseconds (median and best of ``--repeat`` runs,
+each sized by ``timeit.Timer.autorange`` to last at least ``--min-time``).
+
+    python -m backend.benchmarks.micro --sizes 1024,65536 --output bench/micro.json
+"""
+import argparse
+import statistics
+import timeit
+
+from backend.benchmarks import report, write_report
+
+DEFAULT_SIZES = (1024, 16 * 1024, 128 * 1024, 1024 * 1024)
+
+
+def make_document(size: int) -> str:
+    """A model-like HTML document of about ``size`` bytes with its meta tags misplaced in <body>."""
+    head = "<!DOCTYPE html>\n<html lang=\"tr\">\n<head>\n<title>Bench</title>\n</head>\n<body>\n"
+    metas = ("<meta charset=\"UTF-8\">\n"
+             "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1.0\">\n")
+    section = ("<section class=\"card\" id=\"s{n}\"><h2>Başlık {n}</h2><p>Lorem ipsum dolor sit amet, "
+               "consectetur adipiscing elit.</p><a href=\"#s{n}\" class=\"btn\">Devam</a></section>\n")
+    tail = "<script>console.log('<b>');</script>\n</body>\n</html>"
+    parts, length, n = [head, metas], len(head) + len(metas) + len(tail), 0
+    while length < size:
+        chunk = section.format(n=n)
+        parts.append(chunk)
+        length += len(chunk)
+        n += 1
+    parts.append(tail)
+    return "".join(parts)
+
+
+def _time(func, repeat: int, min_time: float) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    # autorange targets 0.2s; scale to the requested minimum run time
+    number = max(1, int(number * max(min_time, 0.001) / 0.2))
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"us_per_op": round(statistics.median(runs), 3), "best_us": round(min(runs), 3), "number": number}
+
+
+def run(sizes=DEFAULT_SIZES, repeat: int = 5, min_time: float = 0.2) -> dict:
+    from backend.html_postprocess import postprocess_html
+    from backend.site_generator import _ensure_meta_in_head, _get_mock_templates
+    from backend.template_registry import CompiledTemplate
+
+    results = []
+
+    def add(name, size, func):
+        results.append({"name": name, "size": size, **_time(func, repeat, min_time)})
+
+    for size in sizes:
+        doc = make_document(size)
+        add("ensure_meta_in_head", size, lambda: _ensure_meta_in_head(doc))
+        add("postprocess_html", size, lambda: postprocess_html(doc))
+
+    for size in sizes:
+        # the prompt is the only variable part of a mock render
+        prompt = ("Diyetisyen <sitesi> için 'modern' tasarım\n" * (size // 40 + 1))[:size]
+        add("render_template", size, lambda: _get_mock_templates(prompt, "creative"))
+
+    for size in sizes:
+        body = make_document(size).replace("Başlık", "{PROMPT}")
+        compiled = CompiledTemplate(body)
+        add("compiled_template", size, lambda: compiled.render({"PROMPT": "Kafe & Pastane"}))
+
+    return report("micro", {"sizes": list(sizes), "repeat": repeat, "min_time_s": min_time}, results)
+
+
+def _ints(text: str):
+    return tuple(int(part) for part in text.split(",") if part.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark post-processing and template rendering.")
+    parser.add_argument("--sizes", type=_ints, default=DEFAULT_SIZES, help="comma-separated document sizes (bytes)")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timing run")
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    write_report(run(args.sizes, args.repeat, args.min_time), args.output)
+
+
+if __name__ == "__main__":
+    main()
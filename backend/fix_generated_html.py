@@ -1,39 +1,145 @@
-"""Utility: fix existing generated index.html files by ensuring charset/viewport in <head>.
+"""Utility: fix existing generated index.html files with the single-pass post-processor.
+
+Files are processed in parallel with a process pool. A manifest of
+(mtime, size, sha256) per file lets repeat sweeps skip sites that have not
+changed since they were last checked.
 
 Run from project root:
-    python backend/fix_generated_html.py
+    python backend/fix_generated_html.py [--workers N] [--force] [--verbose]
 """
-import glob
+import argparse
+import hashlib
+import json
 import os
-from backend.site_generator import _ensure_meta_in_head
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# allow `python backend/fix_generated_html.py` from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.html_postprocess import POSTPROCESS_VERSION, postprocess_html
+from backend.site_server import precompress_file, write_atomic
+
+DEFAULT_MANIFEST = os.path.join("backend", ".fix_manifest.json")
+_SKIP_DIRS = {"node_modules", ".git", ".venv", "venv", "__pycache__"}
 
 
 def find_generated_index_files(root_dir: str):
     """Find index.html files under any generated_sites directory inside root_dir."""
-    pattern = os.path.join(root_dir, "**", "generated_sites", "**", "index.html")
-    return glob.glob(pattern, recursive=True)
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames[:] = [d for d in dirnames if d not in _SKIP_DIRS and not d.startswith(".")]
+        if "generated_sites" not in dirnames:
+            continue
+        dirnames.remove("generated_sites")
+        for site_root, site_dirs, site_files in os.walk(os.path.join(dirpath, "generated_sites")):
+            site_dirs[:] = [d for d in site_dirs if not d.startswith(".")]
+            if "index.html" in site_files:
+                found.append(os.path.join(site_root, "index.html"))
+    return found
 
 
-def main():
-    root = os.getcwd()
-    files = find_generated_index_files(root)
-    if not files:
-        print("No generated index.html files found.")
-        return
+def load_manifest(path: str) -> dict:
+    """Return ``{file: [mtime_ns, size, sha256]}``; empty if missing or from another fixer version."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != POSTPROCESS_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(path: str, files: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": POSTPROCESS_VERSION, "files": files}, f)
+    os.replace(tmp, path)
+
 
+def fix_file(task):
+    """Worker: post-process one file. Returns ``(path, status, entry_or_error)``."""
+    path, known_hash = task
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest == known_hash:
+            # touched but unchanged since the last sweep
+            st = os.stat(path)
+            return path, "ok", [st.st_mtime_ns, st.st_size, digest]
+        html = raw.decode("utf-8")
+        fixed = postprocess_html(html)
+        status = "ok"
+        if fixed != html:
+            raw = fixed.encode("utf-8")
+            digest = hashlib.sha256(raw).hexdigest()
+            # replace rather than rewrite: the file may be hard-linked to a shared blob
+            write_atomic(path, raw)
+            # keep the served .gz/.br variants in sync with the fixed file; the serving cache
+            # lives in the server process, so warming this worker's copy would be wasted
+            precompress_file(path, raw, warm=False)
+            status = "fixed"
+        st = os.stat(path)
+        return path, status, [st.st_mtime_ns, st.st_size, digest]
+    except Exception as e:
+        return path, "error", str(e)
+
+
+def sweep(root: str, manifest_path: str = DEFAULT_MANIFEST, workers: int = None, force: bool = False, verbose: bool = False):
+    """Fix every changed index.html under root; returns counts per status."""
+    files = find_generated_index_files(root)
+    manifest = {} if force else load_manifest(manifest_path)
+    counts = {"fixed": 0, "ok": 0, "skipped": 0, "error": 0}
+    tasks, seen = [], {}
     for path in files:
+        key = os.path.relpath(path, root)
+        entry = manifest.get(key)
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                html = f.read()
-            fixed = _ensure_meta_in_head(html)
-            if fixed != html:
-                with open(path, "w", encoding="utf-8") as f:
-                    f.write(fixed)
-                print(f"Fixed: {path}")
-            else:
-                print(f"OK: {path}")
-        except Exception as e:
-            print(f"Error processing {path}: {e}")
+            st = os.stat(path)
+        except OSError:
+            continue
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            seen[key] = entry
+            counts["skipped"] += 1
+            continue
+        tasks.append((path, entry[2] if entry else None))
+
+    if tasks:
+        chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, status, result in pool.map(fix_file, tasks, chunksize=chunksize):
+                counts[status] += 1
+                if status == "error":
+                    print(f"Error processing {path}: {result}")
+                    continue
+                seen[os.path.relpath(path, root)] = result
+                if status == "fixed":
+                    print(f"Fixed: {path}")
+                elif verbose:
+                    print(f"OK: {path}")
+
+    # entries for deleted sites drop out because only files found this run are kept
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    save_manifest(manifest_path, seen)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fix generated index.html files in parallel.")
+    parser.add_argument("--root", default=os.getcwd(), help="directory to scan (default: cwd)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="hash/mtime manifest path")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and re-check every file")
+    parser.add_argument("--verbose", action="store_true", help="also list files that needed no changes")
+    args = parser.parse_args(argv)
+
+    counts = sweep(args.root, args.manifest, args.workers, args.force, args.verbose)
+    if not any(counts.values()):
+        print("No generated index.html files found.")
+        return
+    print(f"Fixed: {counts['fixed']}, OK: {counts['ok']}, unchanged (skipped): {counts['skipped']}, errors: {counts['error']}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,240 @@
+"""Content-addressed cache for generated site artifacts.
+
+Entries are keyed on a hash of the normalized prompt, template, premium
+guidance text and model name, and hold the ``(html, css, js)`` tuple the
+model produced. There are two bounded tiers: an in-memory LRU and an
+on-disk directory of JSON files evicted least-recently-used first.
+Concurrent identical requests are coalesced so only one of them runs the
+model while the others wait for its result.
+
+Environment variables:
+    AI_SITE_GENERATOR_CACHE          enable the cache        (default: true)
+    AI_SITE_GENERATOR_CACHE_ENTRIES  in-memory entries       (default: 128)
+    AI_SITE_GENERATOR_CACHE_DIR      on-disk tier directory  (default: backend/.generation_cache)
+    AI_SITE_GENERATOR_CACHE_DISK_MB  on-disk tier size limit (default: 256, 0 disables the disk tier)
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class GenerationCancelled(Exception):
+    """Raised to abandon a generation; coalesced waiters retry instead of failing."""
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially different prompts share a cache entry."""
+    return " ".join((prompt or "").split())
+
+
+def cache_key(prompt: str, template: str, guidance: str, model: str) -> str:
+    """Return the hex digest identifying a generation request."""
+    material = json.dumps([normalize_prompt(prompt), template or "", guidance or "", model or ""],
+                          ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Two-tier (memory + disk) LRU cache with in-flight request coalescing."""
+
+    def __init__(self, max_entries: int = 128, disk_dir: str = None, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir if max_disk_bytes > 0 else None
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._disk_index = None  # OrderedDict key -> size, least recently used first
+        self._disk_bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    # -- memory tier -------------------------------------------------------
+    def _memory_get(self, key):
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # -- disk tier ---------------------------------------------------------
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _load_disk_index(self):
+        """Scan the disk tier once, ordering entries by modification time."""
+        if self._disk_index is not None:
+            return
+        entries = []
+        os.makedirs(self.disk_dir, exist_ok=True)
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".json") and entry.is_file():
+                    st = entry.stat()
+                    entries.append((st.st_mtime, entry.name[:-5], st.st_size))
+        entries.sort()
+        self._disk_index = OrderedDict((key, size) for _, key, size in entries)
+        self._disk_bytes = sum(self._disk_index.values())
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        self._load_disk_index()
+        if key not in self._disk_index:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = tuple(json.load(f))
+            os.utime(path)
+        except (OSError, ValueError):
+            self._disk_bytes -= self._disk_index.pop(key, 0)
+            return None
+        self._disk_index.move_to_end(key)
+        return value
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        self._load_disk_index()
+        data = json.dumps(list(value), ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_disk_bytes:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._disk_bytes += len(data) - self._disk_index.pop(key, 0)
+        self._disk_index[key] = len(data)
+        while self._disk_bytes > self.max_disk_bytes and self._disk_index:
+            old_key, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    # -- public API --------------------------------------------------------
+    def get(self, key):
+        """Return cached artifacts for ``key`` or None."""
+        with self._lock:
+            value = self._memory_get(key)
+            if value is None:
+                value = self._disk_get(key)
+                if value is not None:
+                    self._memory_put(key, value)
+            if value is not None:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        value = tuple(value)
+        with self._lock:
+            self._memory_put(key, value)
+            self._disk_put(key, value)
+
+    def claim(self, key):
+        """Non-blocking lookup that coalesces with in-flight generations.
+
+        Returns ``("hit", value)``, ``("wait", future)`` when an identical
+        generation is running (its future yields the artifacts), or
+        ``("own", future)`` when the caller must generate and then call
+        :meth:`complete` or :meth:`fail` with that future.
+        """
+        value = self.get(key)
+        if value is not None:
+            return "hit", value
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                self.hits += 1
+                return "hit", value
+            future = self._inflight.get(key)
+            if future is not None:
+                return "wait", future
+            future = Future()
+            self._inflight[key] = future
+            self.misses += 1
+            return "own", future
+
+    def complete(self, key, future, value):
+        """Store the owner's result and wake the waiters."""
+        value = tuple(value)
+        with self._lock:
+            # publish before waking waiters so late arrivals hit the memory tier
+            self._memory_put(key, value)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        with self._lock:
+            self._disk_put(key, value)
+        return value
+
+    def fail(self, key, future, error: BaseException):
+        """Release an owned generation; waiters get ``error`` (GenerationCancelled makes them retry)."""
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_exception(error)
+
+    def get_or_generate(self, key, producer):
+        """Return cached artifacts or run ``producer()`` once for all concurrent callers."""
+        state, found = self.claim(key)
+        if state == "hit":
+            return found
+        if state == "wait":
+            try:
+                return found.result()
+            except GenerationCancelled:
+                # the owning request gave up; take over the generation
+                return self.get_or_generate(key, producer)
+        try:
+            value = producer()
+        except BaseException as e:
+            self.fail(key, found, e)
+            raise
+        return self.complete(key, found, value)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    return os.getenv("AI_SITE_GENERATOR_CACHE", "true").lower() in ("1", "true", "yes")
+
+
+def get_cache() -> GenerationCache:
+    """Return the process-wide generation cache, configured from the environment."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GenerationCache(
+                    max_entries=int(os.getenv("AI_SITE_GENERATOR_CACHE_ENTRIES", "128")),
+                    disk_dir=os.getenv("AI_SITE_GENERATOR_CACHE_DIR", os.path.join("backend", ".generation_cache")),
+                    max_disk_bytes=int(float(os.getenv("AI_SITE_GENERATOR_CACHE_DISK_MB", "256")) * 1024 * 1024),
+                )
+    return _cache
+
+
+def set_cache(cache):
+    """Install ``cache`` as the process-wide cache; returns the previous one."""
+    global _cache
+    with _cache_lock:
+        previous, _cache = _cache, cache
+    return previous
@@ -0,0 +1,244 @@
+"""Single-pass post-processing for generated HTML.
+
+The document is tokenized once (tags, comments, text; ``<script>``/``<style>``
+bodies are kept as raw text) and every token is shown to a chain of
+fixers in the same traversal. Fixers can drop or rewrite tokens and ask
+for content to be added to ``<head>`` or the end of ``<body>``; those
+insertions are spliced in when the output is joined, so the cost stays
+linear in the document size however many repairs are needed.
+
+Default fixers:
+    MarkdownFenceFixer  strip stray ```html fences the model wraps output in
+    MetaHeadFixer       move charset/viewport <meta> tags to the top of <head>
+    AssetLinkFixer      make sure style.css and index.js are linked
+"""
+import re
+
+# bump when fixer behaviour changes so sweep manifests are invalidated
+POSTPROCESS_VERSION = 3
+
+_TOKEN = re.compile(
+    r"<!--.*?(?:-->|$)"                   # comment
+    r"|<![^>]*>"                          # doctype / declaration
+    r"|<(/?)([a-zA-Z][\w:-]*)([^>]*)>"    # start or end tag
+    r"|[^<]+"                             # text
+    r"|<",                                # stray '<'
+    re.DOTALL,
+)
+_RAW_TEXT_TAGS = ("script", "style")
+_FENCE_LINE = re.compile(r"^[ \t]*```[\w+-]*[ \t]*(?:\r?\n|$)", re.MULTILINE)
+_ATTR = r"""\b{name}\s*=\s*["']?([^"'\s>]+)"""
+
+
+class Token:
+    """A piece of the document. ``kind`` is text, raw, start, end, comment or decl."""
+
+    __slots__ = ("kind", "text", "tag", "attrs")
+
+    def __init__(self, kind, text, tag=None, attrs=""):
+        self.kind = kind
+        self.text = text
+        self.tag = tag
+        self.attrs = attrs
+
+    def attr(self, name):
+        m = re.search(_ATTR.format(name=name), self.attrs, flags=re.IGNORECASE)
+        return m.group(1) if m else None
+
+
+def tokenize(html: str):
+    """Yield :class:`Token` objects covering ``html`` exactly."""
+    pos, n = 0, len(html)
+    while pos < n:
+        m = _TOKEN.match(html, pos)
+        text = m.group(0)
+        pos = m.end()
+        if text.startswith("<!--"):
+            yield Token("comment", text)
+        elif text.startswith("<!"):
+            yield Token("decl", text)
+        elif m.group(2):
+            tag = m.group(2).lower()
+            if m.group(1):
+                yield Token("end", text, tag)
+            else:
+                yield Token("start", text, tag, m.group(3))
+                if tag in _RAW_TEXT_TAGS and not text.endswith("/>"):
+                    end = re.compile(rf"</{tag}\s*>", re.IGNORECASE).search(html, pos)
+                    stop = end.start() if end else n
+                    if stop > pos:
+                        yield Token("raw", html[pos:stop])
+                    pos = stop
+        else:
+            yield Token("text", text)
+
+
+def strip_markdown_fences(text: str) -> str:
+    """Remove ``` fence lines (with optional language) from model output."""
+    if "```" not in text:
+        return text
+    return _FENCE_LINE.sub("", text)
+
+
+class Fixer:
+    """Base fixer. ``feed`` returns the token (possibly rewritten) or None to drop it."""
+
+    def __init__(self):
+        self.head_prepend = []  # inserted right after <head>
+        self.head_append = []   # inserted right before </head>
+        self.body_append = []   # inserted right before </body>
+
+    def feed(self, token: Token):
+        return token
+
+    def finish(self):
+        pass
+
+
+class MarkdownFenceFixer(Fixer):
+    """Drop ```html / ``` fence lines appearing in document text."""
+
+    def feed(self, token):
+        if token.kind == "text" and "```" in token.text:
+            token.text = strip_markdown_fences(token.text)
+            if not token.text:
+                return None
+        return token
+
+
+class MetaHeadFixer(Fixer):
+    """Collect charset/viewport metas wherever they are and emit them first in <head>.
+
+    Metas already at the top of <head> (only whitespace or other such metas
+    before them) are left where they are, so running the fixer again is a no-op.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._seen = set()
+        self._head_top = False
+
+    def feed(self, token):
+        if token.kind == "start" and token.tag == "meta":
+            attrs = token.attrs.lower()
+            viewport = re.search(r"""name=['"]viewport['"]""", attrs)
+            if "charset" in attrs or viewport:
+                if token.text in self._seen:
+                    return None
+                self._seen.add(token.text)
+                if self._head_top:
+                    return token
+                self.head_prepend.append(token.text)
+                return None
+        if token.kind == "start" and token.tag == "head":
+            self._head_top = True
+        elif not (token.kind == "text" and token.text.isspace()):
+            self._head_top = False
+        return token
+
+
+def _local_path(url: str) -> str:
+    """``./style.css?v=1``, ``/style.css#x`` -> ``style.css``, for comparing asset references."""
+    path = re.split(r"[?#]", url or "", maxsplit=1)[0]
+    while path.startswith(("./", "/")):
+        path = path[2:] if path.startswith("./") else path[1:]
+    return path
+
+
+class AssetLinkFixer(Fixer):
+    """Link style.css in <head> and index.js before </body> when the model forgot to."""
+
+    def __init__(self, stylesheet: str = "style.css", script: str = "index.js"):
+        super().__init__()
+        self.stylesheet = stylesheet
+        self.script = script
+        self._has_stylesheet = False
+        self._has_script = False
+
+    def feed(self, token):
+        if token.kind == "start":
+            if token.tag == "link" and _local_path(token.attr("href")) == _local_path(self.stylesheet):
+                self._has_stylesheet = True
+            elif token.tag == "script" and _local_path(token.attr("src")) == _local_path(self.script):
+                self._has_script = True
+        return token
+
+    def finish(self):
+        if not self._has_stylesheet:
+            self.head_append.append(f'<link rel="stylesheet" href="{self.stylesheet}">')
+        if not self._has_script:
+            self.body_append.append(f'<script src="{self.script}"></script>')
+
+
+DEFAULT_FIXERS = (MarkdownFenceFixer, MetaHeadFixer, AssetLinkFixer)
+
+
+def postprocess_html(html: str, fixers=DEFAULT_FIXERS) -> str:
+    """Run ``fixers`` (classes) over ``html`` in one traversal and return the result."""
+    if not isinstance(html, str) or not html.strip():
+        return html
+    chain = [cls() for cls in fixers]
+    out = []
+    head_open = head_close = html_open = body_close = html_close = None
+    for token in tokenize(html):
+        for fixer in chain:
+            token = fixer.feed(token)
+            if token is None:
+                break
+        if token is None:
+            continue
+        if token.kind == "start":
+            if token.tag == "head" and head_open is None:
+                head_open = len(out)
+            elif token.tag == "html" and html_open is None:
+                html_open = len(out)
+        elif token.kind == "end":
+            if token.tag == "head" and head_close is None and head_open is not None:
+                head_close = len(out)
+            elif token.tag == "body":
+                body_close = len(out)
+            elif token.tag == "html":
+                html_close = len(out)
+        out.append(token.text)
+
+    for fixer in chain:
+        fixer.finish()
+    prepend = [t for f in chain for t in f.head_prepend]
+    append = [t for f in chain for t in f.head_append]
+    body = [t for f in chain for t in f.body_append]
+    if not (prepend or append or body):
+        return "".join(out)
+
+    if not out:
+        out.append("")
+    # insertions keyed by output position: before[i] goes before out[i], after[i] after it
+    before, after = {}, {}
+    if body:
+        snippet = "\n".join(body) + "\n"
+        target = body_close if body_close is not None else html_close
+        if target is not None:
+            before.setdefault(target, []).append(snippet)
+        else:
+            after.setdefault(len(out) - 1, []).append("\n" + snippet)
+    if head_open is not None:
+        if prepend:
+            after.setdefault(head_open, []).append("\n" + "\n".join(prepend))
+        if append:
+            snippet = "\n".join(append) + "\n"
+            if head_close is not None:
+                before.setdefault(head_close, []).append(snippet)
+            else:
+                after.setdefault(head_open, []).append("\n" + snippet)
+    else:
+        head = "<head>\n" + "\n".join(prepend + append) + "\n</head>"
+        if html_open is not None:
+            after.setdefault(html_open, []).insert(0, "\n" + head)
+        else:
+            before.setdefault(0, []).insert(0, head + "\n")
+
+    parts = []
+    for i, text in enumerate(out):
+        parts.extend(before.get(i, ()))
+        parts.append(text)
+        parts.extend(after.get(i, ()))
+    return "".join(parts)
@@ -0,0 +1,381 @@
+"""Bounded job scheduler for generation requests.
+
+Generation work is submitted as jobs and executed by a fixed number of
+worker tasks ("model slots"), so a burst of requests queues up instead of
+oversubscribing the local model. Jobs are ordered by priority and served
+round-robin across clients; queue depth is bounded globally and per client
+(:class:`QueueFullError` maps to HTTP 429). Jobs that nobody polls any more
+are cancelled at the next stage boundary.
+
+Job functions run in a worker thread and receive the :class:`Job` as their
+first argument; they report progress with ``job.emit(event)``, which also
+raises :class:`JobCancelled` once the job has been cancelled.
+
+Environment variables:
+    AI_SITE_GENERATOR_MODEL_SLOTS           concurrent jobs            (default: 1)
+    AI_SITE_GENERATOR_MAX_QUEUE             queued jobs, all clients   (default: 32)
+    AI_SITE_GENERATOR_MAX_QUEUE_PER_CLIENT  queued jobs per client     (default: 8)
+    AI_SITE_GENERATOR_JOB_ABANDON_SECONDS   cancel unpolled jobs after (default: 60)
+    AI_SITE_GENERATOR_JOB_RETAIN_SECONDS    keep finished jobs for     (default: 900)
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from backend import metrics
+from backend.generation_cache import GenerationCancelled
+
+QUEUE_WAIT_SECONDS = metrics.histogram("ai_site_generator_job_queue_wait_seconds",
+                                       "Time jobs spend queued before a model slot picks them up.")
+JOBS = metrics.counter("ai_site_generator_jobs_total", "Finished jobs by status.", ("status",))
+metrics.gauge("ai_site_generator_jobs_running", "Jobs holding a model slot.",
+              function=lambda: get_scheduler().running)
+metrics.gauge("ai_site_generator_jobs_queued", "Jobs waiting for a model slot.",
+              function=lambda: get_scheduler().queue_depth)
+
+
+class QueueFullError(Exception):
+    """Raised by :meth:`JobScheduler.submit` when the queue limit is reached."""
+
+
+class JobCancelled(GenerationCancelled):
+    """Raised inside a running job once it has been cancelled or abandoned."""
+
+
+class Job:
+    """A unit of generation work tracked by the scheduler."""
+
+    def __init__(self, func, args, kwargs, client: str, priority: int, detached: bool, abandon_after: float):
+        self.id = uuid.uuid4().hex
+        self.client = client
+        self.priority = priority
+        self.detached = detached
+        self.status = "queued"
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.last_seen = time.monotonic()
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._abandon_after = abandon_after
+        self._cancelled = threading.Event()
+        self._future = None
+        self._listeners = []
+
+    @property
+    def future(self) -> asyncio.Future:
+        """Resolves with the result, or raises, once the job finishes."""
+        return self._future
+
+    @property
+    def queue_wait(self):
+        """Seconds spent queued before a slot picked the job up."""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.created_at
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def abandoned(self) -> bool:
+        return self.detached and time.monotonic() - self.last_seen > self._abandon_after
+
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def emit(self, event: dict):
+        """Record a progress event and forward it to subscribers (thread-safe)."""
+        if self.abandoned():
+            self._cancelled.set()
+        if self._cancelled.is_set():
+            raise JobCancelled(f"İş iptal edildi: {self.id}")
+        if event.get("event") == "stage":
+            self.stage = event.get("stage")
+        for loop, q in self._listeners:
+            loop.call_soon_threadsafe(q.put_nowait, event)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Return a queue receiving this job's events, then ``None`` when it finishes."""
+        q = asyncio.Queue()
+        self._listeners.append((asyncio.get_running_loop(), q))
+        return q
+
+    def _finish(self, status: str, result=None, error=None):
+        JOBS.inc(status=status)
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        for loop, q in self._listeners:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(q.put_nowait, None)
+        if self._future is not None:
+            if status == "done":
+                outcome = (self._future.set_result, result)
+            elif status == "cancelled":
+                outcome = (self._future.set_exception, JobCancelled(f"İş iptal edildi: {self.id}"))
+            else:
+                outcome = (self._future.set_exception, RuntimeError(error))
+            self._resolve(*outcome)
+
+    def _resolve(self, setter, value):
+        """Settle the future on its own loop (which may be another, or a closed, loop)."""
+        loop = self._future.get_loop()
+        if loop.is_closed():
+            return
+
+        def settle():
+            if not self._future.done():
+                setter(value)
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            settle()
+        else:
+            loop.call_soon_threadsafe(settle)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "client": self.client,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait": self.queue_wait,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """Priority + per-client round-robin scheduler with a fixed number of slots."""
+
+    def __init__(self, slots: int = None, max_queue: int = None, max_queue_per_client: int = None,
+                 abandon_after: float = None, retain: float = None):
+        env = os.getenv
+        self.slots = slots or int(env("AI_SITE_GENERATOR_MODEL_SLOTS", "1"))
+        self.max_queue = max_queue or int(env("AI_SITE_GENERATOR_MAX_QUEUE", "32"))
+        self.max_queue_per_client = max_queue_per_client or int(env("AI_SITE_GENERATOR_MAX_QUEUE_PER_CLIENT", "8"))
+        self.abandon_after = abandon_after or float(env("AI_SITE_GENERATOR_JOB_ABANDON_SECONDS", "60"))
+        self.retain = retain or float(env("AI_SITE_GENERATOR_JOB_RETAIN_SECONDS", "900"))
+        self.running = 0
+        self._jobs = OrderedDict()
+        self._queues = {}  # client -> heap of (-priority, seq, job)
+        self._rotation = []  # clients with queued jobs, round-robin order
+        self._queued = 0
+        self._client_queued = {}  # client -> queued jobs
+        self._seq = itertools.count()
+        self._loop = None
+        self._ready = None
+        self._workers = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    # -- lifecycle ---------------------------------------------------------
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # first use, or the previous event loop is gone: drop its queued jobs
+        for job in list(self._jobs.values()):
+            if job.status == "queued":
+                job._cancelled.set()
+                job._finish("cancelled")
+        self._queues.clear()
+        self._rotation.clear()
+        self._queued = 0
+        self._client_queued.clear()
+        self.running = 0
+        self._loop = loop
+        self._ready = asyncio.Semaphore(0)
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.slots)]
+
+    async def shutdown(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+
+    def _purge(self):
+        """Forget finished jobs older than the retention window."""
+        cutoff = time.time() - self.retain
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    # -- queue -------------------------------------------------------------
+    def submit(self, func, *args, client: str = "anonymous", priority: int = 0, detached: bool = False, **kwargs) -> Job:
+        """Queue ``func(job, *args, **kwargs)``; raises QueueFullError when over the limits."""
+        self._ensure_workers()
+        self._purge()
+        if self._queued >= self.max_queue or self._client_queued.get(client, 0) >= self.max_queue_per_client:
+            # abandoned jobs deeper in the heaps must not hold the limits
+            self._discard_abandoned()
+        if self._queued >= self.max_queue:
+            raise QueueFullError("Kuyruk dolu. Lütfen daha sonra tekrar deneyin.")
+        if self._client_queued.get(client, 0) >= self.max_queue_per_client:
+            raise QueueFullError("Bu istemci için kuyruk dolu. Lütfen daha sonra tekrar deneyin.")
+        heap = self._queues.get(client)
+
+        job = Job(func, args, kwargs, client, priority, detached, self.abandon_after)
+        # the job runs in the submitter's context (request timing, see metrics.span)
+        job._context = contextvars.copy_context()
+        job._future = self._loop.create_future()
+        self._jobs[job.id] = job
+        if heap is None:
+            heap = self._queues[client] = []
+            self._rotation.append(client)
+        heapq.heappush(heap, (-priority, next(self._seq), job))
+        self._queued += 1
+        self._client_queued[client] = self._client_queued.get(client, 0) + 1
+        self._ready.release()
+        return job
+
+    def _dequeued(self, job):
+        """Account for a job leaving the queued state."""
+        self._queued -= 1
+        left = self._client_queued.get(job.client, 0) - 1
+        if left > 0:
+            self._client_queued[job.client] = left
+        else:
+            self._client_queued.pop(job.client, None)
+
+    def _abandon(self, job):
+        # abandoned while waiting for a slot
+        self._dequeued(job)
+        job._cancelled.set()
+        job._finish("cancelled")
+
+    def _discard_stale(self, heap):
+        """Pop cancelled or abandoned jobs off the head of a client heap."""
+        while heap:
+            job = heap[0][2]
+            if job.status == "queued" and not job.abandoned():
+                return
+            heapq.heappop(heap)
+            if job.status == "queued":
+                self._abandon(job)
+
+    def _discard_abandoned(self):
+        """Cancel abandoned jobs anywhere in the queue (not only at the heads)."""
+        for client, heap in self._queues.items():
+            kept = []
+            for entry in heap:
+                job = entry[2]
+                if job.status == "queued" and job.abandoned():
+                    self._abandon(job)
+                elif job.status == "queued":
+                    kept.append(entry)
+            if len(kept) != len(heap):
+                heapq.heapify(kept)
+                heap[:] = kept
+
+    def _pop(self):
+        """Pick the highest-priority head job, rotating between clients on ties."""
+        for client in list(self._rotation):
+            self._discard_stale(self._queues[client])
+            if not self._queues[client]:
+                self._rotation.remove(client)
+                del self._queues[client]
+        if not self._rotation:
+            return None
+        top = min(self._queues[c][0][0] for c in self._rotation)
+        client = next(c for c in self._rotation if self._queues[c][0][0] == top)
+        job = heapq.heappop(self._queues[client])[2]
+        self._dequeued(job)
+        # served clients move to the back of the rotation
+        self._rotation.remove(client)
+        if self._queues[client]:
+            self._rotation.append(client)
+        else:
+            del self._queues[client]
+        return job
+
+    async def _worker(self):
+        while True:
+            await self._ready.acquire()
+            job = self._pop()
+            if job is None:
+                continue
+            job.status = "running"
+            job.started_at = time.time()
+            QUEUE_WAIT_SECONDS.observe(job.queue_wait)
+            self.running += 1
+            try:
+                result = await asyncio.to_thread(job._context.run, job._func, job, *job._args, **job._kwargs)
+            except JobCancelled:
+                job._finish("cancelled")
+            except Exception as e:
+                job._finish("error", error=str(e))
+            else:
+                job._finish("done", result=result)
+            finally:
+                self.running -= 1
+
+    # -- queries -----------------------------------------------------------
+    def get(self, job_id: str):
+        """Return the job (marking it as polled) or None."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.touch()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it is unknown or finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished_at is not None:
+            return False
+        job._cancelled.set()
+        if job.status == "queued":
+            # the heap entry is discarded lazily by _pop
+            self._dequeued(job)
+            job._finish("cancelled")
+        return True
+
+    async def run(self, func, *args, client: str = "anonymous", priority: int = 0, **kwargs):
+        """Submit an attached job and wait for its result.
+
+        If the awaiting request goes away the job is cancelled.
+        """
+        job = self.submit(func, *args, client=client, priority=priority, **kwargs)
+        try:
+            return await asyncio.shield(job._future)
+        except asyncio.CancelledError:
+            self.cancel(job.id)
+            raise
+
+
+_scheduler = None
+
+
+def get_scheduler() -> JobScheduler:
+    """Return the process-wide scheduler, configured from the environment."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = JobScheduler()
+    return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Install ``scheduler`` as the process-wide scheduler; returns the previous one."""
+    global _scheduler
+    previous, _scheduler = _scheduler, scheduler
+    return previous
@@ -0,0 +1,393 @@
+"""Pluggable LLM backends used by the site generator.
+
+The default backend talks to the Ollama HTTP API over a small pool of
+keep-alive connections and pins the model in memory with ``keep_alive``.
+The original ``ollama run`` CLI path is kept as a fallback, and any object
+implementing :class:`LLMBackend` can be installed with :func:`set_backend`
+(tests use this to point the generator at a local fake server).
+
+Environment variables:
+    AI_SITE_GENERATOR_LLM_BACKEND  auto | http | cli   (default: auto)
+    AI_SITE_GENERATOR_MODEL        model name           (default: codellama:7b-code)
+    AI_SITE_GENERATOR_KEEP_ALIVE   Ollama keep_alive    (default: 30m)
+    AI_SITE_GENERATOR_PROBE_TTL    availability cache   (seconds, default: 30)
+    AI_SITE_GENERATOR_LLM_TIMEOUT  request timeout      (seconds, default: 300)
+    OLLAMA_HOST                    server address       (default: http://127.0.0.1:11434)
+"""
+import codecs
+import http.client
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+from backend.metrics import observe_llm_call
+
+DEFAULT_MODEL = "codellama:7b-code"
+DEFAULT_HOST = "http://127.0.0.1:11434"
+
+
+class LLMBackend:
+    """Base class for LLM backends.
+
+    Subclasses implement :meth:`generate` and :meth:`_probe`; availability
+    checks are cached for ``probe_ttl`` seconds so the hot path does not
+    re-probe the model server on every request.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str = None, probe_ttl: float = None):
+        self.model = model or os.getenv("AI_SITE_GENERATOR_MODEL", DEFAULT_MODEL)
+        if probe_ttl is None:
+            probe_ttl = float(os.getenv("AI_SITE_GENERATOR_PROBE_TTL", "30"))
+        self.probe_ttl = probe_ttl
+        self._probe_lock = threading.Lock()
+        self._probe_result = None
+        self._probe_expires = 0.0
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: float = None):
+        """Yield the response in chunks as the model produces them.
+
+        Backends without incremental output yield the whole response once.
+        ``timeout`` bounds how long a single call may wait on the model.
+        """
+        yield self.generate(prompt, timeout=timeout)
+
+    def _probe(self) -> bool:
+        raise NotImplementedError
+
+    def is_available(self) -> bool:
+        """Return the cached result of the availability probe."""
+        now = time.monotonic()
+        if self._probe_result is not None and now < self._probe_expires:
+            return self._probe_result
+        with self._probe_lock:
+            # another thread may have refreshed the probe while we waited
+            if self._probe_result is not None and time.monotonic() < self._probe_expires:
+                return self._probe_result
+            try:
+                ok = bool(self._probe())
+            except Exception:
+                ok = False
+            self._probe_result = ok
+            self._probe_expires = time.monotonic() + self.probe_ttl
+            return ok
+
+    def invalidate_probe(self):
+        """Forget the cached availability result."""
+        self._probe_expires = 0.0
+
+    def close(self):
+        """Release any pooled resources."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive ``http.client`` connections to one host."""
+
+    def __init__(self, host: str, port: int, scheme: str = "http", maxsize: int = 8, timeout: float = 300.0):
+        self.host = host
+        self.port = port
+        self.scheme = scheme
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=maxsize)
+
+    def _new_connection(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self):
+        """Return ``(connection, reused)``; idle connections are preferred."""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def release(self, conn):
+        """Return a connection to the pool, closing it if the pool is full."""
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class OllamaHTTPBackend(LLMBackend):
+    """Ollama HTTP API client (``/api/generate``) with connection pooling."""
+
+    name = "http"
+
+    def __init__(self, host: str = None, model: str = None, keep_alive: str = None,
+                 probe_ttl: float = None, timeout: float = None, pool_size: int = 8):
+        super().__init__(model=model, probe_ttl=probe_ttl)
+        host = host or os.getenv("OLLAMA_HOST", DEFAULT_HOST)
+        if "://" not in host:
+            host = f"http://{host}"
+        parts = urlsplit(host)
+        self.keep_alive = keep_alive or os.getenv("AI_SITE_GENERATOR_KEEP_ALIVE", "30m")
+        if timeout is None:
+            timeout = float(os.getenv("AI_SITE_GENERATOR_LLM_TIMEOUT", "300"))
+        default_port = 443 if parts.scheme == "https" else 11434
+        self.pool = ConnectionPool(parts.hostname or "127.0.0.1", parts.port or default_port,
+                                   scheme=parts.scheme or "http", maxsize=pool_size, timeout=timeout)
+
+    @staticmethod
+    def _set_timeout(conn, timeout):
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+
+    def _open(self, method: str, path: str, payload=None, timeout: float = None):
+        """Send a request on a pooled connection and return ``(conn, response)``.
+
+        A reused connection that the server has already closed is retried once
+        on a fresh connection. The caller must read the response and hand the
+        connection to :meth:`_finish`.
+        """
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            conn, reused = self.pool.acquire()
+            if timeout is not None:
+                self._set_timeout(conn, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.CannotSendRequest, http.client.BadStatusLine):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+        raise RuntimeError("unreachable")
+
+    def _finish(self, conn, resp, timeout: float = None):
+        """Return a fully-read connection to the pool (or close it)."""
+        if timeout is not None:
+            self._set_timeout(conn, self.pool.timeout)
+        if resp.will_close or not resp.isclosed():
+            conn.close()
+        else:
+            self.pool.release(conn)
+
+    def _request(self, method: str, path: str, payload=None, timeout: float = None):
+        """Send a request on a pooled connection and return ``(status, body_bytes)``."""
+        conn, resp = self._open(method, path, payload, timeout)
+        try:
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        self._finish(conn, resp, timeout)
+        return resp.status, data
+
+    def _probe(self) -> bool:
+        status, _ = self._request("GET", "/api/version", timeout=2.0)
+        return status == 200
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+        }
+        start = time.perf_counter()
+        status, data = self._request("POST", "/api/generate", payload, timeout=timeout)
+        if status != 200:
+            raise RuntimeError(f"Ollama API hatası ({status}): {data.decode('utf-8', 'replace')[:200]}")
+        body = json.loads(data)
+        self._observe(time.perf_counter() - start, body, "generate")
+        return body.get("response", "")
+
+    def _observe(self, seconds: float, final: dict, mode: str):
+        # Ollama reports eval_count tokens generated in eval_duration nanoseconds
+        eval_ns = final.get("eval_duration")
+        observe_llm_call(self.name, self.model, seconds, final.get("eval_count"), mode,
+                         eval_ns / 1e9 if eval_ns else None)
+
+    def stream(self, prompt: str, timeout: float = None):
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+        }
+        # for streams the timeout bounds the wait for each chunk
+        start = time.perf_counter()
+        conn, resp = self._open("POST", "/api/generate", payload, timeout=timeout)
+        finished = False
+        try:
+            if resp.status != 200:
+                data = resp.read()
+                finished = True
+                raise RuntimeError(f"Ollama API hatası ({resp.status}): {data.decode('utf-8', 'replace')[:200]}")
+            for line in resp:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama API hatası: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    self._observe(time.perf_counter() - start, chunk, "stream")
+                    break
+            resp.read()  # drain the chunked terminator so the connection can be reused
+            finished = True
+        finally:
+            if finished:
+                self._finish(conn, resp, timeout)
+            else:
+                # consumer stopped early or the stream broke: drop the connection
+                conn.close()
+
+    def close(self):
+        self.pool.close()
+
+
+class OllamaCLIBackend(LLMBackend):
+    """Fallback backend that shells out to ``ollama run`` for every call."""
+
+    name = "cli"
+
+    def _probe(self) -> bool:
+        try:
+            res = subprocess.run(["ollama", "--version"], capture_output=True, text=True)
+            return res.returncode == 0
+        except FileNotFoundError:
+            return False
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        start = time.perf_counter()
+        result = subprocess.run(
+            ["ollama", "run", self.model, prompt],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        # the CLI does not report token counts
+        observe_llm_call(self.name, self.model, time.perf_counter() - start)
+        return result.stdout
+
+    def stream(self, prompt: str, timeout: float = None):
+        start = time.perf_counter()
+        proc = subprocess.Popen(["ollama", "run", self.model, prompt],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        # kill the process if the call outlives its timeout; the read loop then ends
+        watchdog = threading.Timer(timeout, proc.kill) if timeout else None
+        if watchdog:
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            while True:
+                data = proc.stdout.read1(4096)
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            if proc.wait() != 0 and watchdog and not watchdog.is_alive():
+                raise TimeoutError(f"ollama run {timeout} saniye içinde tamamlanmadı")
+            observe_llm_call(self.name, self.model, time.perf_counter() - start, mode="stream")
+        finally:
+            if watchdog:
+                watchdog.cancel()
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+
+class FallbackBackend(LLMBackend):
+    """Use the first available backend from ``backends`` (HTTP first, then CLI)."""
+
+    name = "auto"
+
+    def __init__(self, backends, probe_ttl: float = None):
+        super().__init__(model=backends[0].model, probe_ttl=probe_ttl)
+        self.backends = list(backends)
+
+    def _select(self):
+        for backend in self.backends:
+            if backend.is_available():
+                return backend
+        return None
+
+    def _probe(self) -> bool:
+        return self._select() is not None
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        backend = self._select()
+        if backend is None:
+            raise RuntimeError("Kullanılabilir bir LLM backend'i bulunamadı.")
+        return backend.generate(prompt, timeout=timeout)
+
+    def stream(self, prompt: str, timeout: float = None):
+        backend = self._select()
+        if backend is None:
+            raise RuntimeError("Kullanılabilir bir LLM backend'i bulunamadı.")
+        yield from backend.stream(prompt, timeout=timeout)
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
+
+
+_FACTORIES = {
+    "http": OllamaHTTPBackend,
+    "cli": OllamaCLIBackend,
+    "auto": lambda: FallbackBackend([OllamaHTTPBackend(), OllamaCLIBackend()]),
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def register_backend(name: str, factory):
+    """Register a backend factory selectable via AI_SITE_GENERATOR_LLM_BACKEND."""
+    _FACTORIES[name] = factory
+
+
+def get_backend() -> LLMBackend:
+    """Return the process-wide backend, creating it from the environment on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = os.getenv("AI_SITE_GENERATOR_LLM_BACKEND", "auto").lower()
+                factory = _FACTORIES.get(name)
+                if factory is None:
+                    raise ValueError(f"Bilinmeyen LLM backend: {name}")
+                _backend = factory()
+    return _backend
+
+
+def set_backend(backend):
+    """Install ``backend`` as the process-wide backend; returns the previous one.
+
+    Passing ``None`` resets to the environment-configured default on next use.
+    """
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,399 @@
+"""In-process metrics with Prometheus text exposition, plus per-request timing.
+
+Counters, gauges and histograms are plain Python objects guarded by a lock
+(an observation is a ``bisect`` and two additions), so they stay enabled in
+production. :func:`render` produces the text served on ``/metrics``.
+
+:func:`span` times a block into the ``stage`` histogram and, while a
+request is being handled by :class:`MetricsMiddleware`, also into that
+request's timing record. The record follows the request's context into
+scheduler jobs and pipeline threads. With ``AI_SITE_GENERATOR_TIMING_LOG``
+set, each request's record is appended to that file as one JSON line by a
+background writer thread.
+
+Metrics are per process; with several uvicorn workers, scrape each one.
+"""
+import atexit
+import bisect
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500, 1000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class; label values are passed as keyword arguments to the update methods."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self):
+        """Yield ``(suffix, label_string, value)`` exposition samples."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", _format_labels(self.labelnames, key), value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """A gauge; ``function`` (if given) is called at scrape time for the unlabelled value."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames=(), function=None):
+        super().__init__(name, help, labelnames)
+        self.function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        if self.function is not None:
+            return self.function()
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        if self.function is not None:
+            yield "", "", self.function()
+            return
+        yield from super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield "_bucket", _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"'), cumulative
+            labels = _format_labels(self.labelnames, key)
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in list(self._metrics.values())) + "\n"
+
+    def clear(self):
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name, help, labelnames=(), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames, function))
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+def render() -> str:
+    """Prometheus text exposition of every registered metric."""
+    return REGISTRY.render()
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# -- generation metrics ------------------------------------------------------
+
+STAGE_SECONDS = histogram("ai_site_generator_stage_seconds",
+                          "Time spent in each generation stage.", ("stage",))
+LLM_CALL_SECONDS = histogram("ai_site_generator_llm_call_seconds",
+                             "Duration of model calls.", ("backend", "model", "mode"))
+LLM_TOKENS = counter("ai_site_generator_llm_tokens_total",
+                     "Tokens generated by the model.", ("backend", "model"))
+LLM_TOKENS_PER_SECOND = histogram("ai_site_generator_llm_tokens_per_second",
+                                  "Model generation speed per call.", ("backend", "model"), RATE_BUCKETS)
+GENERATIONS = counter("ai_site_generator_generations_total",
+                      "Finished site generations by source of the content and result.", ("source", "result"))
+REFINEMENTS = counter("ai_site_generator_refinements_total",
+                      "Finished single-artifact refinements by artifact and result.", ("artifact", "result"))
+HTTP_SECONDS = histogram("ai_site_generator_http_request_seconds",
+                         "HTTP request duration, until the last body byte.", ("method", "route", "status"))
+HTTP_IN_FLIGHT = gauge("ai_site_generator_http_requests_in_flight", "HTTP requests being handled.")
+
+# -- per-request timing ------------------------------------------------------
+
+# active timing records, outermost first (a request, then e.g. one generation inside it)
+_timings = contextvars.ContextVar("ai_site_generator_timings", default=())
+
+
+def record(name: str, seconds: float, **fields):
+    """Add an entry to every active timing record (see :func:`collect`)."""
+    collectors = _timings.get()
+    if collectors:
+        entry = {"name": name, "seconds": round(seconds, 6), **fields}
+        for timings in collectors:
+            timings.append(entry)
+
+
+@contextmanager
+def collect():
+    """Collect the spans recorded in this block (and in jobs/threads it starts) into a list."""
+    timings = []
+    token = _timings.set(_timings.get() + (timings,))
+    try:
+        yield timings
+    finally:
+        try:
+            _timings.reset(token)
+        except ValueError:
+            # a generator using collect() was closed from another context
+            pass
+
+
+def totals(timings) -> dict:
+    """Sum a timing record's seconds per span name."""
+    summed = {}
+    for entry in timings:
+        summed[entry["name"]] = round(summed.get(entry["name"], 0.0) + entry["seconds"], 6)
+    return summed
+
+
+@contextmanager
+def span(stage: str):
+    """Time the block into ``ai_site_generator_stage_seconds{stage=...}``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        record(stage, elapsed)
+
+
+def observe_llm_call(backend: str, model: str, seconds: float, tokens: int = None, mode: str = "generate",
+                     eval_seconds: float = None):
+    """Record one model call. ``eval_seconds`` is the model's own generation time when reported."""
+    LLM_CALL_SECONDS.observe(seconds, backend=backend, model=model, mode=mode)
+    fields = {"backend": backend, "model": model, "mode": mode}
+    if tokens:
+        LLM_TOKENS.inc(tokens, backend=backend, model=model)
+        rate = tokens / (eval_seconds or seconds) if (eval_seconds or seconds) > 0 else 0.0
+        LLM_TOKENS_PER_SECOND.observe(rate, backend=backend, model=model)
+        fields.update(tokens=tokens, tokens_per_sec=round(rate, 2))
+    record("llm", seconds, **fields)
+
+
+class TimingLog:
+    """Appends one JSON line per request to ``path`` from a background thread.
+
+    :meth:`write` only enqueues the entry, so the event loop never waits on
+    the disk; the writer thread keeps the file open and flushes whenever the
+    queue runs empty.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, entry: dict):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="timing-log", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+        self._queue.put(entry)
+
+    def _run(self):
+        f = None
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is None:
+                    break
+                if f is None:
+                    f = open(self.path, "a", encoding="utf-8")
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                if self._queue.empty():
+                    f.flush()
+            except (OSError, TypeError, ValueError):
+                pass  # a broken timing log must not affect requests
+            finally:
+                self._queue.task_done()
+        if f is not None:
+            f.close()
+
+    def flush(self):
+        """Block until every entry written so far is in the file."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Write pending entries and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    # mounted static files and unmatched paths: keep the label set small
+    if scope.get("path", "").startswith("/sites/"):
+        return "/sites"
+    return "other"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request and collecting its spans."""
+
+    def __init__(self, app, timing_log: str = None, skip_routes=("/metrics", "/sites")):
+        self.app = app
+        path = timing_log if timing_log is not None else os.getenv("AI_SITE_GENERATOR_TIMING_LOG")
+        self.timing_log = TimingLog(path) if path else None
+        self.skip_routes = tuple(skip_routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500, "ttfb": None}
+        timings = []
+        token = _timings.set(_timings.get() + (timings,))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                status["ttfb"] = time.perf_counter() - start
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _timings.reset(token)
+            elapsed = time.perf_counter() - start
+            route = _route_label(scope)
+            HTTP_SECONDS.observe(elapsed, method=scope["method"], route=route, status=status["code"])
+            if self.timing_log is not None and route not in self.skip_routes:
+                self.timing_log.write({
+                    "ts": time.time(),
+                    "method": scope["method"],
+                    "route": route,
+                    "path": scope.get("path"),
+                    "status": status["code"],
+                    "seconds": round(elapsed, 6),
+                    "ttfb": round(status["ttfb"], 6) if status["ttfb"] is not None else None,
+                    "spans": timings,
+                })
@@ -0,0 +1,180 @@
+"""Small dependency-aware stage runner for artifact generation.
+
+A pipeline is a list of :class:`Stage` objects. A stage starts as soon as
+every stage it depends on has finished, so independent stages run
+concurrently on a shared thread pool. Each stage has its own timeout and
+retry budget. The timeout is a wall-clock deadline per attempt, enforced
+by :func:`run_pipeline`. An attempt that overruns it is abandoned and
+retried. Its thread cannot be killed, so streaming stage functions should
+check :func:`attempt_expired` and stop. The timeout is also handed to the
+stage function as the LLM backend's socket timeout. A ``retry`` event is
+emitted before the next attempt starts, so consumers can discard the
+output of the failed one. Every attempt is timed as a ``metrics.span``
+named after the stage.
+
+Environment variables:
+    AI_SITE_GENERATOR_STAGE_TIMEOUT   per-stage timeout in seconds (default: 180)
+    AI_SITE_GENERATOR_STAGE_RETRIES   retries per stage            (default: 1)
+    AI_SITE_GENERATOR_PIPELINE_WORKERS shared thread pool size     (default: 16)
+"""
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backend.generation_cache import GenerationCancelled
+from backend.metrics import span
+
+
+class StageError(RuntimeError):
+    """A stage failed after exhausting its retries."""
+
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"'{stage}' aşaması başarısız: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Stage:
+    """A named unit of work: ``run(inputs, timeout)`` where inputs maps dependency names to results."""
+
+    def __init__(self, name: str, run, depends_on=(), timeout: float = None, retries: int = None):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        if timeout is None:
+            timeout = float(os.getenv("AI_SITE_GENERATOR_STAGE_TIMEOUT", "180"))
+        if retries is None:
+            retries = int(os.getenv("AI_SITE_GENERATOR_STAGE_RETRIES", "1"))
+        self.timeout = timeout
+        self.retries = retries
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = int(os.getenv("AI_SITE_GENERATOR_PIPELINE_WORKERS", "16"))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+    return _executor
+
+
+class _Attempt:
+    """One try of a stage, with its wall-clock deadline."""
+
+    def __init__(self, stage: Stage, number: int, inputs: dict, delay: float = 0.0):
+        self.stage = stage
+        self.number = number
+        self.inputs = inputs
+        self.delay = delay
+        self.deadline = time.monotonic() + delay + stage.timeout
+        self.expired = threading.Event()
+
+
+_current_attempt = contextvars.ContextVar("pipeline_attempt", default=None)
+
+
+def attempt_expired() -> bool:
+    """True inside a stage function whose attempt was abandoned (deadline passed or pipeline failed)."""
+    attempt = _current_attempt.get()
+    return attempt is not None and attempt.expired.is_set()
+
+
+def _run_attempt(attempt: _Attempt, emit, cancel: threading.Event):
+    if attempt.delay:
+        # back off before a retry
+        time.sleep(attempt.delay)
+    if cancel.is_set():
+        raise GenerationCancelled(f"'{attempt.stage.name}' aşaması iptal edildi")
+    _current_attempt.set(attempt)
+    emit({"event": "stage", "stage": attempt.stage.name, "attempt": attempt.number})
+    with span(attempt.stage.name):
+        return attempt.stage.run(attempt.inputs, attempt.stage.timeout)
+
+
+def run_pipeline(stages, on_event=None, cancel: threading.Event = None) -> dict:
+    """Run ``stages`` respecting dependencies and return ``{name: result}``.
+
+    ``on_event`` receives stage/retry event dicts (from worker threads). The
+    first failure sets ``cancel`` so sibling stages can stop early, and is
+    re-raised once the running stages have returned.
+    """
+    emit = on_event or (lambda event: None)
+    cancel = cancel or threading.Event()
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [d for d in stage.depends_on if d not in by_name]
+        if missing:
+            raise ValueError(f"'{stage.name}' bilinmeyen aşamalara bağlı: {missing}")
+
+    executor = _get_executor()
+    results, running, pending = {}, {}, list(stages)
+    failure = None
+
+    def start(attempt):
+        # run in a copy of the caller's context so request timing follows the stage
+        ctx = contextvars.copy_context()
+        running[executor.submit(ctx.run, _run_attempt, attempt, emit, cancel)] = attempt
+
+    def failed(attempt, error):
+        """Retry ``attempt`` or return the error that fails the pipeline."""
+        attempt.expired.set()
+        stage = attempt.stage
+        if isinstance(error, GenerationCancelled):
+            # cancellation is never retried
+            return error
+        if not isinstance(error, Exception):
+            return error
+        if attempt.number > stage.retries:
+            return StageError(stage.name, error)
+        emit({"event": "retry", "stage": stage.name, "attempt": attempt.number, "error": str(error)})
+        start(_Attempt(stage, attempt.number + 1, attempt.inputs, delay=min(0.5 * attempt.number, 2.0)))
+        return None
+
+    while pending or running:
+        if failure is None:
+            for stage in [s for s in pending if all(d in results for d in s.depends_on)]:
+                pending.remove(stage)
+                start(_Attempt(stage, 1, {d: results[d] for d in stage.depends_on}))
+        if not running:
+            if failure is None and pending:
+                raise ValueError("Pipeline aşamalarında döngüsel bağımlılık var")
+            break
+        timeout = max(0.0, min(a.deadline for a in running.values()) - time.monotonic())
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        errors = []
+        for future in list(running):
+            attempt = running[future]
+            if future in done:
+                del running[future]
+                try:
+                    results[attempt.stage.name] = future.result()
+                except BaseException as e:
+                    errors.append((attempt, e))
+            elif now >= attempt.deadline:
+                # abandon the attempt; its thread finishes (or notices attempt_expired) on its own
+                del running[future]
+                errors.append((attempt, TimeoutError(
+                    f"'{attempt.stage.name}' aşaması {attempt.stage.timeout:g} sn içinde bitmedi")))
+        for attempt, error in errors:
+            if failure is not None:
+                # the pipeline already failed; later errors are consequences
+                attempt.expired.set()
+                continue
+            failure = failed(attempt, error)
+            if failure is not None:
+                cancel.set()
+                for other in running.values():
+                    other.expired.set()
+    if failure is not None:
+        if isinstance(failure, StageError):
+            raise failure from failure.error
+        raise failure
+    return results
@@ -1,36 +1,28 @@
 """Premium template definitions and helpers.
 
-This module defines premium template types (business/kurumsal, minimalist, creative)
-and provides helper functions to list and retrieve guidance text for prompt enrichment.
+Premium template types (business/kurumsal, minimalist, creative) are declared
+in the ``premium`` section of each base template's ``template.json`` (see
+template_registry); this module lists them and provides guidance text for
+prompt enrichment.
 """
+from backend.template_registry import get_registry
 
-TEMPLATES = {
-    "minimalist": {
-        "name": "Minimalist",
-        "description": "Sade, temiz ve hızlı açılan sayfalar. Beyaz alan ve tipografiye odaklı tasarım.",
-        "map_to": "modern",
-    },
-    "kurumsal": {
-        "name": "Kurumsal",
-        "description": "Profesyonel işletmeler için düzenli, güven veren ve bilgi odaklı şablon.",
-        "map_to": "classic",
-    },
-    "creative": {
-        "name": "Creative",
-        "description": "Renkli, dinamik ve etkileşimli öğelerle dolu yaratıcı şablon.",
-        "map_to": "creative",
-    },
-}
+
+def __getattr__(name):
+    # ``TEMPLATES`` is kept for existing callers and read from the registry on access
+    if name == "TEMPLATES":
+        return get_registry().premium()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def list_templates():
     """Return available premium template keys."""
-    return list(TEMPLATES.keys())
+    return list(get_registry().premium().keys())
 
 
 def get_template_info(key: str):
     """Return template info dict or None if missing."""
-    return TEMPLATES.get(key)
+    return get_registry().premium().get(key)
 
 
 def guidance_for(key: str) -> str:
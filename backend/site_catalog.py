@@ -0,0 +1,462 @@
+"""Indexed catalog of generated sites, kept in an embedded SQLite database.
+
+Each published site gets one row (id, prompt, template, premium template
+type, model, file sizes, stage timings, creation time), added right after
+the site is committed; each refinement of a site (see
+``site_generator.refine_site``) adds a row to ``site_versions``. The same
+records are written into the site and version folders as ``.site.json`` so
+the index can be rebuilt from disk at any time::
+
+    python -m backend.site_catalog --rebuild
+
+Listing is keyset-paginated on the row's insertion sequence (newest first),
+so every page is an index range scan whatever the catalog size. Prompts can
+be searched by prefix (indexed, case-insensitive) or by words; word search
+uses FTS5 when SQLite has it and falls back to ``LIKE``. The database runs
+in WAL mode with a busy timeout, so several uvicorn workers can read and
+write the same file.
+
+Environment variables:
+    AI_SITE_GENERATOR_CATALOG   database path (default: <sites root>/.catalog.sqlite3)
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from backend.site_server import write_atomic
+from backend.site_storage import get_storage
+
+METADATA_FILE = ".site.json"
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+FIELDS = ("site_id", "prompt", "template", "template_type", "model", "source",
+          "bytes", "files", "timings", "seconds", "created_at", "latest_version")
+VERSION_FIELDS = ("version", "base_version", "artifact", "instruction", "model", "source",
+                  "bytes", "files", "timings", "seconds", "created_at")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_id TEXT NOT NULL UNIQUE,
+    prompt TEXT NOT NULL,
+    prompt_key TEXT NOT NULL,
+    template TEXT,
+    template_type TEXT,
+    model TEXT,
+    source TEXT,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    files TEXT NOT NULL DEFAULT '{}',
+    timings TEXT NOT NULL DEFAULT '{}',
+    seconds REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sites_prompt_key ON sites (prompt_key);
+CREATE INDEX IF NOT EXISTS sites_template_type ON sites (template_type, seq);
+"""
+
+# external-content FTS index over sites.prompt, kept in sync by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS sites_fts USING fts5(
+    prompt, content='sites', content_rowid='seq', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS sites_fts_insert AFTER INSERT ON sites BEGIN
+    INSERT INTO sites_fts (rowid, prompt) VALUES (new.seq, new.prompt);
+END;
+CREATE TRIGGER IF NOT EXISTS sites_fts_delete AFTER DELETE ON sites BEGIN
+    INSERT INTO sites_fts (sites_fts, rowid, prompt) VALUES ('delete', old.seq, old.prompt);
+END;
+"""
+
+# schema changes after the first release, applied in order by PRAGMA user_version (2, 3, ...)
+_MIGRATIONS = (
+    (
+        "ALTER TABLE sites ADD COLUMN latest_version INTEGER NOT NULL DEFAULT 1",
+        """CREATE TABLE IF NOT EXISTS site_versions (
+            site_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            base_version INTEGER,
+            artifact TEXT,
+            instruction TEXT,
+            model TEXT,
+            source TEXT,
+            bytes INTEGER NOT NULL DEFAULT 0,
+            files TEXT NOT NULL DEFAULT '{}',
+            timings TEXT NOT NULL DEFAULT '{}',
+            seconds REAL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (site_id, version)
+        )""",
+    ),
+)
+
+_WORD = re.compile(r"\w+")
+_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_SITE_TIME = re.compile(r"site_(\d{8}_\d{6})")
+_VERSION_DIR = re.compile(r"v([0-9]+)$")
+
+
+def normalize_prompt(text: str) -> str:
+    """Case-folded prompt with collapsed whitespace, as used for prefix search."""
+    # "İ".casefold() is "i" plus a combining dot; drop the dot so "İstanbul" matches "istanbul"
+    return " ".join((text or "").casefold().replace("\u0307", "").split())
+
+
+def write_metadata(folder: str, record: dict):
+    """Write a site's catalog record into its folder."""
+    data = json.dumps(record, ensure_ascii=False, indent=2).encode("utf-8")
+    write_atomic(os.path.join(folder, METADATA_FILE), data)
+
+
+def read_metadata(folder: str, site_id: str, created: float) -> dict:
+    """Return the catalog record of a site folder.
+
+    Sites written before the catalog existed have no ``.site.json``; their
+    record is derived from the files (the prompt from the page title).
+    """
+    try:
+        with open(os.path.join(folder, METADATA_FILE), "r", encoding="utf-8") as f:
+            record = json.load(f)
+        record["site_id"] = site_id
+        return record
+    except (FileNotFoundError, ValueError):
+        pass
+    files = {}
+    for name in ("index.html", "style.css", "index.js"):
+        try:
+            files[name] = os.path.getsize(os.path.join(folder, name))
+        except OSError:
+            continue
+    prompt = ""
+    try:
+        with open(os.path.join(folder, "index.html"), "r", encoding="utf-8", errors="replace") as f:
+            match = _TITLE.search(f.read(64 * 1024))
+        if match:
+            prompt = html.unescape(match.group(1)).strip()
+    except OSError:
+        pass
+    match = _SITE_TIME.match(site_id)
+    if match:
+        created = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+    return {"site_id": site_id, "prompt": prompt, "files": files, "bytes": sum(files.values()),
+            "created_at": created}
+
+
+def read_versions(folder: str, site_id: str) -> list:
+    """Return the records of a site's refinements (``v<N>/.site.json``), oldest first."""
+    records = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            match = _VERSION_DIR.match(entry.name)
+            if not (match and entry.is_dir(follow_symlinks=False)):
+                continue
+            try:
+                with open(os.path.join(entry.path, METADATA_FILE), "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (FileNotFoundError, ValueError):
+                record = {"created_at": entry.stat().st_mtime}
+            record.update(site_id=site_id, version=int(match.group(1)))
+            records.append(record)
+    records.sort(key=lambda r: r["version"])
+    return records
+
+
+def _clamp_limit(limit) -> int:
+    return max(1, min(MAX_LIMIT, int(limit or DEFAULT_LIMIT)))
+
+
+class SiteCatalog:
+    """SQLite-backed site index; safe to share between threads and processes."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("AI_SITE_GENERATOR_CATALOG") or os.path.join(
+            get_storage().root, ".catalog.sqlite3")
+        self.fts = False
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    # -- connections ---------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # autocommit; multi-statement writes use explicit transactions
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 10000")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            if not self._initialized:
+                self._create_schema(conn)
+                self._initialized = True
+            self._connections.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def _create_schema(self, conn):
+        # IMMEDIATE takes the write lock up front, so workers starting together do not collide
+        conn.executescript(f"BEGIN IMMEDIATE; {_SCHEMA} COMMIT;")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, statements in enumerate(_MIGRATIONS, start=2):
+                if current < number:
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        try:
+            conn.executescript(f"BEGIN IMMEDIATE; {_FTS_SCHEMA} COMMIT;")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: word search falls back to LIKE
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.fts = False
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    # -- writing -------------------------------------------------------------
+
+    def add(self, record: dict):
+        """Insert or replace the entry of ``record["site_id"]``."""
+        self.add_many([record])
+
+    def add_many(self, records):
+        conn = self._connect()
+        rows = [self._row(record) for record in records]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # delete + insert (rather than REPLACE) so the FTS triggers see both sides
+            conn.executemany("DELETE FROM sites WHERE site_id = ?", [(row[0],) for row in rows])
+            conn.executemany(
+                "INSERT INTO sites (site_id, prompt, prompt_key, template, template_type, model, source,"
+                " bytes, files, timings, seconds, created_at, latest_version)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _row(record: dict) -> tuple:
+        prompt = record.get("prompt") or ""
+        return (
+            record["site_id"], prompt, normalize_prompt(prompt), record.get("template"),
+            record.get("template_type"), record.get("model"), record.get("source"),
+            int(record.get("bytes") or 0), json.dumps(record.get("files") or {}, ensure_ascii=False),
+            json.dumps(record.get("timings") or {}), record.get("seconds"),
+            float(record.get("created_at") or 0.0), int(record.get("latest_version") or 1),
+        )
+
+    def add_version(self, record: dict):
+        """Record a refinement (``record["version"]``) of ``record["site_id"]``."""
+        self.add_versions([record])
+
+    def add_versions(self, records):
+        rows = [(
+            r["site_id"], int(r["version"]), r.get("base_version"), r.get("artifact"), r.get("instruction"),
+            r.get("model"), r.get("source"), int(r.get("bytes") or 0),
+            json.dumps(r.get("files") or {}, ensure_ascii=False), json.dumps(r.get("timings") or {}),
+            r.get("seconds"), float(r.get("created_at") or 0.0),
+        ) for r in records]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO site_versions (site_id, version, base_version, artifact, instruction,"
+                " model, source, bytes, files, timings, seconds, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany("UPDATE sites SET latest_version = MAX(latest_version, ?) WHERE site_id = ?",
+                             [(row[1], row[0]) for row in rows])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remove(self, site_id: str) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM site_versions WHERE site_id = ?", (site_id,))
+            removed = conn.execute("DELETE FROM sites WHERE site_id = ?", (site_id,)).rowcount > 0
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def rebuild(self, storage=None) -> int:
+        """Replace the index with the sites found on disk; returns how many were indexed."""
+        storage = storage or get_storage()
+        records, versions = [], []
+        for created, site_id in storage.sites():
+            folder = os.path.join(storage.root, site_id)
+            record = read_metadata(folder, site_id, created)
+            refinements = read_versions(folder, site_id)
+            record["latest_version"] = max([1] + [r["version"] for r in refinements])
+            records.append(record)
+            versions += refinements
+        records.sort(key=lambda r: (r.get("created_at") or 0.0, r["site_id"]))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM site_versions")
+            conn.execute("DELETE FROM sites")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if records:
+            self.add_many(records)
+        if versions:
+            self.add_versions(versions)
+        return len(records)
+
+    # -- reading -------------------------------------------------------------
+
+    @staticmethod
+    def _entry(row) -> dict:
+        entry = {name: row[name] for name in FIELDS}
+        entry["files"] = json.loads(entry["files"] or "{}")
+        entry["timings"] = json.loads(entry["timings"] or "{}")
+        return entry
+
+    def _page(self, sql: str, params: list, limit) -> tuple:
+        limit = _clamp_limit(limit)
+        # one extra row tells whether there is a next page
+        rows = self._connect().execute(f"{sql} LIMIT ?", params + [limit + 1]).fetchall()
+        next_cursor = str(rows[limit - 1]["seq"]) if len(rows) > limit else None
+        return [self._entry(row) for row in rows[:limit]], next_cursor
+
+    @staticmethod
+    def _after(cursor) -> int:
+        """Decode a page cursor (the last row's sequence number)."""
+        if cursor in (None, ""):
+            return None
+        try:
+            return int(cursor)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid cursor: {cursor!r}")
+
+    def get(self, site_id: str) -> dict:
+        row = self._connect().execute("SELECT * FROM sites WHERE site_id = ?", (site_id,)).fetchone()
+        return self._entry(row) if row else None
+
+    def versions(self, site_id: str) -> list:
+        """Refinements of a site (version 2 onwards), oldest first."""
+        rows = self._connect().execute(
+            "SELECT * FROM site_versions WHERE site_id = ? ORDER BY version", (site_id,)).fetchall()
+        versions = []
+        for row in rows:
+            entry = {name: row[name] for name in VERSION_FIELDS}
+            entry["files"] = json.loads(entry["files"] or "{}")
+            entry["timings"] = json.loads(entry["timings"] or "{}")
+            versions.append(entry)
+        return versions
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM sites").fetchone()[0]
+
+    def list(self, limit: int = DEFAULT_LIMIT, cursor: str = None, template_type: str = None) -> tuple:
+        """Return ``(entries, next_cursor)``, newest first."""
+        where, params = [], []
+        after = self._after(cursor)
+        if after is not None:
+            where.append("seq < ?")
+            params.append(after)
+        if template_type:
+            where.append("template_type = ?")
+            params.append(template_type)
+        sql = "SELECT * FROM sites" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY seq DESC"
+        return self._page(sql, params, limit)
+
+    def search(self, query: str = None, prefix: str = None, limit: int = DEFAULT_LIMIT,
+               cursor: str = None) -> tuple:
+        """Search prompts by words (``query``) and/or by ``prefix``; returns ``(entries, next_cursor)``."""
+        where, params = [], []
+        words = _WORD.findall(normalize_prompt(query))
+        use_fts = bool(words) and self.fts
+        # with FTS, order and page on the index's own rowid so matches come out already sorted
+        seq = "f.rowid" if use_fts else "s.seq"
+        after = self._after(cursor)
+        if after is not None:
+            where.append(f"{seq} < ?")
+            params.append(after)
+        key = normalize_prompt(prefix)
+        if key:
+            # a range on the prompt_key index; U+10FFFF sorts after every other character
+            where.append("s.prompt_key >= ? AND s.prompt_key < ?")
+            params += [key, key + "\U0010ffff"]
+        source = "sites s"
+        if use_fts:
+            # every word must match, each as a word prefix ("diyet" finds "diyetisyen")
+            source = "sites_fts f JOIN sites s ON s.seq = f.rowid"
+            where.append("sites_fts MATCH ?")
+            params.append(" ".join(f'"{word}"*' for word in words))
+        else:
+            for word in words:
+                where.append("s.prompt_key LIKE ? ESCAPE '\\'")
+                params.append("%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        sql = f"SELECT s.* FROM {source}" + (" WHERE " + " AND ".join(where) if where else "") + \
+            f" ORDER BY {seq} DESC"
+        return self._page(sql, params, limit)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> SiteCatalog:
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = SiteCatalog()
+    return _catalog
+
+
+def set_catalog(catalog: SiteCatalog):
+    """Install a catalog (mainly for tests); returns the previous one."""
+    global _catalog
+    previous, _catalog = _catalog, catalog
+    return previous
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the generated-site catalog.")
+    parser.add_argument("--rebuild", action="store_true", help="re-index every site found on disk")
+    parser.add_argument("--db", default=None, help="catalog database (default: AI_SITE_GENERATOR_CATALOG)")
+    args = parser.parse_args(argv)
+
+    catalog = SiteCatalog(args.db)
+    if args.rebuild:
+        print(f"Indexed {catalog.rebuild()} sites into {catalog.path}")
+    else:
+        print(f"{catalog.count()} sites in {catalog.path}")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
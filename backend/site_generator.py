@@ -1,158 +1,531 @@
+import contextvars
+import logging
 import os
-import subprocess
-from datetime import datetime
+import queue
+import secrets
+import sqlite3
+import threading
+import time
 import re
-import os
+
+from backend.generation_cache import GenerationCancelled, cache_enabled, cache_key, get_cache
+from backend.html_postprocess import MetaHeadFixer, postprocess_html, strip_markdown_fences
+from backend.llm_backends import get_backend
+from backend.metrics import GENERATIONS, REFINEMENTS, collect, span, totals
+from backend.pipeline import Stage, attempt_expired, run_pipeline
+from backend.site_catalog import get_catalog, read_metadata, write_metadata
+from backend.site_storage import get_storage
+from backend.template_registry import get_registry
+
+logger = logging.getLogger(__name__)
 
 
 def check_ollama_installed() -> bool:
-    """Return True if the `ollama` CLI appears to be available on PATH."""
-    try:
-        # Prefer a lightweight version check
-        res = subprocess.run(["ollama", "--version"], capture_output=True, text=True)
-        return res.returncode == 0
-    except FileNotFoundError:
-        return False
-
-def ollama(prompt):
-    """Ollama CLI ile modelden çıktı alır."""
-    result = subprocess.run(
-        ["ollama", "run", "codellama:7b-code", prompt],
-        capture_output=True,
-        text=True
-    )
-    return result.stdout.strip()
-
-
-def generate_site(prompt_text, template: str = "modern"):
+    """Return True if the configured LLM backend (Ollama HTTP API or CLI) is reachable.
+
+    The probe result is cached by the backend, so this is cheap to call per request.
+    """
+    with span("probe"):
+        return get_backend().is_available()
+
+def ollama(prompt, timeout: float = None):
+    """Configured LLM backend ile modelden çıktı alır."""
+    return get_backend().generate(prompt, timeout=timeout).strip()
+
+
+# (artifact, file name) in generation order
+ARTIFACTS = (("html", "index.html"), ("css", "style.css"), ("js", "index.js"))
+# characters of each existing artifact quoted in a refinement prompt
+REFINE_CONTEXT_CHARS = 8000
+
+OLLAMA_MISSING_MESSAGE = (
+    "Ollama bulunamadı (HTTP API veya CLI). Geliştirme sırasında mock modu kullanmak için environment variable AI_SITE_GENERATOR_MOCK=true ayarlayabilirsiniz, veya Ollama'yı kurun: https://ollama.com"
+)
+
+
+def generate_site(prompt_text, template: str = "modern", guidance: str = "", on_event=None,
+                  template_type: str = None):
     """Kullanıcı prompt'una göre site üretir.
 
     template: 'modern' | 'classic' | 'creative'
+    guidance: optional premium template guidance (see premium_templates.guidance_for),
+    prepended to the prompt.
+    on_event: optional callback receiving ``{"event": "stage", ...}`` progress dicts;
+    it may raise to abandon the generation (see jobs.JobCancelled).
+    template_type: premium template key, recorded in the site catalog.
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    site_name = f"site_{timestamp}"
-    folder = os.path.join("backend", "generated_sites", site_name)
-    os.makedirs(folder, exist_ok=True)
+    with collect() as timings:
+        return _generate_site(prompt_text, template, guidance, on_event, template_type, timings)
+
+
+def _generate_site(prompt_text, template, guidance, on_event, template_type, timings):
+    started = time.perf_counter()
+    emit = on_event or _ignore_event
+    writer = get_storage().create()
+    site_name = writer.site_id
+    source = "mock" if _mock_mode() else "cache"
+    try:
+        emit({"event": "stage", "stage": "start", "site": site_name})
+
+        # Allow a mock mode for testing when Ollama is not available
+        if source == "mock":
+            with span("render"):
+                html, css, js = _get_mock_templates(_enrich_prompt(prompt_text, guidance), template)
+        else:
+            # If Ollama is not installed, provide a clear error rather than failing cryptically
+            if not check_ollama_installed():
+                raise RuntimeError(OLLAMA_MISSING_MESSAGE)
+
+            def produce():
+                nonlocal source
+                source = "model"
+                return _generate_with_llm(_enrich_prompt(prompt_text, guidance), template, emit)
+
+            if cache_enabled():
+                # identical requests reuse earlier output and share in-flight generations
+                key = cache_key(prompt_text, template, guidance, get_backend().model)
+                html, css, js = get_cache().get_or_generate(key, produce)
+            else:
+                html, css, js = produce()
+
+        emit({"event": "stage", "stage": "write"})
+        written = [_write_artifact(writer, artifact, filename, content)
+                   for (artifact, filename), content in zip(ARTIFACTS, (html, css, js))]
+        _publish(writer, _site_record(writer, prompt_text, template, template_type, source, written,
+                                      timings, started))
+    except BaseException as e:
+        GENERATIONS.inc(source=source, result=_result_label(e))
+        raise
+    finally:
+        writer.abort()
+    GENERATIONS.inc(source=source, result="ok")
+
+    # Daha basit bir response için sadece site adını döndürüyoruz
+    return site_name
 
-    # Base prompts
-    html_prompt = f"'{prompt_text}' temasına uygun bir web sitesi için HTML oluştur. style.css ve index.js dosyalarına bağlantı ekle."
-    css_prompt = f"'{prompt_text}' temalı web sitesi için sade bir style.css oluştur. Renk paleti temaya uygun olsun."
-    js_prompt = f"'{prompt_text}' web sitesine basit bir interaktif index.js oluştur. Sayfa yüklendiğinde konsola '{prompt_text} yüklendi!' yaz."
 
-    # Allow a mock mode for testing when Ollama is not available
-    mock_mode = os.getenv("AI_SITE_GENERATOR_MOCK", "false").lower() in ("1", "true", "yes")
-    if mock_mode:
-        html, css, js = _get_mock_templates(prompt_text, template)
+def generate_site_stream(prompt_text, template: str = "modern", guidance: str = "", template_type: str = None):
+    """Streaming variant of :func:`generate_site`.
+
+    Yields event dicts as generation progresses:
+    ``{"event": "stage", "stage": ...}``, ``{"event": "token", "artifact": ..., "text": ...}``,
+    ``{"event": "artifact", "artifact": ..., "file": ..., "bytes": ...}`` and finally
+    ``{"event": "done", "site": ...}``. Tokens are written to a partial file in the
+    site's staging folder as they arrive, the finished artifact replaces it once
+    its stage succeeds and the site is published just before ``done``;
+    css and js tokens are interleaved because those stages run concurrently.
+    """
+    with collect() as timings:
+        yield from _generate_site_stream(prompt_text, template, guidance, template_type, timings)
+
+
+def _generate_site_stream(prompt_text, template, guidance, template_type, timings):
+    started = time.perf_counter()
+    if _mock_mode():
+        with span("render"):
+            precomputed = _get_mock_templates(_enrich_prompt(prompt_text, guidance), template)
+        key = owned = None
     else:
-        # If Ollama is not installed, provide a clear error rather than failing cryptically
         if not check_ollama_installed():
-            raise RuntimeError(
-                "Ollama CLI bulunamadı. Geliştirme sırasında mock modu kullanmak için environment variable AI_SITE_GENERATOR_MOCK=true ayarlayabilirsiniz, veya Ollama'yı kurun: https://ollama.com"
-            )
+            raise RuntimeError(OLLAMA_MISSING_MESSAGE)
+        key = cache_key(prompt_text, template, guidance, get_backend().model) if cache_enabled() else None
+        # identical streams share one model run; the others replay its result once it is done
+        precomputed, owned = _claim_cached(key) if key else (None, None)
+
+    writer = None
+    source = "mock" if _mock_mode() else "cache" if precomputed else "model"
+    written = []
+    try:
+        writer = get_storage().create()
+        site_name = writer.site_id
+        on_results = (lambda results: get_cache().complete(key, owned, results)) if owned is not None else None
+        for event in _stream_into(writer, prompt_text, template, guidance, precomputed, on_results):
+            if event["event"] == "artifact":
+                written.append(event)
+            yield event
+        _publish(writer, _site_record(writer, prompt_text, template, template_type, source, written,
+                                      timings, started))
+    except BaseException as e:
+        if owned is not None and not owned.done():
+            # waiters take over unless the model itself failed
+            error = e if isinstance(e, Exception) else GenerationCancelled("Akış istemci tarafından bırakıldı")
+            get_cache().fail(key, owned, error)
+        GENERATIONS.inc(source=source, result=_result_label(e))
+        raise
+    finally:
+        if writer is not None:
+            writer.abort()
+    GENERATIONS.inc(source=source, result="ok")
+    yield {"event": "done", "site": site_name}
+
+
+def refine_site(site_id, artifact, instruction: str = "", version: int = None, guidance: str = "",
+                on_event=None) -> int:
+    """Regenerate one artifact of an existing site as a new version of it; returns the version number.
+
+    artifact: 'html' | 'css' | 'js'
+    instruction: what to change ("daha koyu renkler"); empty regenerates the artifact.
+    version: the version to start from (default: the latest).
+    The other two artifacts are given to the model as context and linked
+    unchanged into the new version (``<site>/v<N>/``). Raises LookupError
+    for an unknown site or version.
+    """
+    with collect() as timings:
+        return _refine_site(site_id, artifact, instruction, version, guidance, on_event, timings)
+
+
+def _refine_site(site_id, artifact, instruction, version, guidance, on_event, timings):
+    started = time.perf_counter()
+    files = dict(ARTIFACTS)
+    if artifact not in files:
+        raise ValueError(f"unknown artifact: {artifact}")
+    emit = on_event or _ignore_event
+    storage = get_storage()
+    versions = storage.versions(site_id)
+    base = version or versions[-1]
+    if base not in versions:
+        raise LookupError(f"{site_id} has no version {base}")
+    base_folder = storage.version_folder(site_id, base)
+    site = get_catalog().get(site_id) or read_metadata(os.path.join(storage.root, site_id), site_id, 0.0)
+    prompt_text, template = site.get("prompt") or "", site.get("template") or "modern"
+    current = {}
+    for name, filename in ARTIFACTS:
+        try:
+            with open(os.path.join(base_folder, filename), "r", encoding="utf-8") as f:
+                current[name] = f.read()
+        except FileNotFoundError:
+            current[name] = ""
+
+    writer = storage.create_version(site_id)
+    source = "mock" if _mock_mode() else "model"
+    try:
+        emit({"event": "stage", "stage": "start", "site": site_id, "base_version": base})
+        if source == "mock":
+            with span("render"):
+                index = [name for name, _ in ARTIFACTS].index(artifact)
+                mock_prompt = f"{prompt_text} {instruction}".strip()
+                content = _get_mock_templates(_enrich_prompt(mock_prompt, guidance), template)[index]
+        else:
+            if not check_ollama_installed():
+                raise RuntimeError(OLLAMA_MISSING_MESSAGE)
+            prompt = _refine_prompt(artifact, _enrich_prompt(prompt_text, guidance), template, instruction, current)
+            stage = Stage(artifact, lambda inputs, timeout: ollama(prompt, timeout))
+            content = run_pipeline([stage], on_event=emit)[artifact]
+
+        emit({"event": "stage", "stage": "write"})
+        written = []
+        for name, filename in ARTIFACTS:
+            if name == artifact:
+                written.append(_write_artifact(writer, name, filename, content))
+            elif os.path.exists(os.path.join(base_folder, filename)):
+                # unchanged files are shared with the base version, not copied
+                writer.link(filename, os.path.join(base_folder, filename))
+                written.append({"file": filename, "bytes": os.path.getsize(writer.path(filename))})
+        record = _site_record(writer, prompt_text, template, site.get("template_type"), source, written,
+                              timings, started)
+        record.update(base_version=base, artifact=artifact, instruction=instruction)
+        for key in ("prompt", "template", "template_type"):
+            # those belong to the site; a version records what changed
+            record.pop(key)
+        write_metadata(writer.staging, record)
+        with span("commit"):
+            writer.commit()
+    except BaseException as e:
+        REFINEMENTS.inc(artifact=artifact, result=_result_label(e))
+        raise
+    finally:
+        writer.abort()
+    REFINEMENTS.inc(artifact=artifact, result="ok")
+    try:
+        get_catalog().add_version({**record, "version": writer.version})
+    except sqlite3.Error as e:
+        logger.warning("could not add %s v%s to the site catalog: %s", site_id, writer.version, e)
+    return writer.version
+
+
+def _refine_prompt(artifact, prompt_text, template, instruction, current):
+    """Model prompt regenerating ``artifact`` with the site's other artifacts as context."""
+    prompt = _build_prompts(prompt_text, template)[artifact]
+    if artifact in ("css", "js"):
+        # keep the new file working against the existing markup
+        prompt = _with_selectors(prompt, current["html"], artifact)
+    else:
+        classes = sorted(set(_CSS_SELECTOR.findall(current["css"])))
+        if classes:
+            prompt += f" style.css'te tanımlı seçiciler: {', '.join(classes[:40])}. Bu seçicileri kullan."
+    filename = dict(ARTIFACTS)[artifact]
+    if current[artifact]:
+        prompt += f"\nMevcut {filename}:\n{current[artifact][:REFINE_CONTEXT_CHARS]}"
+    if instruction:
+        prompt += f"\n{filename} dosyasını şu isteğe göre güncelle: {instruction}. Dosyanın tamamını yaz."
+    return prompt
+
+
+def _claim_cached(key):
+    """Return ``(artifacts, None)`` from the cache or an identical in-flight generation,
+    or ``(None, future)`` when the caller generates and must resolve ``future``."""
+    cache = get_cache()
+    while True:
+        state, found = cache.claim(key)
+        if state == "hit":
+            return found, None
+        if state == "own":
+            return None, found
+        try:
+            return found.result(), None
+        except GenerationCancelled:
+            # the owner went away; claim again (and possibly take over)
+            continue
+
+
+def _stream_into(writer, prompt_text, template, guidance, precomputed, on_results=None):
+    """Generate into ``writer``'s staging folder, yielding the stream events.
+
+    ``on_results(artifacts)`` receives the raw model output once all stages finished.
+    """
+    site_name = writer.site_id
+    yield {"event": "stage", "stage": "start", "site": site_name}
+
+    if precomputed:
+        for (artifact, filename), content in zip(ARTIFACTS, precomputed):
+            yield {"event": "stage", "stage": artifact}
+            yield {"event": "token", "artifact": artifact, "text": content}
+            yield _write_artifact(writer, artifact, filename, content)
+        return
 
-        # Add template guidance to prompts when using Ollama
-        html_prompt = f"{html_prompt} {_get_template_guidance(template)}"
-        css_prompt = f"{css_prompt} {_get_template_guidance(template)}"
+    events = queue.Queue()
+    cancel = threading.Event()
+    files = dict(ARTIFACTS)
+    write_lock = threading.Lock()
 
-        html = ollama(html_prompt)
-        css = ollama(css_prompt)
-        js = ollama(js_prompt)
+    def check_live(artifact):
+        if cancel.is_set():
+            raise GenerationCancelled("Akış istemci tarafından bırakıldı")
+        if attempt_expired():
+            # timed out and already retried: this attempt must not touch the site any more
+            raise GenerationCancelled(f"'{artifact}' denemesi süre aşımıyla bırakıldı")
 
-    # Ensure meta charset and viewport are in the <head>
+    def call(artifact, prompt, timeout):
+        # runs on a pipeline thread: write tokens to disk as they arrive. Each attempt gets its
+        # own partial file; the staged artifact itself may be a hard link to a shared blob.
+        parts = []
+        partial = writer.path(f"{files[artifact]}.{secrets.token_hex(4)}.partial")
+        try:
+            with open(partial, "w", encoding="utf-8") as f:
+                for chunk in get_backend().stream(prompt, timeout=timeout):
+                    check_live(artifact)
+                    parts.append(chunk)
+                    f.write(chunk)
+                    f.flush()
+                    events.put({"event": "token", "artifact": artifact, "text": chunk})
+            content = "".join(parts).strip()
+            with write_lock:
+                check_live(artifact)
+                events.put(_write_artifact(writer, artifact, files[artifact], content))
+        finally:
+            try:
+                os.remove(partial)
+            except FileNotFoundError:
+                pass
+        return content
+
+    def runner():
+        try:
+            results = run_pipeline(_artifact_stages(_enrich_prompt(prompt_text, guidance), template, call),
+                                   on_event=events.put, cancel=cancel)
+            events.put(("ok", results))
+        except BaseException as e:
+            events.put(("error", e))
+
+    # the runner keeps the caller's context so request timing covers the stages
+    threading.Thread(target=contextvars.copy_context().run, args=(runner,),
+                     name=f"stream-{site_name}", daemon=True).start()
+    try:
+        while True:
+            item = events.get()
+            if isinstance(item, tuple):
+                status, payload = item
+                if status == "error":
+                    raise payload
+                results = payload
+                break
+            yield item
+    finally:
+        # stop pipeline stages if the consumer went away
+        cancel.set()
+
+    if on_results is not None:
+        on_results(tuple(results[artifact] for artifact, _ in ARTIFACTS))
+
+
+def _write_artifact(writer, artifact, filename, content):
+    """Store a finished (post-processed) artifact plus its compressed variants and return its event."""
+    with span("postprocess"):
+        data = _postprocess(artifact, content).encode("utf-8")
+    # artifacts are immutable from here on: stored once per content hash, precompressed once
+    with span("write"):
+        encodings = writer.write(filename, data)
+    return {"event": "artifact", "artifact": artifact, "file": filename, "bytes": len(data), "encodings": encodings}
+
+
+def _site_record(writer, prompt_text, template, template_type, source, written, timings, started) -> dict:
+    """The catalog entry of a site about to be published (see site_catalog)."""
+    files = {event["file"]: event["bytes"] for event in written}
+    return {
+        "site_id": writer.site_id,
+        "prompt": prompt_text,
+        "template": template,
+        "template_type": template_type,
+        "model": None if source == "mock" else get_backend().model,
+        "source": source,
+        "bytes": sum(files.values()),
+        "files": files,
+        "timings": totals(timings),
+        "seconds": round(time.perf_counter() - started, 6),
+        "created_at": time.time(),
+    }
+
+
+def _publish(writer, record):
+    """Publish the site and add it to the catalog."""
+    # the record travels with the site, so the catalog can be rebuilt from disk
+    write_metadata(writer.staging, record)
+    # the site appears under /sites only once all its files are in place
+    with span("commit"):
+        writer.commit()
     try:
-        html = _ensure_meta_in_head(html)
+        get_catalog().add(record)
+    except sqlite3.Error as e:
+        # the site is published either way; `python -m backend.site_catalog --rebuild` re-indexes it
+        logger.warning("could not add %s to the site catalog: %s", writer.site_id, e)
+
+
+def _result_label(error: BaseException) -> str:
+    if isinstance(error, (GenerationCancelled, GeneratorExit)):
+        return "cancelled"
+    return "error"
+
+
+def _mock_mode() -> bool:
+    return os.getenv("AI_SITE_GENERATOR_MOCK", "false").lower() in ("1", "true", "yes")
+
+
+def _postprocess_html(html):
+    """Strip markdown fences, move meta tags into <head> and check asset links in one pass."""
+    try:
+        return postprocess_html(html)
     except Exception:
         # If post-processing fails, keep original HTML
-        pass
+        return html
 
-    with open(os.path.join(folder, "index.html"), "w", encoding="utf-8") as f:
-        f.write(html)
-    with open(os.path.join(folder, "style.css"), "w", encoding="utf-8") as f:
-        f.write(css)
-    with open(os.path.join(folder, "index.js"), "w", encoding="utf-8") as f:
-        f.write(js)
 
-    # Daha basit bir response için sadece site adını döndürüyoruz
-    return site_name
+def _postprocess(artifact, content):
+    """Post-process a finished artifact before it is written."""
+    if artifact == "html":
+        return _postprocess_html(content)
+    return strip_markdown_fences(content).strip()
 
 
-def _ensure_meta_in_head(html: str) -> str:
-    """Ensure charset and viewport meta tags are inside the <head>.
+def _enrich_prompt(prompt_text, guidance: str = "") -> str:
+    """Prepend premium guidance to the user prompt."""
+    return f"{guidance}\nKullanıcı isteği: {prompt_text}" if guidance else prompt_text
+
+
+def _build_prompts(prompt_text, template):
+    """Return the model prompt for each artifact."""
+    # Base prompts
+    html_prompt = f"'{prompt_text}' temasına uygun bir web sitesi için HTML oluştur. style.css ve index.js dosyalarına bağlantı ekle."
+    css_prompt = f"'{prompt_text}' temalı web sitesi için sade bir style.css oluştur. Renk paleti temaya uygun olsun."
+    js_prompt = f"'{prompt_text}' web sitesine basit bir interaktif index.js oluştur. Sayfa yüklendiğinde konsola '{prompt_text} yüklendi!' yaz."
+
+    # Add template guidance to prompts when using Ollama
+    html_prompt = f"{html_prompt} {_get_template_guidance(template)}"
+    css_prompt = f"{css_prompt} {_get_template_guidance(template)}"
+    return {"html": html_prompt, "css": css_prompt, "js": js_prompt}
+
+
+def _generate_with_llm(prompt_text, template, emit=None):
+    """Run the artifact pipeline against the LLM backend and return the raw artifacts."""
+    stages = _artifact_stages(prompt_text, template, lambda artifact, prompt, timeout: ollama(prompt, timeout))
+    results = run_pipeline(stages, on_event=emit)
+    return tuple(results[artifact] for artifact, _ in ARTIFACTS)
+
+
+def _artifact_stages(prompt_text, template, call):
+    """Build the html -> (css, js) pipeline.
 
-    This is a best-effort, resilient string-based fixer so generated HTML
-    from the model displays correctly in browsers and satisfies linters.
+    ``call(artifact, prompt, timeout)`` produces one artifact. HTML runs first;
+    its class/id selectors are fed into the css and js prompts, which then run
+    concurrently.
     """
-    if not isinstance(html, str):
-        return html
+    prompts = _build_prompts(prompt_text, template)
 
-    metas = []
-    # find charset meta
-    for m in re.finditer(r"<meta[^>]*charset[^>]*>", html, flags=re.IGNORECASE):
-        metas.append(m.group(0))
-    # find viewport meta
-    for m in re.finditer(r"<meta[^>]*name=[\'\"]viewport[\'\"][^>]*>", html, flags=re.IGNORECASE):
-        metas.append(m.group(0))
+    def html_stage(inputs, timeout):
+        return call("html", prompts["html"], timeout)
 
-    if not metas:
-        return html
+    def css_stage(inputs, timeout):
+        return call("css", _with_selectors(prompts["css"], inputs["html"], "css"), timeout)
 
-    # remove duplicates and preserve order
-    seen = set()
-    metas = [m for m in metas if not (m in seen or seen.add(m))]
+    def js_stage(inputs, timeout):
+        return call("js", _with_selectors(prompts["js"], inputs["html"], "js"), timeout)
 
-    # remove found metas from html
-    for m in metas:
-        html = html.replace(m, "")
+    return [
+        Stage("html", html_stage),
+        Stage("css", css_stage, depends_on=("html",)),
+        Stage("js", js_stage, depends_on=("html",)),
+    ]
 
-    # ensure a <head> exists
-    if re.search(r"<head[^>]*>", html, flags=re.IGNORECASE):
-        # insert metas right after opening head tag
-        html = re.sub(r"(<head[^>]*>)", lambda mo: mo.group(1) + "\n" + "\n".join(metas), html, count=1, flags=re.IGNORECASE)
-    else:
-        # no head tag: create one before body or before html end
-        if re.search(r"<html[^>]*>", html, flags=re.IGNORECASE):
-            html = re.sub(r"(<html[^>]*>)", lambda mo: mo.group(1) + "\n<head>\n" + "\n".join(metas) + "\n</head>", html, count=1, flags=re.IGNORECASE)
-        else:
-            # fallback: prepend head
-            html = "<head>\n" + "\n".join(metas) + "\n</head>\n" + html
 
-    return html
+_CLASS_ATTR = re.compile(r"""\bclass\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_ID_ATTR = re.compile(r"""\bid\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_CSS_SELECTOR = re.compile(r"[.#][A-Za-z_][\w-]*(?=[^{}]*\{)")
+
+
+def extract_selectors(html: str, limit: int = 40):
+    """Return ``(classes, ids)`` used in the markup, in document order without duplicates."""
+    classes = {}
+    for m in _CLASS_ATTR.finditer(html or ""):
+        for name in m.group(1).split():
+            classes.setdefault(name, None)
+    ids = {}
+    for m in _ID_ATTR.finditer(html or ""):
+        ids.setdefault(m.group(1).strip(), None)
+    return list(classes)[:limit], [i for i in ids if i][:limit]
+
+
+def _with_selectors(prompt, html, artifact):
+    """Append the selectors found in the generated HTML to a css/js prompt."""
+    classes, ids = extract_selectors(html)
+    if not classes and not ids:
+        return prompt
+    selectors = ", ".join([f".{c}" for c in classes] + [f"#{i}" for i in ids])
+    if artifact == "css":
+        return f"{prompt} HTML'de kullanılan seçiciler: {selectors}. Stilleri bu seçicilere göre yaz."
+    return f"{prompt} HTML'de kullanılan seçiciler: {selectors}. DOM'a yalnızca bu seçicilerle eriş."
+
+
+def _ignore_event(event):
+    pass
+
+
+def _ensure_meta_in_head(html: str) -> str:
+    """Ensure charset and viewport meta tags are inside the <head>.
+
+    Kept for existing callers; runs only the meta fixer of the single-pass
+    post-processor (see html_postprocess.postprocess_html for the full chain).
+    """
+    return postprocess_html(html, fixers=(MetaHeadFixer,))
 
 
 def _get_mock_templates(prompt_text, template):
-    """Return mock HTML, CSS, JS tuple for given template."""
-    templates = {
-        "modern": {
-            "html": """<!DOCTYPE html>
-<html lang=\"tr\">\n<head>\n    <meta charset=\"UTF-8\">\n    <meta name=\"viewport\" content=\"width=device-width, initial-scale=1.0\">\n    <title>{PROMPT}</title>\n    <link rel=\"stylesheet\" href=\"style.css\">\n</head>\n<body>\n    <div class=\"container\">\n        <header class=\"modern-header\">\n            <h1>{PROMPT}</h1>\n            <p>Modern ve minimalist tasarım</p>\n        </header>\n        <main>\n            <section class=\"hero\">\n                <h2>Hoş Geldiniz</h2>\n                <p>Bu {PROMPT} için oluşturulmuş modern bir web sitesidir.</p>\n                <button class=\"cta-button\">Keşfet</button>\n            </section>\n        </main>\n    </div>\n    <script src=\"index.js\"></script>\n</body>\n</html>""",
-            "css": """* {\n    margin: 0;\n    padding: 0;\n    box-sizing: border-box;\n}\n\nbody {\n    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;\n    line-height: 1.6;\n    color: #333;\n    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);\n    min-height: 100vh;\n}\n\n.container {\n    max-width: 1200px;\n    margin: 0 auto;\n    padding: 0 20px;\n}\n\n.modern-header {\n    text-align: center;\n    padding: 4rem 0 2rem;\n    color: white;\n}\n\n.modern-header h1 {\n    font-size: 3rem;\n    margin-bottom: 1rem;\n    text-shadow: 2px 2px 4px rgba(0,0,0,0.3);\n}\n\n.modern-header p {\n    font-size: 1.2rem;\n    opacity: 0.9;\n}\n\n.hero {\n    background: white;\n    padding: 3rem;\n    border-radius: 15px;\n    box-shadow: 0 10px 30px rgba(0,0,0,0.2);\n    text-align: center;\n    margin: 2rem 0;\n}\n\n.hero h2 {\n    color: #333;\n    margin-bottom: 1rem;\n    font-size: 2rem;\n}\n\n.hero p {\n    color: #666;\n    margin-bottom: 2rem;\n    font-size: 1.1rem;\n}\n\n.cta-button {\n    background: #667eea;\n    color: white;\n    border: none;\n    padding: 12px 30px;\n    font-size: 1.1rem;\n    border-radius: 25px;\n    cursor: pointer;\n    transition: all 0.3s ease;\n}\n\n.cta-button:hover {\n    background: #764ba2;\n    transform: translateY(-2px);\n    box-shadow: 0 5px 15px rgba(0,0,0,0.2);\n}""",
-            "js": "console.log('{PROMPT} modern tema ile yüklendi!');\n\ndocument.addEventListener('DOMContentLoaded', function() {\n    const button = document.querySelector('.cta-button');\n    if (button) {\n        button.addEventListener('click', function() {\n            alert('{PROMPT} sitesine hoş geldiniz!');\n        });\n    }\n});"
-        },
-        "classic": {
-            "html": """<!DOCTYPE html>\n<html lang=\"tr\">\n<head>\n    <meta charset=\"UTF-8\">\n    <meta name=\"viewport\" content=\"width=device-width, initial-scale=1.0\">\n    <title>{PROMPT}</title>\n    <link rel=\"stylesheet\" href=\"style.css\">\n</head>\n<body>\n    <div class=\"classic-container\">\n        <header class=\"classic-header\">\n            <nav class=\"classic-nav\">\n                <div class=\"logo\">{PROMPT}</div>\n                <ul class=\"nav-links\">\n                    <li><a href=\"#home\">Ana Sayfa</a></li>\n                    <li><a href=\"#about\">Hakkımızda</a></li>\n                    <li><a href=\"#contact\">İletişim</a></li>\n                </ul>\n            </nav>\n        </header>\n        \n        <main class=\"classic-main\">\n            <section id=\"home\" class=\"hero-section\">\n                <div class=\"hero-content\">\n                    <h1>{PROMPT}</h1>\n                    <p class=\"subtitle\">Profesyonel ve Klasik Çözümler</p>\n                    <button class=\"classic-btn\">Daha Fazla Bilgi</button>\n                </div>\n            </section>\n        </main>\n    </div>\n    <script src=\"index.js\"></script>\n</body>\n</html>""",
-            "css": """* {\n    margin: 0;\n    padding: 0;\n    box-sizing: border-box;\n}\n\nbody {\n    font-family: 'Georgia', 'Times New Roman', serif;\n    line-height: 1.6;\n    color: #333;\n    background-color: #f8f9fa;\n}\n\n.classic-container {\n    max-width: 1200px;\n    margin: 0 auto;\n}\n\n.classic-header {\n    background: #2c3e50;\n    color: white;\n    padding: 1rem 0;\n    box-shadow: 0 2px 5px rgba(0,0,0,0.1);\n}\n\n.classic-nav {\n    display: flex;\n    justify-content: space-between;\n    align-items: center;\n    padding: 0 2rem;\n}\n\n.logo {\n    font-size: 1.8rem;\n    font-weight: bold;\n    color: #ecf0f1;\n}\n\n.nav-links {\n    display: flex;\n    list-style: none;\n    gap: 2rem;\n}\n\n.nav-links a {\n    color: #bdc3c7;\n    text-decoration: none;\n    transition: color 0.3s ease;\n    font-size: 1.1rem;\n}\n\n.nav-links a:hover {\n    color: #ecf0f1;\n}\n\n.classic-main {\n    padding: 2rem;\n}\n\n.hero-section {\n    background: linear-gradient(135deg, #34495e 0%, #2c3e50 100%);\n    color: white;\n    padding: 4rem 2rem;\n    text-align: center;\n    border-radius: 8px;\n    margin-top: 2rem;\n}\n\n.hero-content h1 {\n    font-size: 3rem;\n    margin-bottom: 1rem;\n    font-weight: normal;\n}\n\n.subtitle {\n    font-size: 1.3rem;\n    margin-bottom: 2rem;\n    opacity: 0.9;\n    font-style: italic;\n}\n\n.classic-btn {\n    background: #e74c3c;\n    color: white;\n    border: none;\n    padding: 12px 30px;\n    font-size: 1.1rem;\n    border-radius: 4px;\n    cursor: pointer;\n    transition: background 0.3s ease;\n    font-family: inherit;\n}\n\n.classic-btn:hover {\n    background: #c0392b;\n}""",
-            "js": "console.log('{PROMPT} classic tema ile yüklendi!');\n\ndocument.addEventListener('DOMContentLoaded', function() {\n    const button = document.querySelector('.classic-btn');\n    if (button) {\n        button.addEventListener('click', function() {\n            alert('{PROMPT} - Klasik ve Profesyonel');\n        });\n    }\n});"
-        },
-        "creative": {
-            "html": """<!DOCTYPE html>\n<html lang=\"tr\">\n<head>\n    <meta charset=\"UTF-8\">\n    <meta name=\"viewport\" content=\"width=device-width, initial-scale=1.0\">\n    <title>{PROMPT}</title>\n    <link rel=\"stylesheet\" href=\"style.css\">\n</head>\n<body>\n    <div class=\"creative-container\">\n        <header class=\"creative-header\">\n            <h1 class=\"creative-title\">{PROMPT}</h1>\n            <p class=\"creative-subtitle\">Yaratıcı ve Renkli Deneyim</p>\n        </header>\n        \n        <main class=\"creative-main\">\n            <div class=\"color-blocks\">\n                <div class=\"color-block block-1\">\n                    <h3>Yenilikçi</h3>\n                    <p>Modern çözümler</p>\n                </div>\n                <div class=\"color-block block-2\">\n                    <h3>Yaratıcı</h3>\n                    <p>Özgün tasarımlar</p>\n                </div>\n                <div class=\"color-block block-3\">\n                    <h3>Dinamik</h3>\n                    <p>Canlı etkileşimler</p>\n                </div>\n            </div>\n            \n            <button class=\"creative-btn\">Hayal Et!</button>\n        </main>\n    </div>\n    <script src=\"index.js\"></script>\n</body>\n</html>""",
-            "css": """* {\n    margin: 0;\n    padding: 0;\n    box-sizing: border-box;\n}\n\nbody {\n    font-family: 'Comic Sans MS', cursive, sans-serif;\n    line-height: 1.6;\n    color: #333;\n    background: linear-gradient(45deg, #ff6b6b, #4ecdc4, #45b7d1, #96ceb4);\n    background-size: 400% 400%;\n    animation: gradientShift 15s ease infinite;\n    min-height: 100vh;\n}\n\n@keyframes gradientShift {\n    0% { background-position: 0% 50%; }\n    50% { background-position: 100% 50%; }\n    100% { background-position: 0% 50%; }\n}\n\n.creative-container {\n    max-width: 1200px;\n    margin: 0 auto;\n    padding: 2rem;\n}\n\n.creative-header {\n    text-align: center;\n    margin-bottom: 3rem;\n    color: white;\n    text-shadow: 2px 2px 4px rgba(0,0,0,0.3);\n}\n\n.creative-title {\n    font-size: 4rem;\n    margin-bottom: 1rem;\n    animation: bounce 2s infinite;\n}\n\n@keyframes bounce {\n    0%, 100% { transform: translateY(0); }\n    50% { transform: translateY(-10px); }\n}\n\n.creative-subtitle {\n    font-size: 1.5rem;\n    opacity: 0.9;\n}\n\n.creative-main {\n    display: flex;\n    flex-direction: column;\n    align-items: center;\n    gap: 2rem;\n}\n\n.color-blocks {\n    display: grid;\n    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));\n    gap: 1.5rem;\n    width: 100%;\n    max-width: 800px;\n}\n\n.color-block {\n    padding: 2rem;\n    border-radius: 20px;\n    text-align: center;\n    color: white;\n    box-shadow: 0 10px 30px rgba(0,0,0,0.3);\n    transition: transform 0.3s ease;\n}\n\n.color-block:hover {\n    transform: scale(1.05);\n}\n\n.block-1 {\n    background: linear-gradient(135deg, #ff6b6b, #ee5a24);\n}\n\n.block-2 {\n    background: linear-gradient(135deg, #4ecdc4, #00b894);\n}\n\n.block-3 {\n    background: linear-gradient(135deg, #45b7d1, #0984e3);\n}\n\n.color-block h3 {\n    font-size: 1.5rem;\n    margin-bottom: 0.5rem;\n}\n\n.creative-btn {\n    background: linear-gradient(135deg, #a29bfe, #6c5ce7);\n    color: white;\n    border: none;\n    padding: 15px 40px;\n    font-size: 1.3rem;\n    border-radius: 50px;\n    cursor: pointer;\n    transition: all 0.3s ease;\n    box-shadow: 0 5px 15px rgba(0,0,0,0.2);\n    font-family: inherit;\n}\n\n.creative-btn:hover {\n    transform: scale(1.1) rotate(5deg);\n    box-shadow: 0 10px 25px rgba(0,0,0,0.3);\n}""",
-                "js": "console.log('{PROMPT} creative tema ile yüklendi!');\n\ndocument.addEventListener('DOMContentLoaded', function() {\n    const button = document.querySelector('.creative-btn');\n    if (button) {\n        button.addEventListener('click', function() {\n            button.textContent = 'Harika! 🎉';\n            setTimeout(() => {\n                button.textContent = 'Hayal Et!';\n            }, 2000);\n        });\n    }\n    \n    // Add floating animation to color blocks\n    const blocks = document.querySelectorAll('.color-block');\n    blocks.forEach((block, index) => {\n        block.style.animation = `float ${3 + index * 0.5}s ease-in-out infinite`;\n    });\n});"
-        }
-    }
-    # return tuple (html, css, js)
-    t = templates.get(template, templates["modern"])
-    # replace placeholder with actual prompt
-    html = t["html"].replace("{PROMPT}", prompt_text)
-    css = t["css"].replace("{PROMPT}", prompt_text)
-    js = t["js"].replace("{PROMPT}", prompt_text)
-    return html, css, js
+    """Return mock HTML, CSS, JS tuple for given template.
+
+    Templates live in backend/templates and are compiled once by the registry;
+    the prompt is escaped for each artifact's language.
+    """
+    return get_registry().get(template).render(PROMPT=prompt_text)
 
 
 def _get_template_guidance(template):
     """Return template-specific guidance for Ollama prompts."""
-    guidance = {
-        "modern": "Modern, minimalist ve temiz bir tasarım kullan. Bol beyaz alan, basit geometrik şekiller ve gradient arkaplanlar kullan.",
-        "classic": "Klasik, profesyonel ve geleneksel bir tasarım kullan. Koyu renkler, serif yazı tipleri ve structured layout kullan.",
-        "creative": "Yaratıcı, renkli ve dinamik bir tasarım kullan. Canlı renkler, animasyonlar, gradientler ve interactive elementler ekle."
-    }
-    return guidance.get(template, guidance["modern"])
+    return get_registry().get(template).guidance
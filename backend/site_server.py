@@ -0,0 +1,233 @@
+"""Cache-friendly serving of generated sites.
+
+Generated artifacts never change once written, so at generation time we
+write ``.gz`` (and, when the optional ``brotli`` package is installed,
+``.br``) variants next to each file. :class:`PrecompressedStaticFiles`
+picks the best variant for the request's ``Accept-Encoding``, sends a strong
+content-hash ETag with an ``immutable`` Cache-Control header, answers
+``If-None-Match`` with 304 and keeps recently generated/served files in a
+bounded in-memory cache so preview traffic does not hit the disk. Variant
+lookup and file reads run in a worker thread, off the event loop. Paths with
+dot components (the storage layer's ``.blobs`` and ``.tmp``) are not served.
+
+Environment variables:
+    AI_SITE_GENERATOR_SERVE_CACHE_MB  in-memory cache size (default: 64)
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli  # type: ignore[reportMissingImports]
+except ImportError:  # optional dependency
+    brotli = None
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# (content-coding, file suffix) in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+MIN_COMPRESS_BYTES = 256
+
+
+def _compress(encoding: str, data: bytes):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class SiteFileCache:
+    """Byte-bounded LRU of served representations keyed by ``(path, encoding)``."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, encoding: str, mtime_ns: int, size: int):
+        """Return ``(body, etag)`` if cached for this exact version of the file."""
+        with self._lock:
+            entry = self._entries.get((path, encoding))
+            if entry is None:
+                return None
+            if entry[0] != (mtime_ns, size):
+                self.size -= len(self._entries.pop((path, encoding))[1])
+                return None
+            self._entries.move_to_end((path, encoding))
+            return entry[1], entry[2]
+
+    def put(self, path: str, encoding: str, mtime_ns: int, size: int, body: bytes, etag: str):
+        if len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            old = self._entries.pop((path, encoding), None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[(path, encoding)] = ((mtime_ns, size), body, etag)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+_cache = None
+
+
+def get_site_cache() -> SiteFileCache:
+    global _cache
+    if _cache is None:
+        _cache = SiteFileCache(int(float(os.getenv("AI_SITE_GENERATOR_SERVE_CACHE_MB", "64")) * 1024 * 1024))
+    return _cache
+
+
+def compress_variants(data: bytes) -> dict:
+    """Return ``{encoding: body}`` for the variants worth storing (smaller than ``data``)."""
+    variants = {}
+    if len(data) < MIN_COMPRESS_BYTES:
+        return variants
+    for encoding, _ in ENCODINGS:
+        body = _compress(encoding, data)
+        if body is not None and len(body) < len(data):
+            variants[encoding] = body
+    return variants
+
+
+def warm_site_cache(path: str, data: bytes, variants: dict):
+    """Put the identity body and ``variants`` of the file at ``path`` in the serving cache."""
+    real = os.path.realpath(path)
+    st = os.stat(real)
+    cache = get_site_cache()
+    for encoding, body in (("identity", data), *variants.items()):
+        cache.put(real, encoding, st.st_mtime_ns, st.st_size, body, _etag(body))
+
+
+def write_atomic(path: str, data: bytes):
+    """Replace ``path`` via a temp file, so readers (and hard links to the old file) never see partial data."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def precompress_file(path: str, data: bytes = None, warm: bool = True) -> list:
+    """Write compressed variants of ``path`` and warm the serving cache.
+
+    Returns the content-codings written. Variants that would not be smaller
+    than the original are skipped.
+    """
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    variants = compress_variants(data)
+    for encoding, suffix in ENCODINGS:
+        variant = path + suffix
+        if encoding in variants:
+            write_atomic(variant, variants[encoding])
+        elif os.path.exists(variant):
+            # drop a stale variant from an earlier version of the file
+            os.remove(variant)
+    if warm:
+        warm_site_cache(path, data, variants)
+    return [encoding for encoding, _ in ENCODINGS if encoding in variants]
+
+
+def negotiate(accept_encoding: str, available) -> str:
+    """Pick the preferred available content-coding allowed by ``Accept-Encoding``."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    for encoding, _ in ENCODINGS:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in available and q > 0:
+            return encoding
+    return "identity"
+
+
+class _ThreadedResponse(Response):
+    """Builds the real response in a worker thread when it is sent."""
+
+    def __init__(self, build):
+        super().__init__()
+        self._build = build
+
+    async def __call__(self, scope, receive, send):
+        response = await run_in_threadpool(self._build)
+        await response(scope, receive, send)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles serving precompressed variants with strong ETags and immutable caching."""
+
+    def __init__(self, *args, cache: SiteFileCache = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache = cache
+
+    @property
+    def cache(self) -> SiteFileCache:
+        return self._cache or get_site_cache()
+
+    def lookup_path(self, path: str):
+        # dot entries hold storage internals (.blobs, .tmp staging dirs) and are never served
+        if any(part.startswith(".") and part != "." for part in path.replace("\\", "/").split("/")):
+            return "", None
+        return super().lookup_path(path)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        if status_code != 200 or "range" in request_headers or full_path.endswith((".gz", ".br")):
+            return super().file_response(full_path, stat_result, scope, status_code)
+        # file_response is called on the event loop; the variant checks and reads are not
+        return _ThreadedResponse(partial(self._negotiated_response, full_path, stat_result, scope, request_headers))
+
+    def _negotiated_response(self, full_path, stat_result, scope, request_headers) -> Response:
+        available = [enc for enc, suffix in ENCODINGS if os.path.exists(full_path + suffix)]
+        encoding = negotiate(request_headers.get("accept-encoding", ""), available)
+        cached = self.cache.get(full_path, encoding, stat_result.st_mtime_ns, stat_result.st_size)
+        if cached is None:
+            suffix = dict(ENCODINGS).get(encoding, "")
+            with open(full_path + suffix, "rb") as f:
+                body = f.read()
+            cached = (body, _etag(body))
+            self.cache.put(full_path, encoding, stat_result.st_mtime_ns, stat_result.st_size, *cached)
+        body, etag = cached
+
+        headers = {"etag": etag, "cache-control": CACHE_CONTROL, "vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        if_none_match = request_headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        if scope["method"] == "HEAD":
+            headers["content-length"] = str(len(body))
+            body = b""
+        return Response(body, media_type=media_type, headers=headers)
@@ -0,0 +1,391 @@
+"""Atomic, deduplicated storage for generated sites with a retention policy.
+
+Layout under the sites root (``backend/generated_sites`` by default)::
+
+    site_<YYYYmmdd_HHMMSS>_<hex>/   published sites (what /sites serves)
+    site_.../v<N>/                  later versions of a site (see SiteStorage.create_version)
+    .tmp/<site id>/                 sites being written
+    .blobs/<ab>/<sha256>[.gz|.br]   content-addressed artifact bodies
+
+A :class:`SiteWriter` builds a site in its staging directory and
+:meth:`SiteWriter.commit` publishes it with one atomic ``rename``, so a
+site is either absent or complete. Artifacts are stored once per content
+hash (with their precompressed variants) and hard-linked into each site;
+when hard links are not available the blob is copied instead. A blob's
+link count doubles as its reference count: a blob with no links left
+besides its own is unreferenced and is collected after sites are evicted.
+
+A site's first version is its folder itself; refinements are published as
+``v2/``, ``v3/``... inside it, with every file they did not change linked
+from the version they were based on.
+
+Environment variables:
+    AI_SITE_GENERATOR_SITES_DIR         sites root (default: backend/generated_sites)
+    AI_SITE_GENERATOR_DEDUP             "false" to write plain files instead of blob links
+    AI_SITE_GENERATOR_RETAIN_DAYS       evict sites older than this (default: 0 = keep)
+    AI_SITE_GENERATOR_RETAIN_SITES      keep at most this many sites (default: 0 = unlimited)
+    AI_SITE_GENERATOR_RETAIN_MB         keep total size under this (default: 0 = unlimited)
+    AI_SITE_GENERATOR_RETENTION_INTERVAL  minimum seconds between retention sweeps (default: 60)
+"""
+import errno
+import hashlib
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from backend.site_server import ENCODINGS, compress_variants, warm_site_cache, write_atomic
+
+BLOB_DIR = ".blobs"
+STAGING_DIR = ".tmp"
+# staging dirs older than this are leftovers of crashed writers
+STALE_STAGING_SECONDS = 3600
+_VERSION_DIR = re.compile(r"v([0-9]+)$")
+
+
+def new_site_id() -> str:
+    """Return a unique, chronologically sortable site id."""
+    return f"site_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(4)}"
+
+
+def _env_number(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class SiteWriter:
+    """Stages the files of one new site; call :meth:`commit` or :meth:`abort`."""
+
+    def __init__(self, storage: "SiteStorage", site_id: str, staging_name: str = None):
+        self.storage = storage
+        self.site_id = site_id
+        self.staging = os.path.join(storage.root, STAGING_DIR, staging_name or site_id)
+        self.folder = os.path.join(storage.root, site_id)
+        self._written = {}
+        self.committed = False
+        os.makedirs(self.staging)
+
+    def path(self, filename: str) -> str:
+        """Staging path of ``filename`` (e.g. for progressively written partial output)."""
+        return os.path.join(self.staging, filename)
+
+    def write(self, filename: str, data: bytes) -> list:
+        """Store a finished file and its compressed variants; returns the encodings available."""
+        variants = self.storage.store(self.path(filename), data)
+        self._written[filename] = (data, variants)
+        return [encoding for encoding, suffix in ENCODINGS if os.path.exists(self.path(filename) + suffix)]
+
+    def link(self, filename: str, source: str) -> list:
+        """Reuse the published file ``source`` (and its variants) unchanged; returns its encodings."""
+        self.storage._link(source, self.path(filename))
+        encodings = []
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(source + suffix):
+                self.storage._link(source + suffix, self.path(filename) + suffix)
+                encodings.append(encoding)
+        return encodings
+
+    def commit(self) -> str:
+        """Atomically publish the site and return its folder."""
+        os.rename(self.staging, self.folder)
+        self._published()
+        return self.folder
+
+    def _published(self):
+        self.committed = True
+        for filename, (data, variants) in self._written.items():
+            # freshly generated sites are previewed right away
+            warm_site_cache(os.path.join(self.folder, filename), data, variants)
+        self.storage.maybe_enforce_retention()
+
+    def abort(self):
+        if not self.committed:
+            shutil.rmtree(self.staging, ignore_errors=True)
+
+
+class VersionWriter(SiteWriter):
+    """Stages a new version of a published site; its number is assigned by :meth:`commit`."""
+
+    def __init__(self, storage: "SiteStorage", site_id: str):
+        # several refinements of one site may be staged at once
+        super().__init__(storage, site_id, staging_name=f"{site_id}.{secrets.token_hex(4)}")
+        self.site_folder, self.folder = self.folder, None
+        self.version = None
+
+    def commit(self) -> str:
+        """Publish as the site's next version number and return its folder."""
+        while True:
+            version = max(self.storage.versions(self.site_id)) + 1
+            folder = os.path.join(self.site_folder, f"v{version}")
+            try:
+                # fails if a concurrent refinement took this number first
+                os.rename(self.staging, folder)
+                break
+            except OSError as e:
+                if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                    raise
+        self.folder, self.version = folder, version
+        self._published()
+        return self.folder
+
+
+class SiteStorage:
+    """Sites root with atomic publishing, blob dedup and retention limits."""
+
+    def __init__(self, root: str = None, dedup: bool = None, max_age: float = None,
+                 max_sites: int = None, max_bytes: int = None, interval: float = None):
+        self.root = root or os.getenv("AI_SITE_GENERATOR_SITES_DIR", os.path.join("backend", "generated_sites"))
+        if dedup is None:
+            dedup = os.getenv("AI_SITE_GENERATOR_DEDUP", "true").lower() not in ("0", "false", "no")
+        self.dedup = dedup
+        self.max_age = max_age if max_age is not None else _env_number("AI_SITE_GENERATOR_RETAIN_DAYS", 0) * 86400
+        self.max_sites = max_sites if max_sites is not None else int(_env_number("AI_SITE_GENERATOR_RETAIN_SITES", 0))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            _env_number("AI_SITE_GENERATOR_RETAIN_MB", 0) * 1024 * 1024)
+        self.interval = interval if interval is not None else _env_number("AI_SITE_GENERATOR_RETENTION_INTERVAL", 60)
+        self.blob_root = os.path.join(self.root, BLOB_DIR)
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        self._listeners = []
+        os.makedirs(os.path.join(self.root, STAGING_DIR), exist_ok=True)
+        # leftovers of writers that crashed or were killed before this process started
+        self._remove_stale_staging(time.time())
+
+    # -- writing -------------------------------------------------------------
+
+    def create(self) -> SiteWriter:
+        """Start a new site with a fresh unique id."""
+        while True:
+            site_id = new_site_id()
+            if not os.path.exists(os.path.join(self.root, site_id)):
+                try:
+                    return SiteWriter(self, site_id)
+                except FileExistsError:
+                    pass
+
+    def store(self, path: str, data: bytes) -> dict:
+        """Place ``data`` (and variants) at ``path``; returns ``{encoding: body}`` of the variants stored."""
+        if not self.dedup:
+            variants = compress_variants(data)
+            write_atomic(path, data)
+            for encoding, suffix in ENCODINGS:
+                if encoding in variants:
+                    write_atomic(path + suffix, variants[encoding])
+            return variants
+        digest = hashlib.sha256(data).hexdigest()
+        blob = os.path.join(self.blob_root, digest[:2], digest)
+        for _ in range(3):
+            variants = self._blob_variants(blob) if os.path.exists(blob) else self._put_blob(blob, data)
+            try:
+                self._link(blob, path)
+                for encoding, suffix in ENCODINGS:
+                    if encoding in variants:
+                        self._link(blob + suffix, path + suffix)
+                return variants
+            except FileNotFoundError:
+                # collected by a concurrent retention sweep; store it again
+                continue
+        raise RuntimeError(f"blob {digest} kept disappearing while linking {path}")
+
+    def _put_blob(self, blob: str, data: bytes) -> dict:
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        variants = compress_variants(data)
+        # variants first: a blob is only reused once its main file exists
+        for encoding, suffix in ENCODINGS:
+            if encoding in variants:
+                write_atomic(blob + suffix, variants[encoding])
+        write_atomic(blob, data)
+        return variants
+
+    @staticmethod
+    def _blob_variants(blob: str) -> dict:
+        """Read the variants stored next to an existing blob (they are written before it)."""
+        variants = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                with open(blob + suffix, "rb") as f:
+                    variants[encoding] = f.read()
+            except FileNotFoundError:
+                continue
+        return variants
+
+    @staticmethod
+    def _link(src: str, dst: str):
+        tmp = f"{dst}.{threading.get_ident()}.lnk"
+        try:
+            os.link(src, tmp)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                raise FileNotFoundError(e.errno, e.strerror, src) from e
+            # no hard links here (other device, unsupported filesystem): copy
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+    def versions(self, site_id: str) -> list:
+        """Version numbers of a published site, oldest first; raises LookupError if there is no such site."""
+        folder = os.path.join(self.root, site_id)
+        if site_id.startswith(".") or os.sep in site_id or not os.path.isdir(folder):
+            raise LookupError(f"site not found: {site_id}")
+        found = [1]
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                match = _VERSION_DIR.match(entry.name)
+                if match and entry.is_dir(follow_symlinks=False):
+                    found.append(int(match.group(1)))
+        return sorted(found)
+
+    def version_folder(self, site_id: str, version: int) -> str:
+        folder = os.path.join(self.root, site_id)
+        return folder if version == 1 else os.path.join(folder, f"v{version}")
+
+    def create_version(self, site_id: str) -> VersionWriter:
+        """Start a new version of a published site."""
+        self.versions(site_id)
+        return VersionWriter(self, site_id)
+
+    # -- retention -----------------------------------------------------------
+
+    def on_evict(self, listener):
+        """Register ``listener(site_id)``, called after a site is removed by retention."""
+        self._listeners.append(listener)
+
+    def sites(self) -> list:
+        """Return ``[(created, site_id)]`` of published sites, oldest first."""
+        found = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                    continue
+                try:
+                    found.append((entry.stat(follow_symlinks=False).st_mtime, entry.name))
+                except FileNotFoundError:
+                    continue
+        found.sort()
+        return found
+
+    def _unique_bytes(self, folder: str) -> int:
+        """Bytes freed by removing ``folder``: files not linked from outside it (versions link to each other)."""
+        files = {}
+        for dirpath, _, filenames in os.walk(folder):
+            for name in filenames:
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                links, _, _ = files.get((st.st_dev, st.st_ino), (0, 0, 0))
+                files[(st.st_dev, st.st_ino)] = (links + 1, st.st_nlink, st.st_size)
+        # besides the links inside the folder, a deduplicated file has one from the blob store
+        outside = 1 if self.dedup else 0
+        return sum(size for links, nlink, size in files.values() if nlink <= links + outside)
+
+    def total_bytes(self) -> int:
+        """Disk usage of the published sites and their blobs, counting hard-linked files once.
+
+        Other entries of the root (the site catalog, ``.tmp`` staging dirs) are
+        not counted: retention cannot free them.
+        """
+        seen, total = set(), 0
+        folders = [os.path.join(self.root, site_id) for _, site_id in self.sites()] + [self.blob_root]
+        for folder in folders:
+            for dirpath, _, filenames in os.walk(folder):
+                for name in filenames:
+                    try:
+                        st = os.stat(os.path.join(dirpath, name))
+                    except FileNotFoundError:
+                        continue
+                    if (st.st_dev, st.st_ino) not in seen:
+                        seen.add((st.st_dev, st.st_ino))
+                        total += st.st_size
+        return total
+
+    def maybe_enforce_retention(self):
+        """Run :meth:`sweep` in the background unless one ran within ``interval`` seconds."""
+        now = time.monotonic()
+        if now - self._last_sweep < self.interval:
+            return
+        self._last_sweep = now
+        threading.Thread(target=self.sweep, name="site-retention", daemon=True).start()
+
+    def sweep(self):
+        """Remove stale staging dirs, then evict sites if any retention limit is set."""
+        self._remove_stale_staging(time.time())
+        if self.max_age or self.max_sites or self.max_bytes:
+            self.enforce_retention()
+
+    def enforce_retention(self) -> list:
+        """Evict the oldest sites until age/count/size limits hold; returns the evicted ids."""
+        if not self._sweep_lock.acquire(blocking=False):
+            return []
+        try:
+            evicted = []
+            sites = self.sites()
+            now = time.time()
+            total = self.total_bytes() if self.max_bytes else 0
+            for created, site_id in sites:
+                remaining = len(sites) - len(evicted)
+                too_old = self.max_age and now - created > self.max_age
+                too_many = self.max_sites and remaining > self.max_sites
+                too_big = self.max_bytes and total > self.max_bytes
+                if not (too_old or too_many or too_big):
+                    # sites are oldest first: the rest are newer and within age
+                    break
+                folder = os.path.join(self.root, site_id)
+                if self.max_bytes:
+                    total -= self._unique_bytes(folder)
+                shutil.rmtree(folder, ignore_errors=True)
+                evicted.append(site_id)
+            if evicted:
+                self.collect_blobs()
+                for site_id in evicted:
+                    for listener in self._listeners:
+                        listener(site_id)
+            return evicted
+        finally:
+            self._sweep_lock.release()
+
+    def collect_blobs(self) -> int:
+        """Delete blobs no site links to any more; returns how many were removed."""
+        removed = 0
+        if not (self.dedup and os.path.isdir(self.blob_root)):
+            return removed
+        for dirpath, _, filenames in os.walk(self.blob_root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.stat(path).st_nlink == 1:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    def _remove_stale_staging(self, now: float):
+        try:
+            entries = list(os.scandir(os.path.join(self.root, STAGING_DIR)))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if now - entry.stat(follow_symlinks=False).st_mtime > STALE_STAGING_SECONDS:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except FileNotFoundError:
+                continue
+
+
+_storage = None
+
+
+def get_storage() -> SiteStorage:
+    global _storage
+    if _storage is None:
+        _storage = SiteStorage()
+    return _storage
+
+
+def set_storage(storage: SiteStorage):
+    """Install a storage (mainly for tests); returns the previous one."""
+    global _storage
+    previous, _storage = _storage, storage
+    return previous
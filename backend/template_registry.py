@@ -0,0 +1,190 @@
+"""On-disk template registry shared by mock mode and premium templates.
+
+Each template is a directory under ``backend/templates`` (or
+``AI_SITE_GENERATOR_TEMPLATES_DIR``)::
+
+    <name>/index.html, style.css, index.js   artifact bodies with {SLOT} markers
+    <name>/template.json                     {"order": n, "guidance": ..., "premium": {key: {...}}}
+
+Adding a directory adds a template; no code changes are needed. Templates
+(and their premium keys) are listed by ``order``, then by name. Bodies are
+read and compiled on first use only: the text is split once into literal
+segments and slot names, so rendering is a single join with the values
+escaped for the artifact's language (HTML entities, JS or CSS string escapes).
+Slots are ``{UPPER_CASE}`` names, which never collide with CSS blocks or JS
+``${...}`` template literals.
+"""
+import html
+import json
+import os
+import re
+import threading
+
+DEFAULT_TEMPLATE = "modern"
+ARTIFACT_FILES = (("html", "index.html"), ("css", "style.css"), ("js", "index.js"))
+_SLOT = re.compile(r"\{([A-Z][A-Z0-9_]*)\}")
+
+_JS_ESCAPES = {
+    "\\": "\\\\", "'": "\\'", '"': '\\"', "`": "\\`", "\n": "\\n", "\r": "\\r",
+    "\u2028": "\\u2028", "\u2029": "\\u2029", "<": "\\x3C", "$": "\\$",
+}
+_JS_SPECIAL = re.compile("[" + re.escape("".join(_JS_ESCAPES)) + "]")
+_CSS_SPECIAL = re.compile(r"""[\\'"\n\r<>{}]""")
+
+
+def escape_html(value: str) -> str:
+    return html.escape(value, quote=True)
+
+
+def escape_js(value: str) -> str:
+    """Escape for use inside a JS string literal (any quote style) in a script file."""
+    return _JS_SPECIAL.sub(lambda m: _JS_ESCAPES[m.group(0)], value)
+
+
+def escape_css(value: str) -> str:
+    """Escape for use inside a quoted CSS string."""
+    return _CSS_SPECIAL.sub(lambda m: "\\%x " % ord(m.group(0)), value)
+
+
+ESCAPERS = {"html": escape_html, "js": escape_js, "css": escape_css}
+
+
+class CompiledTemplate:
+    """A template body pre-split into literal segments and slot names."""
+
+    __slots__ = ("segments", "slots", "escape")
+
+    def __init__(self, text: str, escape=escape_html):
+        parts = _SLOT.split(text)
+        # split() alternates literal, slot name, literal, ...
+        self.segments = tuple(parts[0::2])
+        self.slots = tuple(parts[1::2])
+        self.escape = escape
+
+    def render(self, values: dict) -> str:
+        if not self.slots:
+            return self.segments[0]
+        escaped = {name: self.escape(str(values.get(name, ""))) for name in set(self.slots)}
+        out = [self.segments[0]]
+        for name, literal in zip(self.slots, self.segments[1:]):
+            out.append(escaped[name])
+            out.append(literal)
+        return "".join(out)
+
+
+class Template:
+    """Metadata of one template directory; artifact bodies are compiled lazily."""
+
+    def __init__(self, name: str, path: str, meta: dict):
+        self.name = name
+        self.path = path
+        self.meta = meta
+        self.guidance = meta.get("guidance", "")
+        self.premium = meta.get("premium", {})
+        self.order = meta.get("order", float("inf"))
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    def _compile(self):
+        compiled = {}
+        for artifact, filename in ARTIFACT_FILES:
+            with open(os.path.join(self.path, filename), "r", encoding="utf-8") as f:
+                text = f.read()
+            # files end with a newline by convention; it is not part of the template
+            if text.endswith("\n"):
+                text = text[:-1]
+            compiled[artifact] = CompiledTemplate(text, ESCAPERS[artifact])
+        return compiled
+
+    @property
+    def compiled(self) -> dict:
+        if self._compiled is None:
+            with self._lock:
+                if self._compiled is None:
+                    self._compiled = self._compile()
+        return self._compiled
+
+    def render(self, **values) -> tuple:
+        """Return ``(html, css, js)`` with slots filled from ``values``."""
+        compiled = self.compiled
+        return tuple(compiled[artifact].render(values) for artifact, _ in ARTIFACT_FILES)
+
+
+class TemplateRegistry:
+    """Templates found under ``root``, scanned on first access."""
+
+    def __init__(self, root: str = None):
+        self.root = root or os.getenv(
+            "AI_SITE_GENERATOR_TEMPLATES_DIR", os.path.join(os.path.dirname(__file__), "templates")
+        )
+        self._templates = None
+        self._premium = None
+        self._lock = threading.Lock()
+
+    def _scan(self) -> dict:
+        templates = {}
+        try:
+            names = sorted(os.listdir(self.root))
+        except FileNotFoundError:
+            return templates
+        for name in names:
+            path = os.path.join(self.root, name)
+            meta_path = os.path.join(path, "template.json")
+            if name.startswith(".") or not os.path.isfile(meta_path):
+                continue
+            with open(meta_path, "r", encoding="utf-8") as f:
+                templates[name] = Template(name, path, json.load(f))
+        # sorted() is stable, so templates without an order keep name order after the ordered ones
+        return dict(sorted(templates.items(), key=lambda item: item[1].order))
+
+    @property
+    def templates(self) -> dict:
+        if self._templates is None:
+            with self._lock:
+                if self._templates is None:
+                    self._templates = self._scan()
+        return self._templates
+
+    def names(self) -> list:
+        return list(self.templates)
+
+    def get(self, name: str) -> Template:
+        """Return the named template, falling back to the default template."""
+        templates = self.templates
+        template = templates.get(name) or templates.get(DEFAULT_TEMPLATE)
+        if template is None:
+            raise LookupError(f"template not found: {name!r} (templates dir: {self.root})")
+        return template
+
+    def premium(self) -> dict:
+        """Return ``{premium_key: {"name", "description", "map_to"}}`` across all templates."""
+        if self._premium is None:
+            entries = {}
+            for template in self.templates.values():
+                for key, info in template.premium.items():
+                    entries[key] = {**info, "map_to": template.name}
+            self._premium = entries
+        return self._premium
+
+    def reload(self):
+        """Forget scanned templates so new or edited ones are picked up."""
+        with self._lock:
+            self._templates = None
+            self._premium = None
+
+
+_registry = None
+
+
+def get_registry() -> TemplateRegistry:
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry()
+    return _registry
+
+
+def set_registry(registry: TemplateRegistry):
+    """Install a registry (mainly for tests); returns the previous one."""
+    global _registry
+    previous, _registry = _registry, registry
+    return previous
@@ -0,0 +1,10 @@
+console.log('{PROMPT} classic tema ile yüklendi!');
+
+document.addEventListener('DOMContentLoaded', function() {
+    const button = document.querySelector('.classic-btn');
+    if (button) {
+        button.addEventListener('click', function() {
+            alert('{PROMPT} - Klasik ve Profesyonel');
+        });
+    }
+});
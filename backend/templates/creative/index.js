@@ -0,0 +1,19 @@
+console.log('{PROMPT} creative tema ile yüklendi!');
+
+document.addEventListener('DOMContentLoaded', function() {
+    const button = document.querySelector('.creative-btn');
+    if (button) {
+        button.addEventListener('click', function() {
+            button.textContent = 'Harika! 🎉';
+            setTimeout(() => {
+                button.textContent = 'Hayal Et!';
+            }, 2000);
+        });
+    }
+    
+    // Add floating animation to color blocks
+    const blocks = document.querySelectorAll('.color-block');
+    blocks.forEach((block, index) => {
+        block.style.animation = `float ${3 + index * 0.5}s ease-in-out infinite`;
+    });
+});
@@ -0,0 +1,10 @@
+console.log('{PROMPT} modern tema ile yüklendi!');
+
+document.addEventListener('DOMContentLoaded', function() {
+    const button = document.querySelector('.cta-button');
+    if (button) {
+        button.addEventListener('click', function() {
+            alert('{PROMPT} sitesine hoş geldiniz!');
+        });
+    }
+});
@@ -0,0 +1,52 @@
+import os
+import sys
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.benchmarks.fake_ollama import FakeOllamaServer
+from backend.generation_cache import GenerationCache, set_cache
+from backend.llm_backends import OllamaHTTPBackend, set_backend
+from backend.site_catalog import SiteCatalog, set_catalog
+from backend.site_storage import SiteStorage, set_storage
+
+
+@pytest.fixture(autouse=True)
+def isolated_generation_cache(tmp_path):
+    """Give every test a fresh generation cache so results never leak between runs."""
+    previous = set_cache(GenerationCache(disk_dir=str(tmp_path / "generation_cache")))
+    yield
+    set_cache(previous)
+
+
+@pytest.fixture(autouse=True)
+def isolated_site_catalog(tmp_path):
+    """Index generated sites into a throwaway catalog."""
+    catalog = SiteCatalog(str(tmp_path / "catalog.sqlite3"))
+    previous = set_catalog(catalog)
+    yield catalog
+    set_catalog(previous)
+    catalog.close()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Write generated sites under ``tmp_path`` instead of backend/generated_sites."""
+    storage = SiteStorage(root=str(tmp_path / "sites"), dedup=True, interval=0)
+    previous = set_storage(storage)
+    yield storage
+    set_storage(previous)
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """Generate against a local fake Ollama server; yields the server (model ``fake-model``)."""
+    monkeypatch.delenv("AI_SITE_GENERATOR_MOCK", raising=False)
+    with FakeOllamaServer(tokens_per_sec=2000) as server:
+        backend = OllamaHTTPBackend(host=server.url, model="fake-model")
+        previous = set_backend(backend)
+        yield server
+        set_backend(previous)
+        backend.close()
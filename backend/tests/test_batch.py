@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.testclient import TestClient  # type: ignore[reportMissingImports]
+
+from backend import app as app_module
+from backend.app import app
+from backend.batch import BatchError, group_items, parse_batch
+from backend.jobs import JobScheduler, set_scheduler
+
+
+def _lines(res):
+    return [json.loads(line) for line in res.text.splitlines() if line.strip()]
+
+
+@pytest.fixture
+def recorded_generations(monkeypatch):
+    """Replace generate_site with a recorder and use a single model slot."""
+    calls = []
+
+    def fake_generate_site(prompt, template, guidance="", on_event=None, template_type=None):
+        if "bozuk" in prompt:
+            raise RuntimeError("model hatası")
+        calls.append((prompt, template, guidance))
+        return f"site_{len(calls)}"
+
+    monkeypatch.setattr(app_module, "generate_site", fake_generate_site)
+    previous = set_scheduler(JobScheduler(slots=1, max_queue=8, max_queue_per_client=2))
+    yield calls
+    set_scheduler(previous)
+
+
+def test_json_batch_runs_grouped_and_streams_results(recorded_generations):
+    items = [
+        {"prompt": "Kafe", "template_type": "minimalist", "id": "a"},
+        {"prompt": "Hukuk bürosu", "template_type": "kurumsal", "id": "b"},
+        {"prompt": "Pastane", "template_type": "minimalist", "id": "c"},
+        {"prompt": "Muhasebe", "template_type": "kurumsal", "id": "d"},
+        {"prompt": "Çiçekçi", "template_type": "minimalist", "id": "e"},
+    ]
+    with TestClient(app) as client:
+        res = client.post("/api/generate/batch", json={"items": items})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = _lines(res)
+    assert lines[0]["event"] == "accepted" and lines[0]["items"] == 5
+    assert [g["items"] for g in lines[0]["groups"]] == [3, 2]
+    results = [line for line in lines if line["event"] == "result"]
+    assert sorted(r["id"] for r in results) == ["a", "b", "c", "d", "e"]
+    assert all(r["status"] == "ok" and r["url"].endswith(f"/sites/{r['site']}/index.html") for r in results)
+    assert lines[-1]["event"] == "done" and lines[-1]["ok"] == 5 and lines[-1]["error"] == 0
+
+    # grouped: all minimalist prompts first, then kurumsal, sharing the guidance prefix
+    assert [p for p, _, _ in recorded_generations] == ["Kafe", "Pastane", "Çiçekçi", "Hukuk bürosu", "Muhasebe"]
+    assert [t for _, t, _ in recorded_generations] == ["modern"] * 3 + ["classic"] * 2
+
+
+def test_csv_batch_reports_item_errors(recorded_generations):
+    body = "prompt,template_type,id\nKafe,creative,1\nbozuk istek,creative,2\n"
+    with TestClient(app) as client:
+        res = client.post("/api/generate/batch", content=body.encode("utf-8"), headers={"Content-Type": "text/csv"})
+    lines = _lines(res)
+    by_id = {line["id"]: line for line in lines if line["event"] == "result"}
+    assert by_id["1"]["status"] == "ok"
+    assert by_id["2"]["status"] == "error" and "model hatası" in by_id["2"]["error"]
+    assert lines[-1]["ok"] == 1 and lines[-1]["error"] == 1
+
+
+@pytest.mark.parametrize(
+    "body, content_type, status",
+    [
+        (b"[]", "application/json", 400),
+        (b'[{"prompt": "  "}]', "application/json", 400),
+        (b"not json", "application/json", 400),
+        (b'[{"prompt": "kafe", "template_type": 5}]', "application/json", 400),
+        (b'[{"prompt": ["kafe"]}]', "application/json", 400),
+        (b"name\nx\n", "text/csv", 400),
+        (b"<xml/>", "application/xml", 415),
+    ],
+)
+def test_invalid_batches_are_rejected(body, content_type, status):
+    res = TestClient(app).post("/api/generate/batch", content=body, headers={"Content-Type": content_type})
+    assert res.status_code == status
+
+
+def test_batch_size_is_limited(monkeypatch):
+    monkeypatch.setenv("AI_SITE_GENERATOR_BATCH_MAX_ITEMS", "2")
+    with pytest.raises(BatchError) as e:
+        parse_batch(json.dumps(["a", "b", "c"]).encode(), "application/json")
+    assert e.value.status == 413
+
+
+def test_item_ids_are_kept_as_given():
+    items = parse_batch(json.dumps([{"prompt": "a", "id": 0}, {"prompt": "b", "id": ""}, "c"]).encode(),
+                        "application/json")
+    assert [i.id for i in items] == [0, "", None]
+
+
+def test_group_items_keeps_first_appearance_order():
+    items = parse_batch(json.dumps([
+        {"prompt": "1", "template_type": "creative"},
+        {"prompt": "2", "template_type": "yok", "template": "classic"},
+        {"prompt": "3", "template_type": "creative"},
+    ]).encode(), "application/json")
+    groups = group_items(items, app_module._resolve_premium)
+    assert [(key[0], [i.prompt for i in group]) for key, group in groups] == [("creative", ["1", "3"]),
+                                                                                ("classic", ["2"])]
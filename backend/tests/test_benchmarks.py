@@ -0,0 +1,43 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.benchmarks import compare, load, micro, percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_micro_suite_reports_every_case_and_size():
+    doc = micro.run(sizes=(512, 4096), repeat=1, min_time=0.001)
+    cases = {(r["name"], r["size"]) for r in doc["results"]}
+    assert len(cases) == 8
+    assert all(r["us_per_op"] > 0 for r in doc["results"])
+    assert doc["meta"]["settings"]["sizes"] == [512, 4096]
+
+
+def test_load_suite_drives_both_endpoints_against_fake_model():
+    doc = load.run(concurrency=(1, 2), requests=2, tokens=20, slots=2)
+    results = {(r["endpoint"], r["concurrency"]): r for r in doc["results"]}
+    assert set(results) == {("/generate", 1), ("/generate", 2), ("/api/generate", 1), ("/api/generate", 2)}
+    for r in results.values():
+        assert r["ok"] == r["requests"] and r["errors"] == 0
+        assert 0 < r["ttfb_ms"]["p50"] <= r["latency_ms"]["p99"]
+        assert r["throughput_rps"] > 0
+
+
+def test_compare_flags_regressions():
+    base = {"suite": "micro", "meta": {}, "results": [{"name": "x", "size": 1, "us_per_op": 10.0}]}
+    head = {"suite": "micro", "meta": {}, "results": [{"name": "x", "size": 1, "us_per_op": 13.0}]}
+    rows, regressions = compare.compare(base, head, threshold=10)
+    assert rows == [(("x", 1), "us_per_op", 10.0, 13.0, 30.0)]
+    assert regressions == rows
+    assert compare.compare(head, base, threshold=10)[1] == []
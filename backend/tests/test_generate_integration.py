@@ -19,7 +19,7 @@ from backend.site_generator import generate_site
         ("creative", "creative-title"),
     ],
 )
-def test_generate_site_creates_files_and_contains_prompt(monkeypatch, template, marker):
+def test_generate_site_creates_files_and_contains_prompt(monkeypatch, storage, template, marker):
     """Integration-style test: run generate_site in mock mode and assert files are created
 
     This test uses the existing mock templates and checks that:
@@ -33,7 +33,7 @@ def test_generate_site_creates_files_and_contains_prompt(monkeypatch, template,
     prompt = f"Integration test prompt for {template}"
     site_name = generate_site(prompt, template=template)
 
-    site_dir = os.path.join("backend", "generated_sites", site_name)
+    site_dir = os.path.join(storage.root, site_name)
     try:
         assert os.path.isdir(site_dir), f"site dir not found: {site_dir}"
 
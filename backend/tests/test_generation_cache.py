@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+import time
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.benchmarks.fake_ollama import FakeOllamaServer
+from backend.generation_cache import GenerationCache, cache_key
+from backend.llm_backends import OllamaHTTPBackend, set_backend
+from backend.site_generator import generate_site, generate_site_stream
+
+
+def test_cache_key_normalizes_prompt_and_separates_inputs():
+    base = cache_key("Kahve  dükkanı\n sitesi", "modern", "", "m")
+    assert base == cache_key("  Kahve dükkanı sitesi ", "modern", "", "m")
+    assert base != cache_key("Kahve dükkanı sitesi", "classic", "", "m")
+    assert base != cache_key("Kahve dükkanı sitesi", "modern", "Tema: Minimalist.", "m")
+    assert base != cache_key("Kahve dükkanı sitesi", "modern", "", "other-model")
+
+
+def test_memory_tier_is_lru_bounded_and_disk_tier_survives(tmp_path):
+    cache = GenerationCache(max_entries=2, disk_dir=str(tmp_path))
+    for key in ("a", "b", "c"):
+        cache.put(key, (key, "css", "js"))
+    assert list(cache._memory) == ["b", "c"]
+
+    # a fresh cache over the same directory serves entries from disk
+    reloaded = GenerationCache(max_entries=2, disk_dir=str(tmp_path))
+    assert reloaded.get("a") == ("a", "css", "js")
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = GenerationCache(max_entries=1, disk_dir=str(tmp_path), max_disk_bytes=60)
+    cache.put("a", ("x" * 10, "", ""))
+    cache.put("b", ("y" * 10, "", ""))
+    cache.put("c", ("z" * 10, "", ""))
+    remaining = sorted(name[:-5] for name in os.listdir(tmp_path))
+    assert remaining == ["b", "c"]
+    assert cache._disk_bytes <= 60
+
+
+@pytest.fixture
+def slow_backend():
+    with FakeOllamaServer(latency=0.2) as server:
+        backend = OllamaHTTPBackend(host=server.url, model="fake-model")
+        previous = set_backend(backend)
+        yield server
+        set_backend(previous)
+        backend.close()
+
+
+def test_identical_requests_share_generation(monkeypatch, slow_backend, storage):
+    monkeypatch.delenv("AI_SITE_GENERATOR_MOCK", raising=False)
+    sites = []
+
+    def worker():
+        sites.append(generate_site("Aynı istek", template="classic", guidance="Tema: Kurumsal."))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(slow_backend.requests) == 3, "concurrent identical requests should coalesce"
+
+    sites.append(generate_site("Aynı   istek ", template="classic", guidance="Tema: Kurumsal."))
+    assert len(slow_backend.requests) == 3, "repeat request should be served from cache"
+
+
+def test_identical_streams_share_generation(monkeypatch, slow_backend, storage):
+    monkeypatch.delenv("AI_SITE_GENERATOR_MOCK", raising=False)
+    results = []
+
+    def worker():
+        events = list(generate_site_stream("Aynı akış", template="modern"))
+        results.append(events)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(slow_backend.requests) == 3, "concurrent identical streams should coalesce"
+    assert len(results) == 3
+    for events in results:
+        assert events[-1]["event"] == "done"
+        # waiters replay the owner's output as events
+        assert {e["artifact"] for e in events if e["event"] == "token"} == {"html", "css", "js"}
+
+
+def test_abandoned_stream_hands_generation_to_waiter(monkeypatch, slow_backend, storage):
+    monkeypatch.delenv("AI_SITE_GENERATOR_MOCK", raising=False)
+    owner = generate_site_stream("Bırakılan akış", template="modern")
+    assert next(owner)["stage"] == "start"
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(list(generate_site_stream("Bırakılan akış",
+                                                                                          template="modern"))))
+    waiter.start()
+    time.sleep(0.1)  # let the waiter block on the owner's in-flight generation
+    owner.close()
+    waiter.join(timeout=10)
+    assert results and results[0][-1]["event"] == "done"
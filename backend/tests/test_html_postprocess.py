@@ -0,0 +1,101 @@
+import os
+import sys
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.fix_generated_html import find_generated_index_files, fix_file, sweep
+from backend.html_postprocess import postprocess_html, tokenize
+from backend.site_generator import _ensure_meta_in_head, _get_mock_templates
+from backend.site_server import get_site_cache
+
+
+def test_tokenizer_round_trips_and_keeps_script_bodies_raw():
+    html = '<!DOCTYPE html><html><!-- c --><body><script>if (a<b) { x = "</p>"; }</script>x < y</body></html>'
+    tokens = list(tokenize(html))
+    assert "".join(t.text for t in tokens) == html
+    assert [t.kind for t in tokens if t.kind == "raw"] == ["raw"]
+
+
+@pytest.mark.parametrize(
+    "html, expected",
+    [
+        (
+            '<html><head><title>t</title></head><body><meta charset="utf-8"></body></html>',
+            '<html><head>\n<meta charset="utf-8"><title>t</title></head><body></body></html>',
+        ),
+        (
+            '<html><header>h</header><meta name="viewport" content="w"></html>',
+            '<html>\n<head>\n<meta name="viewport" content="w">\n</head><header>h</header></html>',
+        ),
+        ('<p>metasız</p>', '<p>metasız</p>'),
+    ],
+)
+def test_meta_fixer_moves_metas_into_head(html, expected):
+    assert _ensure_meta_in_head(html) == expected
+
+
+def test_full_chain_strips_fences_and_links_assets():
+    raw = "```html\n<html><head><title>t</title></head><body><h1>x</h1></body></html>\n```"
+    fixed = postprocess_html(raw)
+    assert "```" not in fixed
+    assert fixed.index('<link rel="stylesheet" href="style.css">') < fixed.index("</head>")
+    assert fixed.index('<script src="index.js"></script>') < fixed.index("</body>")
+    assert postprocess_html(fixed) == fixed, "post-processing should be idempotent"
+
+
+@pytest.mark.parametrize("css, js", [
+    ("./style.css", "./index.js"),
+    ("/style.css", "/index.js"),
+    ("style.css?v=1", "index.js#main"),
+])
+def test_existing_asset_links_are_recognized(css, js):
+    html = (f'<html><head><link rel="stylesheet" href="{css}"></head>'
+            f'<body><script src="{js}"></script></body></html>')
+    fixed = postprocess_html(html)
+    assert fixed.count("<link") == 1 and fixed.count("<script") == 1
+
+
+def test_metas_already_at_the_top_of_head_stay_put():
+    mock = _get_mock_templates("Kafe", "modern")[0]
+    assert postprocess_html(mock) == mock
+    html = '<html><head>\n<meta charset="utf-8">\n<title>t</title><meta charset="utf-8"></head></html>'
+    fixed = postprocess_html(html)
+    assert fixed.count("<meta") == 1 and fixed.startswith('<html><head>\n<meta charset="utf-8">\n<title>')
+    assert postprocess_html(fixed) == fixed
+
+
+def test_sweep_fixes_in_parallel_and_skips_unchanged_sites(tmp_path):
+    sites = tmp_path / "backend" / "generated_sites"
+    for i in range(4):
+        site = sites / f"site_{i}"
+        site.mkdir(parents=True)
+        (site / "index.html").write_text(
+            '<html><head><link rel="stylesheet" href="style.css"></head>'
+            '<body><meta charset="utf-8"><script src="index.js"></script></body></html>',
+            encoding="utf-8",
+        )
+    # hidden folders under generated_sites are never swept
+    (sites / ".hidden").mkdir()
+    (sites / ".hidden" / "index.html").write_text("<p>not a site</p>", encoding="utf-8")
+    manifest = str(tmp_path / "manifest.json")
+
+    assert len(find_generated_index_files(str(tmp_path))) == 4
+    first = sweep(str(tmp_path), manifest, workers=2)
+    assert first["fixed"] == 4
+    assert '<head>\n<meta charset="utf-8">' in (sites / "site_0" / "index.html").read_text(encoding="utf-8")
+
+    second = sweep(str(tmp_path), manifest, workers=2)
+    assert second == {"fixed": 0, "ok": 0, "skipped": 4, "error": 0}
+
+
+def test_fix_worker_precompresses_without_warming_its_cache(tmp_path):
+    page = tmp_path / "index.html"
+    page.write_text("<html><head><title>t</title></head><body>" + "<p>içerik</p>" * 40 + "</body></html>",
+                    encoding="utf-8")
+    get_site_cache().clear()
+    path, status, _ = fix_file((str(page), None))
+    assert status == "fixed" and (tmp_path / "index.html.gz").exists()
+    assert get_site_cache().size == 0
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.testclient import TestClient  # type: ignore[reportMissingImports]
+
+from backend.app import app
+from backend.jobs import JobCancelled, JobScheduler, QueueFullError, set_scheduler
+
+
+def _record(job, order, name, delay=0.0):
+    if delay:
+        time.sleep(delay)
+    job.emit({"event": "stage", "stage": name})
+    order.append(name)
+    return name
+
+
+def test_single_slot_serves_clients_round_robin_by_priority():
+    order = []
+
+    async def scenario():
+        scheduler = JobScheduler(slots=1, max_queue=10, max_queue_per_client=10)
+        jobs = [
+            scheduler.submit(_record, order, "a1", client="a"),
+            scheduler.submit(_record, order, "a2", client="a"),
+            scheduler.submit(_record, order, "a3", client="a"),
+            scheduler.submit(_record, order, "b1", client="b"),
+            scheduler.submit(_record, order, "c-urgent", client="c", priority=5),
+        ]
+        for job in jobs:
+            await job._future
+        await scheduler.shutdown()
+        return jobs
+
+    jobs = asyncio.run(scenario())
+    assert order == ["c-urgent", "a1", "b1", "a2", "a3"]
+    assert all(job.status == "done" and job.queue_wait is not None for job in jobs)
+
+
+def test_slots_bound_concurrency():
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work(job):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    async def scenario():
+        scheduler = JobScheduler(slots=2, max_queue=10, max_queue_per_client=10)
+        jobs = [scheduler.submit(work, client=str(i)) for i in range(6)]
+        await asyncio.gather(*(job._future for job in jobs))
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+    assert peak[0] == 2
+
+
+def test_queue_limits_raise_queue_full():
+    async def scenario():
+        scheduler = JobScheduler(slots=1, max_queue=3, max_queue_per_client=2)
+        scheduler.submit(_record, [], "a1", client="a")
+        scheduler.submit(_record, [], "a2", client="a")
+        with pytest.raises(QueueFullError):
+            scheduler.submit(_record, [], "a3", client="a")
+        scheduler.submit(_record, [], "b1", client="b")
+        with pytest.raises(QueueFullError):
+            scheduler.submit(_record, [], "c1", client="c")
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_jobs_free_their_queue_slots():
+    async def scenario():
+        scheduler = JobScheduler(slots=1, max_queue=3, max_queue_per_client=2, abandon_after=0.05)
+        scheduler.submit(_record, [], "blocker", 0.2, client="x")
+        first = scheduler.submit(_record, [], "a1", client="a", detached=True)
+        stale = scheduler.submit(_record, [], "a2", client="a", detached=True)
+        await asyncio.sleep(0.1)
+        # both limits are reached, but the abandoned jobs no longer count
+        scheduler.submit(_record, [], "a3", client="a")
+        scheduler.submit(_record, [], "a4", client="a")
+        assert first.status == stale.status == "cancelled" and scheduler.queue_depth == 2
+        for job in (first, stale):
+            with pytest.raises(JobCancelled):
+                await job.future
+        await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_queued_jobs_of_a_previous_event_loop_are_finished():
+    scheduler = JobScheduler(slots=1, max_queue=10, max_queue_per_client=10)
+
+    async def first_loop():
+        scheduler.submit(_record, [], "slow", 0.2)
+        return scheduler.submit(_record, [], "stranded")
+
+    stranded = asyncio.run(first_loop())
+
+    async def second_loop():
+        scheduler.submit(_record, [], "next")
+        await scheduler.shutdown()
+
+    asyncio.run(second_loop())
+    assert stranded.status == "cancelled" and stranded.finished_at is not None
+
+
+def test_cancelled_and_abandoned_jobs_do_not_run():
+    order = []
+
+    async def scenario():
+        scheduler = JobScheduler(slots=1, max_queue=10, max_queue_per_client=10, abandon_after=0.05)
+        first = scheduler.submit(_record, order, "first", 0.1)
+        cancelled = scheduler.submit(_record, order, "cancelled")
+        abandoned = scheduler.submit(_record, order, "abandoned", detached=True)
+        polled = scheduler.submit(_record, order, "polled", detached=True)
+        assert scheduler.cancel(cancelled.id)
+        assert scheduler.queue_depth == 3
+        while polled.finished_at is None:
+            scheduler.get(polled.id)
+            await asyncio.sleep(0.01)
+        assert await first._future == "first"
+        with pytest.raises(JobCancelled):
+            await cancelled._future
+        await scheduler.shutdown()
+        return cancelled, abandoned, polled
+
+    cancelled, abandoned, polled = asyncio.run(scenario())
+    assert order == ["first", "polled"]
+    assert cancelled.status == abandoned.status == "cancelled"
+    assert polled.status == "done"
+
+
+def test_job_endpoints_submit_poll_and_cancel(monkeypatch, storage):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    previous = set_scheduler(JobScheduler(slots=1, max_queue=4, max_queue_per_client=4))
+    try:
+        with TestClient(app) as client:
+            res = client.post("/jobs", data={"prompt": "Kuyruk testi", "template_type": "kurumsal"})
+            assert res.status_code == 202
+            job_id = res.json()["job_id"]
+
+            for _ in range(200):
+                status = client.get(f"/jobs/{job_id}").json()
+                if status["status"] not in ("queued", "running"):
+                    break
+                time.sleep(0.01)
+            assert status["status"] == "done", status
+            site_name = status["result"]
+            assert status["url"].endswith(f"/sites/{site_name}/index.html")
+
+            assert client.delete(f"/jobs/{job_id}").status_code == 409
+            assert client.get("/jobs/does-not-exist").status_code == 404
+    finally:
+        set_scheduler(previous)
@@ -0,0 +1,74 @@
+import os
+import sys
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend import llm_backends
+from backend.benchmarks.fake_ollama import FakeOllamaServer
+from backend.llm_backends import OllamaHTTPBackend, set_backend
+from backend.site_generator import generate_site
+
+
+@pytest.fixture
+def fake_server():
+    with FakeOllamaServer() as server:
+        yield server
+
+
+@pytest.fixture
+def http_backend(fake_server):
+    backend = OllamaHTTPBackend(host=fake_server.url, model="fake-model", keep_alive="5m")
+    previous = set_backend(backend)
+    yield backend
+    set_backend(previous)
+    backend.close()
+
+
+def test_http_backend_reuses_pooled_connection_and_pins_model(fake_server, http_backend):
+    for _ in range(3):
+        assert http_backend.generate("merhaba").strip() == "body { color: #333; }"
+
+    assert fake_server.connections == 1, "keep-alive connection should be reused"
+    assert all(r["keep_alive"] == "5m" and r["model"] == "fake-model" for r in fake_server.requests)
+
+
+def test_availability_probe_is_cached(fake_server, http_backend, monkeypatch):
+    calls = []
+    real_probe = http_backend._probe
+    monkeypatch.setattr(http_backend, "_probe", lambda: calls.append(1) or real_probe())
+
+    assert http_backend.is_available()
+    assert http_backend.is_available()
+    assert len(calls) == 1
+
+    http_backend.invalidate_probe()
+    assert http_backend.is_available()
+    assert len(calls) == 2
+
+
+def test_unreachable_server_is_unavailable():
+    backend = OllamaHTTPBackend(host="http://127.0.0.1:9", probe_ttl=60)
+    assert backend.is_available() is False
+
+
+def test_generate_site_uses_installed_backend(monkeypatch, fake_server, http_backend, storage):
+    monkeypatch.delenv("AI_SITE_GENERATOR_MOCK", raising=False)
+
+    site_name = generate_site("Fake backend testi", template="modern")
+    html = open(os.path.join(storage.root, site_name, "index.html"), encoding="utf-8").read()
+    assert "fake" in html
+    assert len(fake_server.requests) == 3
+    # html runs first, then css and js concurrently on at most two pooled connections
+    assert fake_server.connections <= 2
+
+
+def test_backend_is_selected_from_environment(monkeypatch):
+    monkeypatch.setenv("AI_SITE_GENERATOR_LLM_BACKEND", "cli")
+    previous = set_backend(None)
+    try:
+        assert llm_backends.get_backend().name == "cli"
+    finally:
+        set_backend(previous)
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi import FastAPI  # type: ignore[reportMissingImports]
+from fastapi.testclient import TestClient  # type: ignore[reportMissingImports]
+
+from backend import metrics
+from backend.app import app
+from backend.jobs import get_scheduler
+
+
+def test_histogram_exposition_is_cumulative():
+    h = metrics.Histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1.0))
+    h.observe(0.05, stage="a")
+    h.observe(0.5, stage="a")
+    h.observe(5, stage="a")
+    text = h.render()
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="a"} 3' in text
+    assert 'demo_seconds_sum{stage="a"} 5.55' in text
+
+
+def test_label_values_are_escaped():
+    c = metrics.Counter("demo_total", "Demo.", ("model",))
+    c.inc(model='a"b\\c\n')
+    assert 'demo_total{model="a\\"b\\\\c\\n"} 1' in c.render()
+
+
+def test_timing_log_collects_spans_from_worker_threads(tmp_path):
+    log = tmp_path / "timing.jsonl"
+    demo = FastAPI()
+    demo.add_middleware(metrics.MetricsMiddleware, timing_log=str(log))
+
+    def work(job):
+        with metrics.span("demo_stage"):
+            return "ok"
+
+    @demo.get("/work")
+    async def run_work():
+        return {"result": await get_scheduler().run(work)}
+
+    assert TestClient(demo).get("/work").json() == {"result": "ok"}
+    # the line is written by the log's background thread
+    deadline = time.monotonic() + 5
+    while not (log.exists() and log.read_text(encoding="utf-8")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    entry = json.loads(log.read_text(encoding="utf-8").splitlines()[-1])
+    assert entry["route"] == "/work" and entry["status"] == 200
+    assert [s["name"] for s in entry["spans"]] == ["demo_stage"]
+    assert entry["seconds"] >= entry["spans"][0]["seconds"]
+
+
+def test_timing_log_writes_in_order_from_a_background_thread(tmp_path, monkeypatch):
+    path = tmp_path / "timing.jsonl"
+    timing_log = metrics.TimingLog(str(path))
+    opened = []
+    real_open = open
+    def counting_open(file, *args, **kwargs):
+        if str(file) == str(path):
+            opened.append(threading.current_thread().name)
+        return real_open(file, *args, **kwargs)
+    monkeypatch.setattr("builtins.open", counting_open)
+
+    for i in range(50):
+        timing_log.write({"i": i})
+    timing_log.flush()
+    assert [json.loads(line)["i"] for line in path.read_text(encoding="utf-8").splitlines()] == list(range(50))
+    timing_log.close()
+    assert opened == ["timing-log"]
+
+
+def test_generation_records_stages_tokens_and_requests(fake_backend, storage):
+    stage_before = {s: metrics.STAGE_SECONDS.count(stage=s) for s in ("probe", "html", "css", "js", "write")}
+    tokens_before = metrics.LLM_TOKENS.value(backend="http", model="fake-model")
+
+    client = TestClient(app)
+    res = client.post("/generate", data={"prompt": "Metrik testi"})
+    assert res.status_code == 200
+    for stage, before in stage_before.items():
+        assert metrics.STAGE_SECONDS.count(stage=stage) > before, stage
+    assert metrics.LLM_TOKENS.value(backend="http", model="fake-model") > tokens_before
+    assert metrics.LLM_TOKENS_PER_SECOND.count(backend="http", model="fake-model") >= 3
+
+    text = client.get("/metrics").text
+    assert 'ai_site_generator_http_request_seconds_count{method="POST",route="/generate",status="200"}' in text
+    assert 'ai_site_generator_generations_total{source="model",result="ok"}' in text
+    assert "ai_site_generator_job_queue_wait_seconds_count" in text
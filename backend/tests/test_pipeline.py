@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+import time
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.benchmarks.fake_ollama import FakeOllamaServer
+from backend.generation_cache import GenerationCancelled
+from backend.llm_backends import OllamaHTTPBackend, set_backend
+from backend.pipeline import Stage, StageError, attempt_expired, run_pipeline
+from backend.site_generator import extract_selectors, generate_site
+
+
+def test_extract_selectors_in_document_order():
+    html = '<div class="hero dark" id="top"><a class=\'cta hero\'></a><p id="about"></p></div>'
+    assert extract_selectors(html) == (["hero", "dark", "cta"], ["top", "about"])
+
+
+def test_dependent_stages_run_after_and_siblings_concurrently():
+    started, lock = {}, threading.Lock()
+
+    def stage(name, delay):
+        def run(inputs, timeout):
+            with lock:
+                started[name] = time.monotonic()
+            time.sleep(delay)
+            return f"{name}<-{','.join(sorted(inputs))}"
+        return run
+
+    begin = time.monotonic()
+    results = run_pipeline([
+        Stage("html", stage("html", 0.1)),
+        Stage("css", stage("css", 0.1), depends_on=("html",)),
+        Stage("js", stage("js", 0.1), depends_on=("html",)),
+    ])
+    elapsed = time.monotonic() - begin
+
+    assert results == {"html": "html<-", "css": "css<-html", "js": "js<-html"}
+    assert started["css"] - started["html"] >= 0.1
+    assert abs(started["css"] - started["js"]) < 0.05
+    assert elapsed < 0.28, "css and js should overlap"
+
+
+def test_stage_retries_then_fails_with_stage_error():
+    attempts = []
+
+    def flaky(inputs, timeout):
+        attempts.append(timeout)
+        if len(attempts) < 2:
+            raise TimeoutError("model yavaş")
+        return "ok"
+
+    events = []
+    assert run_pipeline([Stage("html", flaky, timeout=5, retries=1)], on_event=events.append) == {"html": "ok"}
+    assert attempts == [5, 5]
+    assert [e["event"] for e in events] == ["stage", "retry", "stage"]
+
+    def broken(inputs, timeout):
+        raise ValueError("bozuk")
+
+    with pytest.raises(StageError) as exc:
+        run_pipeline([Stage("css", broken, retries=0)])
+    assert exc.value.stage == "css"
+
+
+def test_stage_deadline_is_wall_clock_and_abandons_the_attempt():
+    attempts, abandoned = [], threading.Event()
+
+    def trickling(inputs, timeout):
+        # keeps producing output, so a socket read timeout would never fire
+        attempts.append(time.monotonic())
+        if len(attempts) > 1:
+            return "ok"
+        while not attempt_expired():
+            time.sleep(0.01)
+        abandoned.set()
+        raise GenerationCancelled("bırakıldı")
+
+    events = []
+    begin = time.monotonic()
+    assert run_pipeline([Stage("css", trickling, timeout=0.2, retries=1)], on_event=events.append) == {"css": "ok"}
+    assert 0.2 <= attempts[1] - begin < 1.5
+    assert abandoned.wait(1)
+    assert [e["event"] for e in events] == ["stage", "retry", "stage"]
+    assert "0.2" in events[1]["error"]
+
+    def stuck(inputs, timeout):
+        time.sleep(0.5)
+        return "late"
+
+    begin = time.monotonic()
+    with pytest.raises(StageError) as exc:
+        run_pipeline([Stage("js", stuck, timeout=0.1, retries=0)])
+    assert isinstance(exc.value.error, TimeoutError)
+    assert time.monotonic() - begin < 0.4
+
+
+def test_cancellation_is_not_retried():
+    calls = []
+
+    def cancelled(inputs, timeout):
+        calls.append(1)
+        raise GenerationCancelled("iptal")
+
+    with pytest.raises(GenerationCancelled):
+        run_pipeline([Stage("html", cancelled, retries=3)])
+    assert calls == [1]
+
+
+def test_css_and_js_prompts_receive_html_selectors(monkeypatch, storage):
+    monkeypatch.delenv("AI_SITE_GENERATOR_MOCK", raising=False)
+    with FakeOllamaServer() as server:
+        backend = OllamaHTTPBackend(host=server.url, model="fake-model")
+        previous = set_backend(backend)
+        try:
+            generate_site("Seçici testi", template="modern")
+        finally:
+            set_backend(previous)
+            backend.close()
+
+    prompts = [r["prompt"] for r in server.requests]
+    assert ".hero" not in prompts[0]
+    assert all(".hero" in p for p in prompts[1:])
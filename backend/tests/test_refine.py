@@ -0,0 +1,101 @@
+import os
+import sys
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.testclient import TestClient  # type: ignore[reportMissingImports]
+
+from backend.app import app
+from backend.benchmarks.fake_ollama import FakeOllamaServer, default_responder
+from backend.llm_backends import OllamaHTTPBackend, set_backend
+from backend.site_generator import generate_site, refine_site
+
+
+def _read(folder, name):
+    with open(os.path.join(folder, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_refinement_is_a_new_version_sharing_unchanged_files(monkeypatch, storage, isolated_site_catalog):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    site = generate_site("Kafe", template="modern", template_type="minimalist")
+    base = os.path.join(storage.root, site)
+
+    assert refine_site(site, "html", "koyu renkler") == 2
+    v2 = os.path.join(base, "v2")
+    assert os.path.samefile(os.path.join(v2, "style.css"), os.path.join(base, "style.css"))
+    assert os.path.samefile(os.path.join(v2, "index.js.gz"), os.path.join(base, "index.js.gz"))
+    assert "koyu renkler" in _read(v2, "index.html") and "koyu renkler" not in _read(base, "index.html")
+    # the original version is untouched
+    assert storage.versions(site) == [1, 2]
+    assert os.listdir(os.path.join(storage.root, ".tmp")) == []
+
+    # refining an older version still gets the next number
+    assert refine_site(site, "js", version=1) == 3
+    assert os.path.samefile(os.path.join(base, "v3", "index.html"), os.path.join(base, "index.html"))
+
+    assert isolated_site_catalog.get(site)["latest_version"] == 3
+    versions = isolated_site_catalog.versions(site)
+    assert [(v["version"], v["base_version"], v["artifact"]) for v in versions] == [(2, 1, "html"), (3, 1, "js")]
+    assert versions[0]["instruction"] == "koyu renkler"
+    assert set(versions[0]["files"]) == {"index.html", "style.css", "index.js"}
+
+    # versions survive a rebuild from disk
+    isolated_site_catalog.rebuild(storage)
+    assert [v["version"] for v in isolated_site_catalog.versions(site)] == [2, 3]
+    assert isolated_site_catalog.get(site)["latest_version"] == 3
+
+
+def test_refinement_makes_one_model_call_with_the_other_artifacts_as_context(monkeypatch, storage):
+    def responder(prompt):
+        if "koyu" in prompt:
+            return ".hero { color: white; background: black; }"
+        return default_responder(prompt)
+
+    monkeypatch.delenv("AI_SITE_GENERATOR_MOCK", raising=False)
+    with FakeOllamaServer(responder) as server:
+        backend = OllamaHTTPBackend(host=server.url, model="fake-model")
+        previous = set_backend(backend)
+        try:
+            site = generate_site("Kafe", template="modern")
+            calls = len(server.requests)
+            version = refine_site(site, "css", "koyu tema")
+        finally:
+            set_backend(previous)
+            backend.close()
+
+    assert len(server.requests) == calls + 1
+    prompt = server.requests[-1]["prompt"]
+    assert ".hero" in prompt and "Mevcut style.css" in prompt and "koyu tema" in prompt
+    folder = os.path.join(storage.root, site, f"v{version}")
+    assert _read(folder, "style.css") == ".hero { color: white; background: black; }"
+    assert os.path.samefile(os.path.join(folder, "index.html"), os.path.join(storage.root, site, "index.html"))
+
+
+def test_unknown_site_or_version(storage):
+    with pytest.raises(LookupError):
+        refine_site("site_missing", "css")
+    with pytest.raises(LookupError):
+        refine_site("../x", "css")
+
+
+def test_refine_endpoint(monkeypatch, storage):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    site = generate_site("Hukuk bürosu", template="classic", template_type="kurumsal")
+    client = TestClient(app)
+
+    res = client.post(f"/api/sites/{site}/refine", data={"artifact": "html", "instruction": "iletişim formu ekle"})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["version"] == 2 and body["url"].endswith(f"/sites/{site}/v2/index.html")
+
+    entry = client.get(f"/api/sites/{site}").json()
+    assert entry["latest_version"] == 2
+    assert entry["versions"][0]["url"] == body["url"]
+
+    assert client.post(f"/api/sites/{site}/refine", data={"artifact": "png"}).status_code == 400
+    assert client.post(f"/api/sites/{site}/refine", data={"artifact": "css", "version": 9}).status_code == 404
+    assert client.post("/api/sites/site_missing/refine", data={"artifact": "css"}).status_code == 404
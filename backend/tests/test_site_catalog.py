@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import sys
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.testclient import TestClient  # type: ignore[reportMissingImports]
+
+from backend.app import app
+from backend.site_catalog import METADATA_FILE, SiteCatalog
+from backend.site_generator import generate_site, generate_site_stream
+
+
+def _records(prompts):
+    return [{"site_id": f"site_{i:03d}", "prompt": p, "template_type": "kurumsal" if i % 2 else "minimalist",
+             "created_at": 1_700_000_000 + i} for i, p in enumerate(prompts)]
+
+
+def test_listing_is_keyset_paginated_newest_first(isolated_site_catalog):
+    isolated_site_catalog.add_many(_records([f"Site {i}" for i in range(7)]))
+    seen, cursor = [], None
+    while True:
+        entries, cursor = isolated_site_catalog.list(limit=3, cursor=cursor)
+        seen += [e["site_id"] for e in entries]
+        if cursor is None:
+            break
+    assert seen == [f"site_{i:03d}" for i in reversed(range(7))]
+    entries, _ = isolated_site_catalog.list(template_type="kurumsal")
+    assert [e["site_id"] for e in entries] == ["site_005", "site_003", "site_001"]
+    with pytest.raises(ValueError):
+        isolated_site_catalog.list(cursor="abc")
+
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_prefix_and_word_search(isolated_site_catalog, fts):
+    isolated_site_catalog.add_many(_records(["Diyetisyen sitesi", "Kafe & Pastane", "İstanbul çiçekçi",
+                                             "diyet blogu", "%100 organik"]))
+    isolated_site_catalog._connect()
+    isolated_site_catalog.fts = isolated_site_catalog.fts and fts
+
+    def ids(**kwargs):
+        return [e["site_id"] for e in isolated_site_catalog.search(**kwargs)[0]]
+
+    assert ids(prefix="DİYET") == ["site_003", "site_000"]
+    assert ids(prefix="istanbul ç") == ["site_002"]
+    assert ids(query="pastane kafe") == ["site_001"]
+    assert ids(query="%100") == ["site_004"]
+    assert ids(query="diyet", prefix="diyet b") == ["site_003"]
+    if isolated_site_catalog.fts:
+        # FTS matches word prefixes and ignores diacritics
+        assert ids(query="diyet") == ["site_003", "site_000"]
+        assert ids(query="cicekci") == ["site_002"]
+
+
+def test_catalog_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    a, b = SiteCatalog(path), SiteCatalog(path)
+    a.add_many(_records(["Kafe"]))
+    assert b.get("site_000")["prompt"] == "Kafe"
+    assert b.remove("site_000") and a.get("site_000") is None
+    assert a._connect().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    a.close()
+    b.close()
+
+
+def test_generation_adds_catalog_entry_and_metadata(monkeypatch, storage, isolated_site_catalog):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    site = generate_site("Kafe & Pastane", template="classic", template_type="kurumsal")
+    entry = isolated_site_catalog.get(site)
+    assert entry["prompt"] == "Kafe & Pastane" and entry["template"] == "classic"
+    assert entry["template_type"] == "kurumsal" and entry["source"] == "mock"
+    assert set(entry["files"]) == {"index.html", "style.css", "index.js"}
+    assert entry["bytes"] == sum(entry["files"].values())
+    assert "render" in entry["timings"] and "write" in entry["timings"]
+    with open(os.path.join(storage.root, site, METADATA_FILE), encoding="utf-8") as f:
+        assert json.load(f)["site_id"] == site
+
+    events = list(generate_site_stream("Çiçekçi", template="creative"))
+    assert isolated_site_catalog.get(events[-1]["site"])["files"]["index.html"] > 0
+
+
+def test_rebuild_indexes_sites_on_disk(monkeypatch, storage, isolated_site_catalog):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    site = generate_site("Diyetisyen", template="modern")
+    # a site from before the catalog: no metadata file, prompt taken from the title
+    legacy = os.path.join(storage.root, "site_20240101_120000")
+    os.makedirs(legacy)
+    with open(os.path.join(legacy, "index.html"), "w", encoding="utf-8") as f:
+        f.write("<html><head><title>Eski &amp; güzel</title></head></html>")
+    isolated_site_catalog.add_many(_records(["silinmiş"]))
+
+    assert isolated_site_catalog.rebuild(storage) == 2
+    assert isolated_site_catalog.get("site_000") is None
+    assert isolated_site_catalog.get(site)["prompt"] == "Diyetisyen"
+    old = isolated_site_catalog.get("site_20240101_120000")
+    assert old["prompt"] == "Eski & güzel" and old["files"] == {"index.html": os.path.getsize(
+        os.path.join(legacy, "index.html"))}
+    assert [e["site_id"] for e in isolated_site_catalog.list()[0]] == [site, "site_20240101_120000"]
+
+
+def test_retention_removes_catalog_entries(monkeypatch, storage, isolated_site_catalog):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    storage.on_evict(isolated_site_catalog.remove)
+    old, new = generate_site("Eski"), generate_site("Yeni")
+    os.utime(os.path.join(storage.root, old), (1, 1))
+    storage.max_sites = 1
+    assert storage.enforce_retention() == [old]
+    assert isolated_site_catalog.get(old) is None and isolated_site_catalog.get(new) is not None
+
+
+def test_site_endpoints(isolated_site_catalog):
+    isolated_site_catalog.add_many(_records(["Kafe", "Kuaför", "Pastane"]))
+    client = TestClient(app)
+
+    res = client.get("/api/sites", params={"limit": 2})
+    assert res.status_code == 200
+    body = res.json()
+    assert [i["site_id"] for i in body["items"]] == ["site_002", "site_001"]
+    assert body["items"][0]["url"].endswith("/sites/site_002/index.html")
+    rest = client.get("/api/sites", params={"limit": 2, "cursor": body["next_cursor"]}).json()
+    assert [i["site_id"] for i in rest["items"]] == ["site_000"] and rest["next_cursor"] is None
+
+    found = client.get("/api/sites/search", params={"prefix": "ku"}).json()
+    assert [i["site_id"] for i in found["items"]] == ["site_001"]
+    assert client.get("/api/sites/search").status_code == 400
+    assert client.get("/api/sites", params={"cursor": "x"}).status_code == 400
+
+    assert client.get("/api/sites/site_000").json()["prompt"] == "Kafe"
+    assert client.get("/api/sites/site_999").status_code == 404
+
+
+def test_catalog_is_queried_off_the_event_loop(monkeypatch, storage, isolated_site_catalog):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    site = generate_site("Kafe", template="modern", template_type="minimalist")
+    on_loop = []
+    real_connect = isolated_site_catalog._connect
+
+    def connect():
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return real_connect()
+
+    monkeypatch.setattr(isolated_site_catalog, "_connect", connect)
+    client = TestClient(app)
+    assert client.get("/api/sites").status_code == 200
+    assert client.get("/api/sites/search", params={"q": "kafe"}).status_code == 200
+    assert client.get(f"/api/sites/{site}").status_code == 200
+    assert client.post(f"/api/sites/{site}/refine", data={"artifact": "css"}).status_code == 200
+    assert on_loop and not any(on_loop)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.testclient import TestClient  # type: ignore[reportMissingImports]
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from backend.site_generator import generate_site
+from backend.site_server import CACHE_CONTROL, PrecompressedStaticFiles, get_site_cache, negotiate
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip;q=1.0, br;q=0", "gzip"),
+        ("identity", "identity"),
+        ("*", "br"),
+        ("", "identity"),
+    ],
+)
+def test_negotiate_prefers_available_accepted_coding(header, expected):
+    assert negotiate(header, ["br", "gzip"]) == expected
+
+
+@pytest.fixture
+def mock_site(monkeypatch, storage):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    return generate_site("Sıkıştırma testi", template="classic")
+
+
+@pytest.fixture
+def client(storage):
+    """Serves the test storage root the way the app mounts the real one under /sites."""
+    return TestClient(Starlette(routes=[Mount("/sites", PrecompressedStaticFiles(directory=storage.root))]))
+
+
+def test_site_files_are_precompressed_and_negotiated(mock_site, storage, client):
+    site_dir = os.path.join(storage.root, mock_site)
+    assert os.path.isfile(os.path.join(site_dir, "style.css.gz"))
+    original = open(os.path.join(site_dir, "style.css"), "rb").read()
+
+    res = client.get(f"/sites/{mock_site}/style.css", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.headers["cache-control"] == CACHE_CONTROL
+    assert "Accept-Encoding" in res.headers["vary"]
+    assert res.headers["content-type"].startswith("text/css")
+    assert res.content == original  # httpx decodes the gzip body
+
+    plain = client.get(f"/sites/{mock_site}/style.css", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] != res.headers["etag"], "each representation has its own strong ETag"
+
+
+def test_conditional_requests_and_memory_cache(mock_site, storage, client, monkeypatch):
+    url = f"/sites/{mock_site}/index.html"
+    first = client.get(url, headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+    assert not etag.startswith("W/")
+
+    not_modified = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    # the generator warmed the cache, so serving never reads the file body again
+    real_open = open
+    def guarded_open(path, *args, **kwargs):
+        assert not str(path).startswith(os.path.realpath(storage.root)), f"disk read: {path}"
+        return real_open(path, *args, **kwargs)
+    monkeypatch.setattr("builtins.open", guarded_open)
+    assert client.get(url, headers={"Accept-Encoding": "gzip"}).headers["etag"] == etag
+    assert get_site_cache().size > 0
+
+
+def test_uncached_files_are_read_off_the_event_loop(mock_site, storage, client, monkeypatch):
+    get_site_cache().clear()
+    reads = []
+    real_open = open
+    def recording_open(path, *args, **kwargs):
+        if str(path).startswith(os.path.realpath(storage.root)):
+            try:
+                asyncio.get_running_loop()
+                reads.append("loop")
+            except RuntimeError:
+                reads.append("thread")
+        return real_open(path, *args, **kwargs)
+    monkeypatch.setattr("builtins.open", recording_open)
+
+    res = client.get(f"/sites/{mock_site}/index.html", headers={"Accept-Encoding": "br, gzip"})
+    assert res.status_code == 200 and "Sıkıştırma testi" in res.text
+    assert reads and set(reads) == {"thread"}
@@ -0,0 +1,218 @@
+import errno
+import os
+import shutil
+import sys
+import time
+import pytest  # type: ignore[reportMissingImports]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.testclient import TestClient  # type: ignore[reportMissingImports]
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from backend.fix_generated_html import find_generated_index_files
+from backend.site_generator import generate_site
+from backend.site_server import PrecompressedStaticFiles
+from backend.site_storage import SiteStorage, set_storage
+
+CSS = b"body { color: #333; }\n" * 40
+
+
+def _site(storage, html=b"<h1>x</h1>", css=CSS):
+    writer = storage.create()
+    writer.write("index.html", html)
+    writer.write("style.css", css)
+    writer.commit()
+    return writer.site_id
+
+
+def test_site_ids_are_unique_within_the_same_second(storage):
+    writers = [storage.create() for _ in range(50)]
+    assert len({w.site_id for w in writers}) == 50
+    for w in writers:
+        w.abort()
+
+
+def test_site_is_published_atomically(storage):
+    writer = storage.create()
+    writer.write("index.html", b"<h1>x</h1>")
+    assert not os.path.exists(writer.folder)
+    writer.commit()
+    assert open(os.path.join(writer.folder, "index.html"), "rb").read() == b"<h1>x</h1>"
+    assert not os.path.exists(writer.staging)
+
+
+def test_aborted_site_leaves_nothing_behind(storage):
+    writer = storage.create()
+    writer.write("index.html", b"<h1>x</h1>")
+    writer.abort()
+    assert not os.path.exists(writer.staging) and not os.path.exists(writer.folder)
+    assert [s for _, s in storage.sites()] == []
+
+
+def test_identical_artifacts_are_hard_linked(storage):
+    a, b = _site(storage, html=b"<h1>a</h1>"), _site(storage, html=b"<h1>b</h1>")
+    css_a = os.stat(os.path.join(storage.root, a, "style.css"))
+    css_b = os.stat(os.path.join(storage.root, b, "style.css"))
+    assert css_a.st_ino == css_b.st_ino
+    assert css_a.st_nlink == 3  # two sites + the blob store
+    assert os.path.samefile(os.path.join(storage.root, a, "style.css.gz"),
+                            os.path.join(storage.root, b, "style.css.gz"))
+
+
+def test_reused_blob_returns_its_variants(storage, tmp_path):
+    # the generator warms the serving cache with these, so a reused blob must not report none
+    first = storage.store(str(tmp_path / "a.css"), CSS)
+    again = storage.store(str(tmp_path / "b.css"), CSS)
+    assert "gzip" in first and again == first
+    assert open(tmp_path / "b.css.gz", "rb").read() == first["gzip"]
+
+
+def test_falls_back_to_copies_without_hard_links(storage, monkeypatch):
+    def no_links(src, dst):
+        raise OSError(errno.EXDEV, "cross-device link")
+
+    monkeypatch.setattr(os, "link", no_links)
+    site = _site(storage)
+    st = os.stat(os.path.join(storage.root, site, "style.css"))
+    assert st.st_nlink == 1
+    assert open(os.path.join(storage.root, site, "style.css"), "rb").read() == CSS
+
+
+def test_versions_get_the_next_free_number(storage):
+    site = _site(storage)
+    first, second = storage.create_version(site), storage.create_version(site)
+    for writer in (first, second):
+        writer.link("style.css", os.path.join(storage.root, site, "style.css"))
+        writer.write("index.html", b"<h1>v</h1>")
+    second.commit()
+    first.commit()
+    assert (second.version, first.version) == (2, 3)
+    assert storage.versions(site) == [1, 2, 3]
+    assert os.path.samefile(os.path.join(first.folder, "style.css.gz"), os.path.join(storage.root, site, "style.css.gz"))
+    with pytest.raises(LookupError):
+        storage.create_version("site_missing")
+
+
+def test_retention_by_count_evicts_oldest_and_collects_blobs(storage):
+    evicted_ids = []
+    storage.on_evict(evicted_ids.append)
+    sites = []
+    for i in range(4):
+        sites.append(_site(storage, html=f"<h1>{i}</h1>".encode(), css=CSS + str(i).encode()))
+        # make creation order unambiguous for mtime ordering
+        past = time.time() - 100 + i
+        os.utime(os.path.join(storage.root, sites[-1]), (past, past))
+
+    storage.max_sites = 2
+    assert storage.enforce_retention() == sites[:2]
+    assert evicted_ids == sites[:2]
+    assert [s for _, s in storage.sites()] == sites[2:]
+    blobs = [f for _, _, files in os.walk(storage.blob_root) for f in files]
+    # html, css and css.gz of the two remaining sites
+    assert len(blobs) == 6
+
+
+def test_stale_staging_is_removed_without_retention_limits(tmp_path):
+    root = tmp_path / "sites"
+    crashed = root / ".tmp" / "site_crashed"
+    crashed.mkdir(parents=True)
+    os.utime(crashed, (1, 1))
+    SiteStorage(root=str(root), interval=0)
+    assert not crashed.exists()
+
+    storage = SiteStorage(root=str(root), interval=0)
+    crashed.mkdir()
+    os.utime(crashed, (1, 1))
+    live = storage.create()
+    _site(storage)
+    deadline = time.monotonic() + 5
+    while crashed.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not crashed.exists() and os.path.isdir(live.staging)
+    live.abort()
+
+
+def test_retention_by_age_and_bytes(storage):
+    old, new = _site(storage, html=b"<h1>old</h1>"), _site(storage, html=b"<h1>new</h1>")
+    past = time.time() - 3 * 86400
+    os.utime(os.path.join(storage.root, old), (past, past))
+    storage.max_age = 86400
+    assert storage.enforce_retention() == [old]
+
+    storage.max_age = 0
+    storage.max_bytes = 1
+    assert storage.enforce_retention() == [new]
+    assert storage.total_bytes() == 0
+
+
+def test_size_limit_ignores_files_retention_cannot_free(storage):
+    sites = [_site(storage, html=f"<h1>{i}</h1>".encode()) for i in range(3)]
+    used = storage.total_bytes()
+    # e.g. the site catalog and a crashed writer's staging dir
+    with open(os.path.join(storage.root, ".catalog.sqlite3"), "wb") as f:
+        f.write(b"\0" * 2 * 1024 * 1024)
+    os.makedirs(os.path.join(storage.root, ".tmp", "site_crashed"))
+    with open(os.path.join(storage.root, ".tmp", "site_crashed", "index.html"), "wb") as f:
+        f.write(b"\0" * 1024 * 1024)
+
+    assert storage.total_bytes() == used
+    storage.max_bytes = used + 1024
+    assert storage.enforce_retention() == []
+    assert {s for _, s in storage.sites()} == set(sites)
+
+
+@pytest.mark.parametrize("dedup", [True, False])
+def test_retention_counts_files_shared_with_versions_as_freed(tmp_path, dedup):
+    storage = SiteStorage(root=str(tmp_path / "sites"), dedup=dedup, interval=0)
+    site = _site(storage)
+    version = storage.create_version(site)
+    version.link("style.css", os.path.join(storage.root, site, "style.css"))
+    version.write("index.html", b"<h1>v2</h1>")
+    version.commit()
+    _site(storage, html=b"<h1>other</h1>", css=b"p {}")
+
+    before = storage.total_bytes()
+    freed = storage._unique_bytes(os.path.join(storage.root, site))
+    shutil.rmtree(os.path.join(storage.root, site))
+    storage.collect_blobs()
+    assert freed == before - storage.total_bytes()
+
+
+def test_generate_site_writes_through_storage(monkeypatch, tmp_path):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    storage = SiteStorage(root=str(tmp_path / "sites"))
+    previous = set_storage(storage)
+    try:
+        a = generate_site("Aynı içerik", template="creative")
+        b = generate_site("Aynı içerik", template="creative")
+    finally:
+        set_storage(previous)
+    assert a != b
+    assert os.path.samefile(os.path.join(storage.root, a, "index.js"), os.path.join(storage.root, b, "index.js"))
+    assert os.listdir(os.path.join(storage.root, ".tmp")) == []
+
+
+def test_storage_internals_are_not_served(storage):
+    site = _site(storage)
+    staged = storage.create()
+    staged.write("index.html", b"<h1>x</h1>")
+    client = TestClient(Starlette(routes=[Mount("/sites", PrecompressedStaticFiles(directory=storage.root))]))
+    assert client.get(f"/sites/{site}/index.html").status_code == 200
+    assert client.get("/sites/.blobs/").status_code == 404
+    assert client.get(f"/sites/.tmp/{staged.site_id}/index.html").status_code == 404
+    staged.abort()
+
+
+def test_fix_sweep_skips_storage_internals(tmp_path):
+    storage = SiteStorage(root=str(tmp_path / "backend" / "generated_sites"), interval=0)
+    site = _site(storage)
+    staged = storage.create()
+    staged.write("index.html", b"<h1>x</h1>")
+    os.makedirs(os.path.join(storage.blob_root, "xx"), exist_ok=True)
+    open(os.path.join(storage.blob_root, "xx", "index.html"), "wb").close()
+    assert find_generated_index_files(str(tmp_path)) == [os.path.join(storage.root, site, "index.html")]
+    staged.abort()
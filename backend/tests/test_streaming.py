@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.testclient import TestClient  # type: ignore[reportMissingImports]
+
+from backend.app import app
+from backend.benchmarks.fake_ollama import default_responder
+from backend.llm_backends import LLMBackend, set_backend
+from backend.site_generator import generate_site_stream
+
+
+def test_stream_yields_tokens_per_artifact_and_writes_files_progressively(fake_backend, storage):
+    site_name = None
+    events = []
+    for event in generate_site_stream("Akış testi", template="modern"):
+        events.append(event)
+        if event["event"] == "stage" and event["stage"] == "start":
+            site_name = event["site"]
+        if event["event"] == "token" and event["artifact"] != "html":
+            # html is already on disk while css/js tokens are still arriving,
+            # staged until the whole site is published
+            html_path = os.path.join(storage.root, ".tmp", site_name, "index.html")
+            assert "fake" in open(html_path, encoding="utf-8").read()
+            assert not os.path.exists(os.path.join(storage.root, site_name))
+    tokens = [e for e in events if e["event"] == "token"]
+    assert {e["artifact"] for e in tokens} == {"html", "css", "js"}
+    assert events[-1] == {"event": "done", "site": site_name}
+    assert all(r["stream"] for r in fake_backend.requests)
+    assert fake_backend.connections <= 2, "streamed responses should return connections to the pool"
+
+
+def test_sse_endpoint_reports_url(monkeypatch, storage):
+    monkeypatch.setenv("AI_SITE_GENERATOR_MOCK", "true")
+    client = TestClient(app)
+    res = client.post("/api/generate/stream", data={"prompt": "SSE testi", "template_type": "kurumsal"})
+    assert res.headers["content-type"].startswith("text/event-stream")
+
+    events = [json.loads(line[len("data: "):]) for line in res.text.splitlines() if line.startswith("data: ")]
+    done = events[-1]
+    assert [e["stage"] for e in events if e["event"] == "stage"] == ["start", "html", "css", "js"]
+    assert done["event"] == "done" and done["template_type"] == "kurumsal"
+    assert done["url"].endswith(f"/sites/{done['site']}/index.html")
+    assert os.path.isdir(os.path.join(storage.root, done["site"]))
+
+
+def test_stream_endpoint_rejects_empty_prompt():
+    client = TestClient(app)
+    assert client.post("/generate/stream", data={"prompt": "  "}).status_code == 400
+
+
+class _LateFinishingBackend(LLMBackend):
+    """Streams the default responses; the first html stream lingers after its last token."""
+
+    name = "late"
+
+    def __init__(self, linger: float):
+        super().__init__(model="late-model")
+        self.linger = linger
+
+    def _probe(self):
+        return True
+
+    def generate(self, prompt, timeout=None):
+        return default_responder(prompt)
+
+    def stream(self, prompt, timeout=None):
+        text = default_responder(prompt)
+        yield text[:20]
+        yield text[20:]
+        if "HTML oluştur" in prompt and self.linger:
+            linger, self.linger = self.linger, 0
+            time.sleep(linger)
+
+
+def test_attempt_expiring_after_its_last_token_leaves_shared_files_alone(monkeypatch, storage):
+    monkeypatch.delenv("AI_SITE_GENERATOR_MOCK", raising=False)
+    monkeypatch.setenv("AI_SITE_GENERATOR_STAGE_TIMEOUT", "0.3")
+    backend = _LateFinishingBackend(linger=0)
+    previous = set_backend(backend)
+    try:
+        first = list(generate_site_stream("Paylaşılan blob", template="modern"))[-1]["site"]
+        shared = os.path.join(storage.root, first, "index.html")
+        before = open(shared, "rb").read()
+
+        backend.linger = 0.6
+        events = list(generate_site_stream("Geç biten akış", template="modern"))
+    finally:
+        set_backend(previous)
+
+    html_events = [e["event"] for e in events if e.get("artifact") == "html" or e.get("stage") == "html"]
+    assert html_events.count("artifact") == 1
+    assert html_events.index("retry") < html_events.index("artifact")
+    second = os.path.join(storage.root, events[-1]["site"], "index.html")
+    assert open(shared, "rb").read() == before
+    assert open(second, "rb").read() == before and os.path.samefile(shared, second)
+    # the abandoned attempt's partial file was removed with its attempt
+    time.sleep(0.4)
+    assert not [f for _, _, files in os.walk(storage.root) for f in files if f.endswith(".partial")]
@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend import premium_templates
+from backend.site_generator import _get_mock_templates
+from backend.template_registry import CompiledTemplate, TemplateRegistry, escape_js, get_registry, set_registry
+
+
+def _write_template(root, name, html, css="body {}", js="console.log('{PROMPT}');", meta=None):
+    folder = root / name
+    folder.mkdir()
+    (folder / "index.html").write_text(html + "\n", encoding="utf-8")
+    (folder / "style.css").write_text(css + "\n", encoding="utf-8")
+    (folder / "index.js").write_text(js + "\n", encoding="utf-8")
+    (folder / "template.json").write_text(json.dumps(meta or {}), encoding="utf-8")
+
+
+def test_compiled_template_splits_slots_once():
+    t = CompiledTemplate("<h1>{PROMPT}</h1><p>{PROMPT} {OTHER}</p>")
+    assert t.slots == ("PROMPT", "PROMPT", "OTHER")
+    assert t.render({"PROMPT": "a", "OTHER": "b"}) == "<h1>a</h1><p>a b</p>"
+
+
+def test_css_blocks_and_js_template_literals_are_not_slots():
+    t = CompiledTemplate("body { color: red; } `${x}` {PROMPT}", escape=escape_js)
+    assert t.slots == ("PROMPT",)
+
+
+def test_mock_templates_escape_prompt_per_language():
+    html, css, js = _get_mock_templates("<script>alert('x')</script>", "modern")
+    assert "<script>alert" not in html
+    assert "&lt;script&gt;alert(&#x27;x&#x27;)&lt;/script&gt;" in html
+    assert "\\x3Cscript>alert(\\'x\\')\\x3C/script>" in js
+    assert "modern-header" in html
+
+
+def test_multiline_prompt_keeps_js_string_valid():
+    _, _, js = _get_mock_templates("Tema: Minimalist\nKullanıcı isteği: kafe", "modern")
+    assert "Minimalist\\nKullanıcı" in js
+
+
+def test_templates_are_added_from_disk_and_compiled_lazily(tmp_path):
+    _write_template(tmp_path, "modern", "<h1>{PROMPT}</h1>", meta={"guidance": "sade"})
+    registry = TemplateRegistry(str(tmp_path))
+    previous = set_registry(registry)
+    try:
+        assert registry.names() == ["modern"]
+        assert registry.get("modern")._compiled is None
+
+        _write_template(tmp_path, "retro", "<h2 class=\"retro\">{PROMPT}</h2>", meta={
+            "order": 1,
+            "guidance": "eski usul",
+            "premium": {"nostalji": {"name": "Nostalji", "description": "Retro görünüm."}},
+        })
+        registry.reload()
+        assert registry.names() == ["retro", "modern"]
+
+        html, _, js = _get_mock_templates("Plak dükkanı", "retro")
+        assert html == '<h2 class="retro">Plak dükkanı</h2>'
+        assert js == "console.log('Plak dükkanı');"
+        # unknown templates fall back to the default one
+        assert _get_mock_templates("x", "missing")[0] == "<h1>x</h1>"
+        assert premium_templates.get_template_info("nostalji")["map_to"] == "retro"
+        assert premium_templates.guidance_for("nostalji") == "Tema: Nostalji. Retro görünüm."
+    finally:
+        set_registry(previous)
+
+
+def test_premium_templates_come_from_registry():
+    assert premium_templates.list_templates() == ["minimalist", "kurumsal", "creative"]
+    assert get_registry().names() == ["modern", "classic", "creative"]
+    assert premium_templates.TEMPLATES["kurumsal"]["map_to"] == "classic"
+    assert get_registry().get("classic").guidance.startswith("Klasik")
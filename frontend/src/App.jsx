@@ -1,5 +1,4 @@
 import React, { useState, useRef } from "react";
-import axios from "axios";
 import Preview from "./components/Preview";
 import "./App.css";
 
@@ -9,6 +8,7 @@ export default function App() {
   const [url, setUrl] = useState("");
   const [error, setError] = useState("");
   const [successMsg, setSuccessMsg] = useState("");
+  const [progress, setProgress] = useState("");
   const [selectedTemplate, setSelectedTemplate] = useState("modern");
   const [selectedPremium, setSelectedPremium] = useState("minimalist");
   const textareaRef = useRef(null);
@@ -19,9 +19,12 @@ export default function App() {
     "Diyetisyen için profesyonel tek sayfa açıklama sitesi"
   ];
 
+  const stageLabels = { start: "Başlatılıyor", html: "HTML", css: "CSS", js: "JavaScript" };
+
   const handleGenerate = async () => {
     setError("");
     setSuccessMsg("");
+    setProgress("");
     setLoading(true);
     const formData = new FormData();
     formData.append("prompt", prompt);
@@ -30,14 +33,49 @@ export default function App() {
     formData.append("template", selectedTemplate);
 
     try {
-      const res = await axios.post("http://localhost:8000/api/generate", formData);
-      setUrl(res.data.url);
+      // stream stage/token events (SSE) so progress is visible while the model runs
+      const res = await fetch("http://localhost:8000/api/generate/stream", { method: "POST", body: formData });
+      if (!res.ok) {
+        const body = await res.json().catch(() => ({}));
+        throw new Error(body.detail || `HTTP ${res.status}`);
+      }
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let stage = "";
+      let tokens = 0;
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const line = frame.split("\n").find((l) => l.startsWith("data: "));
+          if (!line) continue;
+          const event = JSON.parse(line.slice(6));
+          if (event.event === "queued") {
+            stage = "Sırada";
+          } else if (event.event === "stage") {
+            stage = stageLabels[event.stage] || event.stage;
+            tokens = 0;
+          } else if (event.event === "token") {
+            tokens += 1;
+          } else if (event.event === "done") {
+            setUrl(event.url);
+          } else if (event.event === "error") {
+            throw new Error(event.detail);
+          }
+          setProgress(tokens ? `${stage} (${tokens} parça)` : stage);
+        }
+      }
     } catch (err) {
       console.error(err);
-      const msg = err?.response?.data?.detail || err.message || "Bilinmeyen hata";
+      const msg = err?.message || "Bilinmeyen hata";
       setError(`Oluşturma sırasında hata: ${msg}`);
     } finally {
       setLoading(false);
+      setProgress("");
     }
   };
 
@@ -145,6 +183,7 @@ export default function App() {
         <div className="loading-overlay">
           <div className="spinner" />
           <p>AI site oluşturuyor...</p>
+          {progress && <small className="progress">{progress}</small>}
         </div>
       )}
     </div>